@@ -0,0 +1,206 @@
+# Access logging for the TaskFlow API
+#
+# One JSON object per request, e.g.
+#     {"ts":"2026-10-18T10:47:11.208Z","remote":"127.0.0.1","method":"GET",
+#      "path":"/api/tasks?limit=50","status":200,"bytes":6512,"ms":1.92,
+#      "parse_ms":0.05,"db_ms":0.61,"serialize_ms":0.42,"write_ms":0.08}
+#
+# Request threads only put the fields on a queue; formatting and file I/O
+# happen on a background QueueListener thread. If the writer falls behind,
+# entries are dropped (and counted) rather than slowing requests down.
+#
+#     TASKFLOW_ACCESS_LOG=access.log   (or "-" for stderr, "off" to disable)
+#     TASKFLOW_ACCESS_LOG_SAMPLE=0.1   (log 10% of requests; errors and slow
+#                                       requests are always logged)
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import metrics
+
+ACCESS_LOG = os.environ.get('TASKFLOW_ACCESS_LOG', '-')
+SAMPLE_RATE = float(os.environ.get('TASKFLOW_ACCESS_LOG_SAMPLE', '1'))
+SLOW_MS = float(os.environ.get('TASKFLOW_ACCESS_LOG_SLOW_MS', '1000'))
+MAX_BYTES = int(os.environ.get('TASKFLOW_ACCESS_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+BACKUP_COUNT = int(os.environ.get('TASKFLOW_ACCESS_LOG_BACKUPS', '5'))
+QUEUE_SIZE = 10000
+# Query parameters whose values never reach the log. The server only reads
+# the profiling token from a header, but a client may still put it in the URL.
+REDACTED_PARAMS = ('profile_token',)
+_REDACT_RE = re.compile(r'((?:^|[?&;])(?:%s)=)[^&;#]*' % '|'.join(REDACTED_PARAMS))
+
+logger = logging.getLogger('taskflow.access')
+logger.propagate = False
+# Server errors (malformed requests and the like) go through the same queue.
+server_logger = logging.getLogger('taskflow.server')
+
+DROPPED = metrics.Counter('taskflow_access_log_dropped_total',
+                          'Access log entries dropped because the writer fell behind.')
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats each record in the calling thread (so it could
+    be pickled to another process); in-process, that's wasted request time.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that flushes its handlers only when the queue runs dry.
+
+    Under load, many entries then go out in one write instead of one
+    write-and-flush each.
+    """
+
+    def dequeue(self, block):
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+        return self.queue.get(block)
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the listener."""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that leaves flushing to the listener.
+
+    The stock handler seeks to the end of the file before every record to
+    decide whether to roll over; this one keeps a running byte count.
+    """
+
+    def __init__(self, filename, max_bytes, backup_count):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self.size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+            if self.maxBytes and self.size and self.size + len(line) > self.maxBytes:
+                self.doRollover()
+                self.size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(line)
+            self.size += len(line)
+        except Exception:
+            self.handleError(record)
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        if isinstance(record.msg, dict):
+            entry = record.msg
+        else:
+            entry = {'level': record.levelname.lower(), 'message': record.getMessage()}
+            if record.exc_info:
+                entry['traceback'] = self.formatException(record.exc_info)
+        ts = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+        return json.dumps(dict(ts='%s.%03dZ' % (ts, record.msecs), **entry),
+                          separators=(',', ':'))
+
+
+_listener = None
+_sample_rate = SAMPLE_RATE
+_slow_seconds = SLOW_MS / 1000.0
+
+
+def configure(destination=ACCESS_LOG, sample_rate=SAMPLE_RATE, slow_ms=SLOW_MS,
+              max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+    """Start writing the access log to `destination` ("-" = stderr, "off" = nowhere)."""
+    global _listener, _sample_rate, _slow_seconds
+    stop()
+    if destination in ('', 'off'):
+        return
+    if destination == '-':
+        handler = BufferedStreamHandler(sys.stderr)
+    else:
+        handler = BufferedRotatingFileHandler(destination, max_bytes, backup_count)
+    handler.setFormatter(JSONFormatter())
+    records = queue.Queue(QUEUE_SIZE)
+    for log in (logger, server_logger):
+        log.handlers = [DeferredQueueHandler(records)]
+        log.setLevel(logging.INFO)
+    _sample_rate = sample_rate
+    _slow_seconds = slow_ms / 1000.0
+    _listener = BatchingQueueListener(records, handler)
+    _listener.start()
+
+
+def stop():
+    """Write out whatever is queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    for log in (logger, server_logger):
+        log.handlers = []
+
+
+def enabled():
+    return _listener is not None
+
+
+def redact(target):
+    """`target` with the values of REDACTED_PARAMS replaced by "redacted"."""
+    if '_token=' not in target:
+        return target
+    return _REDACT_RE.sub(r'\1redacted', target)
+
+
+def record(method, target, status, size, remote, timing, seconds, user_agent=None):
+    """Queue one access log entry, subject to sampling.
+
+    `timing` holds per-phase seconds (parse, db, serialize, write) as filled
+    in by metrics.request_timing(); `seconds` is the whole request.
+    """
+    if _listener is None:
+        return
+    if status < 500 and seconds < _slow_seconds and _sample_rate < 1.0 and random.random() >= _sample_rate:
+        return
+    entry = {
+        'remote': remote,
+        'method': method,
+        'path': redact(target),
+        'status': status,
+        'bytes': size,
+        'ms': round(seconds * 1000, 3),
+    }
+    for phase in ('parse', 'db', 'serialize', 'write'):
+        entry[phase + '_ms'] = round(timing.get(phase, 0.0) * 1000, 3)
+    if user_agent:
+        entry['ua'] = user_agent
+    if _sample_rate < 1.0:
+        entry['sample_rate'] = _sample_rate
+    # Hand the record straight to the queue handler: Logger.info() would also
+    # walk the stack to find the caller, which costs more than the rest of
+    # this function put together.
+    for handler in logger.handlers:
+        handler.handle(logging.LogRecord(logger.name, logging.INFO, __file__, 0, entry, None, None))
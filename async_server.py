@@ -0,0 +1,251 @@
+# TaskFlow Backend API — asyncio engine
+#
+# Serves the same routes as server.TaskHandler, but every connection is a
+# coroutine instead of a thread, so thousands of idle keep-alive clients
+# cost a few KB each. Route handlers (which touch SQLite) run on a small
+# thread pool so they never block the event loop.
+#
+#     python server.py --engine async
+
+import asyncio
+import http.client
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import access_log
+import server
+
+MAX_HEADERS = 100
+# Idle connections only cost a coroutine here, so they may stay open much
+# longer than the threaded engine's server.IDLE_TIMEOUT allows.
+IDLE_TIMEOUT = 75.0
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AsyncTaskServer:
+    """asyncio HTTP/1.1 server for the TaskFlow API.
+
+    Exposes the same serve_forever / shutdown / server_close / server_address
+    surface as socketserver, so it can be swapped in wherever an HTTPServer
+    is expected.
+    """
+
+    def __init__(self, server_address, workers=8, idle_timeout=IDLE_TIMEOUT,
+                 max_requests=server.MAX_KEEPALIVE_REQUESTS, backlog=1024):
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='taskflow-async')
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(server_address)
+        self.socket.listen(backlog)
+        self.server_address = self.socket.getsockname()
+        self.connections = 0
+        self._loop = None
+        self._stopping = None
+        self._stopped = threading.Event()
+
+    def serve_forever(self):
+        self._stopped.clear()
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self._stopped.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        aserver = await asyncio.start_server(self.handle_connection, sock=self.socket)
+        async with aserver:
+            await self._stopping.wait()
+
+    def shutdown(self):
+        """Stop serve_forever() from another thread and wait for it to exit."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._stopped.wait()
+
+    def server_close(self):
+        self.socket.close()
+        self.executor.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            keep_alive = True
+            served = 0
+            while keep_alive:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except BadRequest as e:
+                    await write_response(writer, 'HTTP/1.1',
+                                         *server.json_response({"error": str(e)}, status=e.status),
+                                         keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body, started = request
+                timing = {'parse': time.perf_counter() - started}
+                served += 1
+                keep_alive = wants_keep_alive(version, headers) and served < self.max_requests
+                status, response_headers, response_body = await self._loop.run_in_executor(
+                    self.executor, server.handle_request, method, target, headers, body, timing)
+                written = time.perf_counter()
+                if isinstance(response_body, bytes):
+                    await write_response(writer, version, status, response_headers, response_body,
+                                         keep_alive=keep_alive, send_body=method != 'HEAD')
+                    size = len(response_body) if method != 'HEAD' else 0
+                else:
+                    keep_alive = keep_alive and version != 'HTTP/1.0'
+                    produced = timing.get('db', 0.0) + timing.get('serialize', 0.0)
+                    try:
+                        size = await self.write_stream(writer, version, status, response_headers,
+                                                       response_body, keep_alive,
+                                                       send_body=method != 'HEAD', timing=timing)
+                    except ConnectionError:
+                        raise
+                    except Exception:
+                        # The status line has gone out, so all we can do is drop
+                        # the connection: without the final chunk (or, for
+                        # HTTP/1.0, with a reset) the client sees a cut-off body.
+                        access_log.server_logger.exception('error streaming %s %s', method, target)
+                        abort(writer)
+                        break
+                    # Count the stream's queries once, under db/serialize.
+                    written += timing.get('db', 0.0) + timing.get('serialize', 0.0) - produced
+                finished = time.perf_counter()
+                timing['write'] = finished - written
+                peer = writer.get_extra_info('peername')
+                access_log.record(method, target, status, size, peer[0] if peer else '-', timing,
+                                  finished - started, headers.get('User-Agent'))
+        except ConnectionError:
+            pass
+        except Exception:
+            access_log.server_logger.exception('error serving connection')
+            abort(writer)
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+    async def write_stream(self, writer, version, status, headers, chunks, keep_alive,
+                           send_body=True, timing=None):
+        """Send an iterator body chunk by chunk, pulling each chunk on the executor.
+
+        Returns the number of body bytes sent; send_body=False (for HEAD)
+        sends only the headers. Time spent producing the chunks is added to
+        `timing` (see server.next_chunk).
+        """
+        chunked = version != 'HTTP/1.0'
+        lines = ['%s %d %s' % ('HTTP/1.1' if chunked else version, status, HTTPStatus(status).phrase)]
+        lines.extend('%s: %s' % (name, value) for name, value in headers)
+        if chunked:
+            lines.append('Transfer-Encoding: chunked')
+        lines.append('Connection: %s' % ('keep-alive' if keep_alive else 'close'))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if not send_body:
+            chunks.close()
+            await writer.drain()
+            return 0
+        size = 0
+        while True:
+            chunk = await self._loop.run_in_executor(self.executor, server.next_chunk, chunks, timing)
+            if chunk is None:
+                break
+            if chunk:
+                writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                size += len(chunk)
+                await writer.drain()
+        if chunked:
+            writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return size
+
+
+async def read_request(reader):
+    """Parse one request; returns None on a clean EOF between requests.
+
+    The last item returned is the perf_counter() time the request line
+    arrived, so idle time between requests isn't counted as parsing.
+    """
+    try:
+        line = await reader.readline()
+    except ValueError:
+        raise BadRequest('request line too long')
+    if not line:
+        return None
+    started = time.perf_counter()
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise BadRequest('malformed request line')
+    if not version.startswith('HTTP/1.'):
+        raise BadRequest('unsupported HTTP version')
+
+    headers = http.client.HTTPMessage()
+    for _ in range(MAX_HEADERS + 1):
+        try:
+            line = await reader.readline()
+        except ValueError:
+            raise BadRequest('header line too long')
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, sep, value = line.decode('latin-1').partition(':')
+        if not sep:
+            raise BadRequest('malformed header')
+        headers[name.strip()] = value.strip()
+    else:
+        raise BadRequest('too many headers')
+
+    if headers.get('Transfer-Encoding'):
+        raise BadRequest('chunked request bodies are not supported', status=411)
+    body = b''
+    length = headers.get('Content-Length')
+    if length:
+        if not length.isdigit():
+            raise BadRequest('bad Content-Length')
+        if int(length) > server.MAX_BODY_SIZE:
+            raise BadRequest('request body too large', status=413)
+        body = await reader.readexactly(int(length))
+    return method, target, version, headers, body, started
+
+
+def abort(writer):
+    """Drop the connection with a reset rather than a normal close."""
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, server.RESET_LINGER)
+    writer.transport.abort()
+
+
+def wants_keep_alive(version, headers):
+    connection = (headers.get('Connection') or '').lower()
+    if version == 'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
+
+
+async def write_response(writer, version, status, headers, body, keep_alive=True, send_body=True):
+    """Write one response; send_body=False (for HEAD) sends only the headers."""
+    lines = ['%s %d %s' % (version if version == 'HTTP/1.0' else 'HTTP/1.1',
+                           status, HTTPStatus(status).phrase)]
+    lines.extend('%s: %s' % (name, value) for name, value in headers)
+    if status not in (204, 304):
+        lines.append('Content-Length: %d' % len(body))
+    lines.append('Connection: %s' % ('keep-alive' if keep_alive else 'close'))
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body if send_body else b''))
+    await writer.drain()
+
+
+def make_server(host='localhost', port=8000, workers=8, idle_timeout=IDLE_TIMEOUT):
+    return AsyncTaskServer((host, port), workers=workers, idle_timeout=idle_timeout)
@@ -0,0 +1,783 @@
+# Benchmarks for the TaskFlow backend
+#
+# Usage:
+#     python bench.py pool [--ops N]
+#     python bench.py concurrency [--readers N] [--seconds S]
+#     python bench.py server [--levels 1,8,32,128] [--requests N]
+#     python bench.py engines [--connections 1000] [--requests N] [--idle N]
+#     python bench.py keepalive [--requests N]
+#     python bench.py compression [--requests N]
+#     python bench.py streaming [--rows N]
+#     python bench.py crud [--clients N] [--seconds S] [--read-ratio R]
+#     python bench.py groupcommit [--clients N] [--seconds S] [--delays 0,1,5]
+#     python bench.py search [--rows 1000000] [--ops N]
+#     python bench.py suite [--sizes 10000,100000,1000000] [--dataset-dir DIR] [--compare old.json]
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import async_server
+import database
+import datagen
+import server
+
+
+def use_temp_db(directory):
+    """Point database.py at a fresh file inside `directory`."""
+    database.close_pool()
+    database.DB_FILE = os.path.join(directory, 'bench.db')
+    database.init_db()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))
+    return sorted_values[index]
+
+
+class QuietTaskHandler(server.TaskHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(httpd):
+    """Run `httpd` in a background thread; returns the thread."""
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_server(httpd, thread):
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def report(name, ops, seconds):
+    print('  %-28s %10.0f ops/sec  (%d ops in %.2fs)' % (name, ops / seconds, ops, seconds))
+
+
+def bench_pool(args):
+    """Open-per-call connections versus the shared connection pool."""
+
+    def add_task_unpooled(title):
+        conn = sqlite3.connect(database.DB_FILE)
+        conn.execute('INSERT INTO tasks (title) VALUES (?)', (title,))
+        conn.commit()
+        conn.close()
+
+    def get_task_unpooled(task_id):
+        conn = sqlite3.connect(database.DB_FILE)
+        row = conn.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        conn.close()
+        return row
+
+    def get_task_pooled(task_id):
+        with database.get_pool().connection() as conn:
+            return conn.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        print('\nWrites (one task per call):')
+        start = time.perf_counter()
+        for i in range(args.ops):
+            add_task_unpooled('task %d' % i)
+        report('open-per-call', args.ops, time.perf_counter() - start)
+        start = time.perf_counter()
+        for i in range(args.ops):
+            database.add_task('task %d' % i)
+        report('pooled', args.ops, time.perf_counter() - start)
+
+        print('\nReads (lookup by id):')
+        start = time.perf_counter()
+        for i in range(args.ops):
+            get_task_unpooled(i + 1)
+        report('open-per-call', args.ops, time.perf_counter() - start)
+        start = time.perf_counter()
+        for i in range(args.ops):
+            get_task_pooled(i + 1)
+        report('pooled', args.ops, time.perf_counter() - start)
+        database.close_pool()
+
+
+def bench_concurrency(args):
+    """Many readers plus one writer: rollback journal versus the WAL profile."""
+    profiles = [
+        ('journal_mode=delete', dict(database.DEFAULT_PRAGMAS, journal_mode='delete', synchronous='full')),
+        ('WAL profile', dict(database.DEFAULT_PRAGMAS)),
+    ]
+    saved = database.PRAGMAS, database.POOL_SIZE
+    database.POOL_SIZE = args.readers + 2
+    print('\n%d readers + 1 writer for %.1fs each:' % (args.readers, args.seconds))
+    try:
+        for name, pragmas in profiles:
+            database.PRAGMAS = pragmas
+            with tempfile.TemporaryDirectory() as tmp:
+                use_temp_db(tmp)
+                database.add_tasks(('seed %d' % i, '', 'user%d' % (i % 20)) for i in range(5000))
+                reads, writes = run_mixed_load(args.readers, args.seconds)
+                database.close_pool()
+            print('  %-22s %10.0f reads/sec  %8.0f writes/sec'
+                  % (name, reads / args.seconds, writes / args.seconds))
+    finally:
+        database.PRAGMAS, database.POOL_SIZE = saved
+
+
+def run_mixed_load(readers, seconds):
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0}
+    lock = threading.Lock()
+
+    def reader(n):
+        done = 0
+        while not stop.is_set():
+            database.get_tasks_for_user('user%d' % (done % 20), completed=False)
+            done += 1
+        with lock:
+            counts['reads'] += done
+
+    def writer():
+        done = 0
+        while not stop.is_set():
+            database.add_task('write %d' % done, '', 'user%d' % (done % 20))
+            done += 1
+        with lock:
+            counts['writes'] += done
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return counts['reads'], counts['writes']
+
+
+def bench_server(args):
+    """p50/p99 latency of /api/tasks at increasing client concurrency."""
+    levels = [int(n) for n in args.levels.split(',')]
+    engines = [
+        ('single-threaded', dict(workers=0, handler_class=QuietTaskHandler)),
+        ('worker pool', dict(workers=args.workers, queue_depth=args.queue_depth,
+                             handler_class=QuietTaskHandler)),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        for name, options in engines:
+            print('\n%s server (%d requests per level):' % (name, args.requests))
+            print('  %6s %10s %10s %10s %8s' % ('conc', 'req/sec', 'p50 ms', 'p99 ms', 'errors'))
+            for level in levels:
+                httpd = server.make_server('127.0.0.1', 0, **options)
+                thread = start_server(httpd)
+                latencies, errors, elapsed = run_http_load(httpd.server_address[1], level,
+                                                           args.requests, args.path)
+                stop_server(httpd, thread)
+                latencies.sort()
+                print('  %6d %10.0f %10.2f %10.2f %8d' % (
+                    level, len(latencies) / elapsed, percentile(latencies, 50) * 1000,
+                    percentile(latencies, 99) * 1000, errors))
+        database.close_pool()
+
+
+def run_http_load(port, concurrency, total, path):
+    """Closed-loop load: `concurrency` threads share `total` GET requests."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [total]
+
+    def client():
+        mine = []
+        failed = 0
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                if response.status != 200:
+                    failed += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def bench_engines(args):
+    """Threaded worker pool versus asyncio engine at 1k+ concurrent connections."""
+    engines = [
+        ('threaded', lambda: server.make_server('127.0.0.1', 0, args.workers, args.queue_depth,
+                                                handler_class=QuietTaskHandler)),
+        ('async', lambda: async_server.make_server('127.0.0.1', 0, args.workers)),
+    ]
+    print('\n%d concurrent connections, %d requests each, %d extra idle connections:'
+          % (args.connections, args.requests_per_connection, args.idle))
+    print('  %-10s %10s %10s %10s %8s' % ('engine', 'req/sec', 'p50 ms', 'p99 ms', 'errors'))
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        for name, factory in engines:
+            httpd = factory()
+            thread = start_server(httpd)
+            latencies, errors, elapsed = asyncio.run(run_async_load(
+                httpd.server_address[1], args.connections, args.requests_per_connection,
+                args.path, args.idle))
+            stop_server(httpd, thread)
+            latencies.sort()
+            print('  %-10s %10.0f %10.2f %10.2f %8d' % (
+                name, len(latencies) / elapsed, percentile(latencies, 50) * 1000,
+                percentile(latencies, 99) * 1000, errors))
+        database.close_pool()
+
+
+async def http_get(reader, writer, path):
+    """Send one GET and read the response; returns (status, keep_alive)."""
+    writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % path).encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('server closed the connection')
+    version, status = status_line.split()[:2]
+    length = None
+    keep_alive = version == b'HTTP/1.1'
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection':
+            keep_alive = value.strip().lower() == b'keep-alive'
+    if length is None:
+        await reader.read()
+        keep_alive = False
+    else:
+        await reader.readexactly(length)
+    return int(status), keep_alive
+
+
+async def run_async_load(port, connections, requests_each, path, idle=0):
+    """Closed-loop load over `connections` asyncio clients, reconnecting as needed."""
+    latencies = []
+    errors = [0]
+    idle_sockets = []
+    for _ in range(idle):
+        try:
+            idle_sockets.append(await asyncio.open_connection('127.0.0.1', port))
+        except OSError:
+            errors[0] += 1
+
+    async def client():
+        stream = None
+        for _ in range(requests_each):
+            start = time.perf_counter()
+            try:
+                if stream is None:
+                    stream = await asyncio.open_connection('127.0.0.1', port)
+                status, keep_alive = await asyncio.wait_for(http_get(stream[0], stream[1], path), 30)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                errors[0] += 1
+                if stream is not None:
+                    stream[1].close()
+                stream = None
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[0] += 1
+            if not keep_alive:
+                stream[1].close()
+                stream = None
+        if stream is not None:
+            stream[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    for _, writer in idle_sockets:
+        writer.close()
+    return latencies, errors[0], elapsed
+
+
+def bench_keepalive(args):
+    """Sequential client: new TCP connection per request versus one persistent one."""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        httpd = server.make_server('127.0.0.1', 0, args.workers, args.queue_depth,
+                                   handler_class=QuietTaskHandler)
+        thread = start_server(httpd)
+        port = httpd.server_address[1]
+        print('\nSequential GET %s, %d requests:' % (args.path, args.requests))
+
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+            conn.request('GET', args.path, headers={'Connection': 'close'})
+            conn.getresponse().read()
+            conn.close()
+        report('new connection each time', args.requests, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        for _ in range(args.requests):
+            conn.request('GET', args.path)
+            response = conn.getresponse()
+            response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+        conn.close()
+        report('keep-alive', args.requests, time.perf_counter() - start)
+
+        stop_server(httpd, thread)
+        database.close_pool()
+
+
+def bench_compression(args):
+    """Bytes saved and CPU cost of gzip/deflate on a full page of tasks."""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        database.add_tasks(('Task %d: %s' % (i, 'review the sprint board'), 'Details for task %d' % i,
+                            'user%d' % (i % 20)) for i in range(database.MAX_PAGE_SIZE))
+        target = '/api/tasks?limit=%d' % database.MAX_PAGE_SIZE
+        _, _, body = server.get_tasks({'limit': [str(database.MAX_PAGE_SIZE)]})
+
+        print('\nOne page of %d tasks, %d bytes uncompressed:' % (database.MAX_PAGE_SIZE, len(body)))
+        print('  %-10s %6s %10s %8s %14s' % ('encoding', 'level', 'bytes', 'saved', 'CPU ms/compress'))
+        for encoding in ('gzip', 'deflate'):
+            for level in (1, 6, 9):
+                rounds = 20
+                start = time.process_time()
+                for _ in range(rounds):
+                    packed = server.compress(body, encoding, level)
+                cpu = (time.process_time() - start) / rounds
+                print('  %-10s %6d %10d %7.1f%% %14.3f' % (
+                    encoding, level, len(packed), 100.0 * (1 - len(packed) / len(body)), cpu * 1000))
+
+        print('\nServing %s %d times (compressed body comes from the response cache):' % (target, args.requests))
+        for accept in ('identity', 'gzip'):
+            headers = {'Accept-Encoding': accept}
+            server.response_cache.clear()
+            start = time.process_time()
+            sent = 0
+            for _ in range(args.requests):
+                sent += len(server.handle_request('GET', target, headers)[2])
+            cpu = time.process_time() - start
+            print('  %-10s %10.0f bytes/request  %8.3f CPU ms/request'
+                  % (accept, sent / args.requests, cpu * 1000 / args.requests))
+        database.close_pool()
+
+
+def bench_streaming(args):
+    """Time-to-first-byte and peak memory: one json.dumps versus the chunked stream."""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        database.add_tasks(('Task %d' % i, 'Details for task %d' % i, 'user%d' % (i % 20))
+                           for i in range(args.rows))
+
+        def buffered():
+            rows = database.get_all_tasks()
+            yield json.dumps([database.task_to_dict(row) for row in rows]).encode()
+
+        print('\nAll %d tasks:' % args.rows)
+        print('  %-10s %10s %10s %12s' % ('mode', 'TTFB ms', 'total ms', 'peak MB'))
+        for name, chunks in (('buffered', buffered), ('streamed', server.iter_task_chunks)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            first = None
+            size = 0
+            for chunk in chunks():
+                if first is None:
+                    first = time.perf_counter() - start
+                size += len(chunk)
+            total = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print('  %-10s %10.1f %10.1f %12.1f' % (name, first * 1000, total * 1000, peak / 1e6))
+        database.close_pool()
+
+
+def bench_crud(args):
+    """Mixed read/write REST traffic against the threaded server, per operation."""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(tmp)
+        database.add_tasks(('Task %d' % i, '', 'user%d' % (i % 20)) for i in range(args.rows))
+        httpd = server.make_server('127.0.0.1', 0, args.workers, args.queue_depth,
+                                   handler_class=QuietTaskHandler)
+        thread = start_server(httpd)
+        port = httpd.server_address[1]
+        stop = threading.Event()
+        results = {}
+        lock = threading.Lock()
+
+        def client(seed):
+            rng = random.Random(seed)
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            mine = {}
+            while not stop.is_set():
+                if rng.random() < args.read_ratio:
+                    op, method, path, body = rng.choice([
+                        ('list page', 'GET', '/api/tasks?limit=50', None),
+                        ('get task', 'GET', '/api/tasks/%d' % rng.randint(1, args.rows), None),
+                        ('user tasks', 'GET', '/api/tasks?assigned_to=user%d' % rng.randint(0, 19), None),
+                    ])
+                elif rng.random() < 0.5:
+                    op, method, path = 'create task', 'POST', '/api/tasks'
+                    body = json.dumps({'title': 'bench', 'assigned_to': 'user%d' % rng.randint(0, 19)})
+                else:
+                    op, method, path = 'update task', 'PATCH', '/api/tasks/%d' % rng.randint(1, args.rows)
+                    body = json.dumps({'completed': rng.random() < 0.5})
+                start = time.perf_counter()
+                try:
+                    conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status < 400
+                    if response.getheader('Connection', '').lower() == 'close':
+                        conn.close()
+                except (OSError, http.client.HTTPException):
+                    ok = False
+                    conn.close()
+                stats = mine.setdefault(op, {'latencies': [], 'errors': 0})
+                if ok:
+                    stats['latencies'].append(time.perf_counter() - start)
+                else:
+                    stats['errors'] += 1
+            conn.close()
+            with lock:
+                for op, stats in mine.items():
+                    total = results.setdefault(op, {'latencies': [], 'errors': 0})
+                    total['latencies'].extend(stats['latencies'])
+                    total['errors'] += stats['errors']
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        stop_server(httpd, thread)
+        database.close_pool()
+
+    print('\n%d clients, %.0f%% reads, %.1fs, %d seed tasks:' % (
+        args.clients, args.read_ratio * 100, args.seconds, args.rows))
+    print('  %-12s %10s %10s %10s %8s' % ('operation', 'req/sec', 'p50 ms', 'p99 ms', 'errors'))
+    total = 0
+    for op in sorted(results):
+        latencies = sorted(results[op]['latencies'])
+        total += len(latencies)
+        print('  %-12s %10.0f %10.2f %10.2f %8d' % (
+            op, len(latencies) / args.seconds, percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000, results[op]['errors']))
+    print('  %-12s %10.0f' % ('total', total / args.seconds))
+
+
+def bench_groupcommit(args):
+    """Concurrent add_task() throughput: one commit per write versus group commit."""
+    print('\n%d writer threads, %.1fs per run:' % (args.clients, args.seconds))
+    print('  %-16s %10s %10s %10s %10s' % ('mode', 'writes/sec', 'p50 ms', 'p99 ms', 'commits'))
+    modes = [('per-write', None)] + [('group %gms' % float(d), float(d)) for d in args.delays.split(',')]
+    for name, delay in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            use_temp_db(tmp)
+            if delay is not None:
+                database.enable_group_commit(max_delay_ms=delay)
+            stop = threading.Event()
+            latencies = []
+            lock = threading.Lock()
+
+            def writer(n):
+                mine = []
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    database.add_task('bench', '', 'user%d' % n)
+                    mine.append(time.perf_counter() - start)
+                with lock:
+                    latencies.extend(mine)
+
+            threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.clients)]
+            for t in threads:
+                t.start()
+            time.sleep(args.seconds)
+            stop.set()
+            for t in threads:
+                t.join()
+            committer = database._group_committer
+            commits = committer.batches if committer else len(latencies)
+            database.disable_group_commit()
+            database.close_pool()
+        latencies.sort()
+        print('  %-16s %10.0f %10.2f %10.2f %10d' % (
+            name, len(latencies) / args.seconds, percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000, commits))
+
+
+def bench_search(args):
+    """search_tasks() through FTS5 versus the LIKE scan it replaces."""
+    words = datagen.vocabulary(random.Random(datagen.DEFAULT_SEED))
+
+    # From very common to absent. LIKE is quick when the first page of newest
+    # tasks already has enough hits, and degrades to a full scan as terms get
+    # rarer; FTS stays bounded because it ranks at most SEARCH_CANDIDATES.
+    queries = ['login', 'payment crash', 'invoice', words[1000], words[20000], 'zzznomatch']
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_pool()
+        database.DB_FILE = os.path.join(tmp, 'bench.db')
+        start = time.perf_counter()
+        datagen.build(database.DB_FILE, args.rows)
+        print('\nGenerated %d tasks (with FTS triggers) in %.1fs' % (args.rows, time.perf_counter() - start))
+        with database.get_pool().connection() as conn:
+            if not database._has_search_index(conn):
+                print('This SQLite build has no FTS5; search_tasks() already uses the LIKE scan.')
+                return
+        runs = max(1, args.ops // 100)
+        print('  %-16s %12s %12s %8s' % ('query', 'fts5 ms', 'like ms', 'speedup'))
+        for query in queries:
+            terms = database.search_terms(query)
+            start = time.perf_counter()
+            for _ in range(runs):
+                database.search_tasks(query)
+            fts = (time.perf_counter() - start) / runs
+            start = time.perf_counter()
+            with database.get_pool().connection() as conn:
+                database._like_search(conn, terms, database.SEARCH_LIMIT)
+            like = time.perf_counter() - start
+            print('  %-16s %12.2f %12.2f %7.0fx' % (query, fts * 1000, like * 1000, like / fts))
+        database.close_pool()
+
+
+def timed_ops(op, max_ops, seconds, before=None):
+    """Run op(n) up to max_ops times or for `seconds`; returns sorted latencies.
+
+    `before`, if given, runs ahead of every op outside the timed section.
+    """
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    for n in range(max_ops):
+        if before:
+            before()
+        start = time.perf_counter()
+        op(n)
+        end = time.perf_counter()
+        latencies.append(end - start)
+        if end > deadline:
+            break
+    return sorted(latencies)
+
+
+def suite_workloads(rows, users, rng):
+    """(name, op, before) for each workload, read-only ones first."""
+    words = datagen.vocabulary(random.Random(datagen.DEFAULT_SEED))
+    names = datagen.usernames(users)
+    state = {'cursor': None}
+
+    def list_walk(n):
+        _, state['cursor'] = database.get_tasks_page(database.PAGE_SIZE, state['cursor'])
+
+    def no_cache():
+        database.user_tasks_cache.clear()
+
+    def warm_cache():
+        # Only the first call does anything, so every timed lookup is a hit.
+        if not state.get('warm'):
+            for name in names[:10]:
+                database.get_tasks_for_user(name)
+            state['warm'] = True
+
+    return [
+        ('list_first_page', lambda n: database.get_tasks_page(database.PAGE_SIZE), None),
+        ('list_walk', list_walk, None),
+        ('get_task', lambda n: database.get_task(rng.randint(1, rows)), None),
+        ('filter_hot_open', lambda n: database.get_tasks_for_user(names[0], False), no_cache),
+        ('filter_tail', lambda n: database.get_tasks_for_user(rng.choice(names[users // 2:])), no_cache),
+        ('filter_cached', lambda n: database.get_tasks_for_user(names[n % 10]), warm_cache),
+        ('search_common', lambda n: database.search_tasks('login'), None),
+        ('search_rare', lambda n: database.search_tasks(words[20000 + n % 1000]), None),
+        ('update_task', lambda n: database.update_task(
+            rng.randint(1, rows), completed=rng.random() < 0.5), None),
+        ('insert_task', lambda n: database.add_task(
+            'bench task %d' % n, 'inserted by the suite', rng.choice(names)), None),
+        ('insert_bulk_1k', lambda n: database.add_tasks(
+            ('bulk task', 'inserted by the suite', rng.choice(names)) for _ in range(1000)), None),
+    ]
+
+
+def load_results(path):
+    with open(path) as f:
+        return {(r['rows'], r['workload']): r for r in json.load(f)['results']}
+
+
+def compare_results(old, results, threshold, out):
+    """Print throughput changes against an earlier run; returns the regressions."""
+    regressions = []
+    out('\nCompared with the earlier run (regression = over %g%% slower):' % threshold)
+    out('  %10s %-16s %12s %12s %8s' % ('rows', 'workload', 'before/s', 'now/s', 'change'))
+    for result in results:
+        before = old.get((result['rows'], result['workload']))
+        if before is None or not before['ops_per_sec']:
+            continue
+        change = (result['ops_per_sec'] / before['ops_per_sec'] - 1) * 100
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(result)
+        out('  %10d %-16s %12.1f %12.1f %+7.1f%%%s' % (
+            result['rows'], result['workload'], before['ops_per_sec'],
+            result['ops_per_sec'], change, flag))
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+def bench_suite(args):
+    """Fixed workload matrix over generated datasets of each size in --sizes."""
+    lines = []
+
+    def out(line=''):
+        print(line)
+        lines.append(line)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = []
+    out('TaskFlow database suite  rev=%s  sqlite=%s  python=%s  seed=%d  skew=%g' % (
+        git_revision() or '?', sqlite3.sqlite_version, sys.version.split()[0], args.seed, args.skew))
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.close_pool()
+            start = time.perf_counter()
+            if args.dataset_dir:
+                source = datagen.cached_build(args.dataset_dir, rows, args.seed, args.skew)
+                database.DB_FILE = os.path.join(tmp, 'suite.db')
+                shutil.copyfile(source, database.DB_FILE)
+            else:
+                database.DB_FILE = os.path.join(tmp, 'suite.db')
+                datagen.build(database.DB_FILE, rows, seed=args.seed, skew=args.skew)
+            users = datagen.default_user_count(rows)
+            out('\n%d tasks, %d users (ready in %.1fs):' % (rows, users, time.perf_counter() - start))
+            out('  %-16s %8s %12s %10s %10s' % ('workload', 'ops', 'ops/sec', 'p50 ms', 'p99 ms'))
+            rng = random.Random(args.seed)
+            for name, op, before in suite_workloads(rows, users, rng):
+                latencies = timed_ops(op, args.ops, args.seconds, before)
+                result = {
+                    'rows': rows,
+                    'workload': name,
+                    'ops': len(latencies),
+                    'ops_per_sec': round(len(latencies) / sum(latencies), 1),
+                    'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+                    'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+                }
+                results.append(result)
+                out('  %-16s %8d %12.1f %10.3f %10.3f' % (
+                    name, result['ops'], result['ops_per_sec'], result['p50_ms'], result['p99_ms']))
+            database.close_pool()
+
+    regressions = []
+    if args.compare:
+        regressions = compare_results(load_results(args.compare), results, args.threshold, out)
+
+    with open(args.output, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    with open(args.json, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'sqlite': sqlite3.sqlite_version,
+            'python': sys.version.split()[0],
+            'seed': args.seed,
+            'skew': args.skew,
+            'results': results,
+        }, f, indent=2)
+    print('\nWrote %s and %s' % (args.output, args.json))
+    return 1 if regressions else 0
+
+
+BENCHMARKS = {
+    'suite': bench_suite,
+    'search': bench_search,
+    'groupcommit': bench_groupcommit,
+    'crud': bench_crud,
+    'streaming': bench_streaming,
+    'compression': bench_compression,
+    'keepalive': bench_keepalive,
+    'engines': bench_engines,
+    'server': bench_server,
+    'pool': bench_pool,
+    'concurrency': bench_concurrency,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='TaskFlow benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--ops', type=int, default=2000, help='operations per measurement')
+    parser.add_argument('--readers', type=int, default=8, help='reader threads (concurrency)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='duration per measurement')
+    parser.add_argument('--levels', default='1,8,32,128', help='client concurrency levels (server)')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per level (server)')
+    parser.add_argument('--path', default='/api/tasks', help='request path (server, engines)')
+    parser.add_argument('--connections', type=int, default=1000, help='concurrent connections (engines)')
+    parser.add_argument('--requests-per-connection', type=int, default=5,
+                        help='requests per connection (engines)')
+    parser.add_argument('--rows', type=int, default=100000, help='tasks to generate (streaming, crud, search)')
+    parser.add_argument('--clients', type=int, default=8, help='client threads (crud, groupcommit)')
+    parser.add_argument('--read-ratio', type=float, default=0.8, help='share of reads (crud)')
+    parser.add_argument('--idle', type=int, default=0, help='extra idle connections (engines)')
+    parser.add_argument('--workers', type=int, default=8, help='server worker threads')
+    parser.add_argument('--queue-depth', type=int, default=64, help='server queue depth')
+    parser.add_argument('--delays', default='0,1,5', help='group commit delays in ms (groupcommit)')
+    parser.add_argument('--sizes', default='10000,100000', help='dataset sizes in tasks (suite)')
+    parser.add_argument('--seed', type=int, default=datagen.DEFAULT_SEED, help='dataset seed (suite)')
+    parser.add_argument('--skew', type=float, default=datagen.DEFAULT_SKEW,
+                        help='Zipf exponent for assignees (suite)')
+    parser.add_argument('--dataset-dir', help='keep generated datasets here and reuse them (suite)')
+    parser.add_argument('--output', default='bench_output.txt', help='text report (suite)')
+    parser.add_argument('--json', default='bench_output.json', help='JSON results (suite)')
+    parser.add_argument('--compare', metavar='JSON', help='earlier --json results to compare with (suite)')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='%% slowdown that counts as a regression (suite)')
+    args = parser.parse_args(argv)
+    return BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# In-process read cache for TaskFlow
+# A small thread-safe LRU with an optional time-to-live, used by database.py
+# to keep hot query results out of SQLite.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry time-to-live.
+
+    Memory is bounded two ways: at most `maxsize` entries, and (when
+    `max_weight` is given) at most that much total `weigh(value)` — e.g. rows
+    across all cached results. Values heavier than `max_weight` on their own
+    are not cached at all.
+
+    To avoid caching a result that a concurrent write has already made
+    stale, take a token() before loading and pass it to put(): if anything
+    was invalidated in between, the put is dropped.
+    """
+
+    def __init__(self, maxsize=256, ttl=None, max_weight=None, weigh=len):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._weight = 0
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, weight, expires = entry
+            if expires is not None and now >= expires:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def token(self):
+        with self._lock:
+            return self._invalidations
+
+    def put(self, key, value, token=None):
+        weight = self.weigh(value) if self.max_weight is not None else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if token is not None and token != self._invalidations:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, weight, expires)
+            self._weight += weight
+            while len(self._entries) > self.maxsize or (
+                    self.max_weight is not None and self._weight > self.max_weight):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, keys):
+        """Drop the given keys (missing ones are ignored)."""
+        with self._lock:
+            self._invalidations += 1
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._weight = 0
+
+    def _remove(self, key):
+        _, weight, _ = self._entries.pop(key)
+        self._weight -= weight
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'weight': self._weight,
+                'max_weight': self.max_weight,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
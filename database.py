@@ -1,63 +1,915 @@
 # Database module for TaskFlow
 # Author: Ahmed (Backend Developer)
 
-import sqlite3
 import os
+import re
+import sys
+import csv
+import html
+import time
+import json
+import base64
+import queue
+import argparse
+import threading
+import unicodedata
+from concurrent.futures import Future
+from itertools import islice
+
+import metrics
+import migrations
+from cache import LRUCache
+from db_pool import ConnectionPool
 
 DB_FILE = 'taskflow.db'
+POOL_SIZE = int(os.environ.get('TASKFLOW_POOL_SIZE', '5'))
+BULK_CHUNK_SIZE = 5000
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+TASK_COLUMNS = ('id', 'title', 'description', 'completed', 'created_at', 'assigned_to')
+USER_COLUMNS = ('id', 'username', 'email', 'role')
+TASK_FIELDS = ('title', 'description', 'completed', 'assigned_to')
+USER_FIELDS = ('username', 'email', 'role')
+
+INSERT_TASK_SQL = 'INSERT INTO tasks (title, description, assigned_to) VALUES (?, ?, ?)'
+BULK_INSERT_TASK_SQL = ('INSERT INTO tasks (title, description, assigned_to, completed) '
+                        'VALUES (?, ?, ?, ?)')
+
+# Timings for every public operation below, served at /metrics by server.py.
+DB_SECONDS = metrics.Histogram(
+    'taskflow_db_query_seconds', 'Time spent in each database.py operation.', ['operation'])
+
+def _timed(operation):
+    """Decorator timing an operation; also counts as the current request's db time."""
+    return DB_SECONDS.time(operation, phase='db')
+
+# Performance profile. Defaults favour concurrent readers: WAL lets readers
+# carry on while a writer commits, and synchronous=NORMAL only fsyncs at
+# checkpoints.
+# Override with a JSON file named by TASKFLOW_DB_CONFIG, e.g.
+#     {"pragmas": {"cache_size": -64000}, "checkpoint_interval": 10}
+# or with one env var per setting (TASKFLOW_JOURNAL_MODE=delete, ...).
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -16000,           # negative = KiB, so ~16 MB per connection
+    'mmap_size': 64 * 1024 * 1024,
+    'temp_store': 'memory',
+    'busy_timeout': 5000,
+}
+DEFAULT_CHECKPOINT_INTERVAL = 30.0  # seconds; 0 disables the background checkpointer
+
+def load_db_config(environ=os.environ):
+    """Return (pragmas, checkpoint_interval) from defaults, config file and env."""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    interval = DEFAULT_CHECKPOINT_INTERVAL
+
+    config_file = environ.get('TASKFLOW_DB_CONFIG')
+    if config_file:
+        with open(config_file, encoding='utf-8') as f:
+            config = json.load(f)
+        pragmas.update(config.get('pragmas', {}))
+        interval = float(config.get('checkpoint_interval', interval))
+
+    for name in DEFAULT_PRAGMAS:
+        value = environ.get('TASKFLOW_' + name.upper())
+        if value is not None:
+            pragmas[name] = value
+    if 'TASKFLOW_CHECKPOINT_INTERVAL' in environ:
+        interval = float(environ['TASKFLOW_CHECKPOINT_INTERVAL'])
+
+    for name, value in pragmas.items():
+        if name not in DEFAULT_PRAGMAS:
+            raise ValueError('unsupported pragma in TaskFlow config: %r' % name)
+        if not str(value).lstrip('-').isalnum():
+            raise ValueError('bad value for pragma %s: %r' % (name, value))
+    return pragmas, interval
+
+PRAGMAS, CHECKPOINT_INTERVAL = load_db_config()
+
+def apply_pragmas(conn, pragmas=None):
+    """Run the performance profile PRAGMAs on a fresh connection."""
+    for name, value in (pragmas or PRAGMAS).items():
+        conn.execute('PRAGMA %s = %s' % (name, value))
+
+class Checkpointer(threading.Thread):
+    """Background thread that checkpoints the WAL so it doesn't grow unbounded.
+
+    Uses PASSIVE mode, so it never waits on readers or blocks writers.
+    """
+
+    def __init__(self, pool, interval):
+        super().__init__(name='taskflow-checkpointer', daemon=True)
+        self.pool = pool
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                with self.pool.connection() as conn:
+                    conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            except Exception:
+                pass  # the next tick will try again
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=5)
+
+_pool = None
+_checkpointer = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the shared connection pool, creating it on first use."""
+    global _pool, _checkpointer
+    if _pool is None or _pool.db_file != DB_FILE:
+        with _pool_lock:
+            if _pool is None or _pool.db_file != DB_FILE:
+                _shutdown_pool()
+                _pool = ConnectionPool(DB_FILE, size=POOL_SIZE, on_connect=apply_pragmas,
+                                       on_release=_transaction_ended)
+                if str(PRAGMAS.get('journal_mode')).lower() == 'wal' and CHECKPOINT_INTERVAL > 0:
+                    _checkpointer = Checkpointer(_pool, CHECKPOINT_INTERVAL)
+                    _checkpointer.start()
+    return _pool
+
+POOL_CONNECTIONS = metrics.Gauge(
+    'taskflow_db_pool_connections', 'Pooled SQLite connections, by state.', ['state'])
+for _state in ('open', 'idle', 'in_use'):
+    POOL_CONNECTIONS.labels(_state).set_function(
+        lambda state=_state: _pool.stats()[state] if _pool is not None else 0)
+metrics.Gauge('taskflow_db_pool_size', 'Most connections the pool will open.').set_function(
+    lambda: POOL_SIZE)
+
+def _shutdown_pool():
+    global _pool, _checkpointer
+    if _checkpointer is not None:
+        _checkpointer.stop()
+        _checkpointer = None
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+def close_pool():
+    """Flush queued writes and close every pooled connection (call on shutdown)."""
+    disable_group_commit()
+    with _pool_lock:
+        _shutdown_pool()
+
+# Bumped after every committed write made through this module, so readers
+# (e.g. the server's response cache) can tell when cached results are stale.
+_write_generation = 0
+_generation_lock = threading.Lock()
+
+def _bump_generation():
+    global _write_generation
+    with _generation_lock:
+        _write_generation += 1
+
+# Connections with uncommitted writes, mapped to the assignees whose task
+# lists those writes touched. _transaction_ended() settles each entry once
+# the outermost transaction on that connection commits or rolls back.
+_touched_assignees = {}
+_touched_lock = threading.Lock()
+
+def _touch(conn, *assignees):
+    """Note that `conn` has written (to these assignees' tasks, if any)."""
+    with _touched_lock:
+        _touched_assignees.setdefault(conn, set()).update(assignees)
+
+def _transaction_ended(conn, committed):
+    """Drop cached task lists and bump the generation once writes commit."""
+    with _touched_lock:
+        assignees = _touched_assignees.pop(conn, None)
+    if committed and assignees is not None:
+        if assignees:
+            invalidate_user_tasks(assignees)
+        _bump_generation()
+
+def data_version():
+    """A value that changes whenever the task data may have changed.
+
+    Combines this process's write counter with the size/mtime of the database
+    file and its WAL, so writes from other processes (like `database.py
+    import`) are noticed too.
+    """
+    stamps = []
+    for path in (DB_FILE, DB_FILE + '-wal'):
+        try:
+            st = os.stat(path)
+            stamps.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamps.append(None)
+    return (_write_generation, DB_FILE, tuple(stamps))
 
 def init_db():
-    """Create the database and tables if they don't exist."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT DEFAULT '',
-            completed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            assigned_to TEXT DEFAULT ''
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT NOT NULL,
-            role TEXT DEFAULT 'developer'
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
-    print("Database initialized!")
-
-def add_task(title, description='', assigned_to=''):
-    """Add a new task to the database."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute(
-        'INSERT INTO tasks (title, description, assigned_to) VALUES (?, ?, ?)',
-        (title, description, assigned_to)
-    )
-    conn.commit()
-    conn.close()
+    """Create the database and bring its schema up to date."""
+    with get_pool().connection() as conn:
+        applied = migrations.migrate(conn)
+    if applied:
+        print("Database initialized! (schema v%d)" % migrations.LATEST_VERSION)
+    else:
+        print("Database initialized!")
+
+@_timed('add_task')
+def add_task(title, description='', assigned_to='', completed=False):
+    """Add a new task to the database; returns its id."""
+    return _write(_insert_task, title, description, assigned_to, completed)
+
+def _insert_task(conn, title, description, assigned_to, completed):
+    if completed:
+        cursor = conn.execute(
+            'INSERT INTO tasks (title, description, assigned_to, completed) VALUES (?, ?, ?, 1)',
+            (title, description, assigned_to))
+    else:
+        cursor = conn.execute(INSERT_TASK_SQL, (title, description, assigned_to))
+    _touch(conn, assigned_to)
+    return cursor.lastrowid
+
+# Group commit. When enabled, add_task/update_task calls from many threads
+# are queued and committed together in one transaction, closed after
+# GROUP_COMMIT_MAX_ITEMS writes or GROUP_COMMIT_MAX_DELAY_MS, whichever comes
+# first. Each caller still blocks until the transaction holding its write has
+# committed. The default delay of 0 batches whatever piled up while the last
+# commit ran; a longer delay buys bigger batches with extra write latency.
+GROUP_COMMIT = os.environ.get('TASKFLOW_GROUP_COMMIT', '0') not in ('0', '', 'false')
+GROUP_COMMIT_MAX_ITEMS = int(os.environ.get('TASKFLOW_GROUP_COMMIT_MAX_ITEMS', '256'))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('TASKFLOW_GROUP_COMMIT_MAX_DELAY_MS', '0'))
+
+GROUP_COMMIT_BATCH = metrics.Histogram(
+    'taskflow_group_commit_batch_size', 'Writes committed together by the group committer.',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+
+class GroupCommitter(threading.Thread):
+    """Background writer that batches queued writes into shared transactions."""
+
+    def __init__(self, max_items=GROUP_COMMIT_MAX_ITEMS, max_delay_ms=GROUP_COMMIT_MAX_DELAY_MS):
+        super().__init__(name='taskflow-group-commit', daemon=True)
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.batches = 0
+        self.writes = 0
+
+    def submit(self, func, *args):
+        """Queue `func(conn, *args)` and wait until its batch has committed.
+
+        Once stop() has been called the write runs in its own transaction on
+        the calling thread instead, since nothing is left to drain the queue.
+        """
+        with self._lock:
+            future = None if self._stopped else Future()
+            if future is not None:
+                self._queue.put((func, args, future))
+        if future is None:
+            with get_pool().connection() as conn:
+                result = func(conn, *args)
+                _touch(conn)
+            return result
+        return future.result()
+
+    def stop(self):
+        """Commit everything queued so far and end the thread."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(None)
+        self.join()
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_items:
+                # With no delay, still sweep up whatever queued while the
+                # previous batch was committing.
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        item = self._queue.get(timeout=timeout)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.flush(batch)
+
+    def flush(self, batch):
+        results = []
+        try:
+            with get_pool().connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                for func, args, future in batch:
+                    # A savepoint per write, so one bad write fails alone
+                    # instead of taking the whole batch down with it.
+                    conn.execute('SAVEPOINT queued_write')
+                    try:
+                        results.append((future, func(conn, *args), None))
+                        conn.execute('RELEASE queued_write')
+                        _touch(conn)
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO queued_write')
+                        conn.execute('RELEASE queued_write')
+                        results.append((future, None, e))
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        GROUP_COMMIT_BATCH.observe(len(batch))
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+_group_committer = None
+_group_commit_lock = threading.RLock()
 
+def enable_group_commit(max_items=None, max_delay_ms=None):
+    """Route add_task/update_task through a GroupCommitter from now on."""
+    global _group_committer, GROUP_COMMIT
+    committer = GroupCommitter(
+        GROUP_COMMIT_MAX_ITEMS if max_items is None else max_items,
+        GROUP_COMMIT_MAX_DELAY_MS if max_delay_ms is None else max_delay_ms)
+    committer.start()
+    # Stop the old committer outside the lock so its final flush doesn't
+    # hold up writers that are already queueing on the new one.
+    with _group_commit_lock:
+        old, _group_committer = _group_committer, committer
+        GROUP_COMMIT = True
+    if old is not None:
+        old.stop()
+
+def disable_group_commit():
+    """Flush anything queued and go back to one transaction per write."""
+    global _group_committer, GROUP_COMMIT
+    with _group_commit_lock:
+        old, _group_committer = _group_committer, None
+        GROUP_COMMIT = False
+    if old is not None:
+        old.stop()
+
+def _write(func, *args):
+    """Run a write either directly or through the group committer.
+
+    Writes made while this thread already holds a pooled connection stay in
+    that connection's transaction, so callers composing several operations
+    keep their all-or-nothing behaviour.
+    """
+    if GROUP_COMMIT and get_pool().current_connection() is None:
+        committer = _group_committer
+        if committer is None:
+            with _group_commit_lock:
+                if _group_committer is None:
+                    enable_group_commit()
+            committer = _group_committer
+        return committer.submit(func, *args)
+    with get_pool().connection() as conn:
+        result = func(conn, *args)
+        _touch(conn)
+    return result
+
+def _completed_flag(value):
+    """0 or 1 for a completed value from a dict, tuple or CSV cell."""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, (bool, int)) and value in (0, 1):
+        return int(value)
+    flag = str(value).strip().lower()
+    if flag in ('1', 'true', 'yes'):
+        return 1
+    if flag in ('0', 'false', 'no'):
+        return 0
+    raise ValueError('completed must be a boolean, not %r' % (value,))
+
+def _task_params(item):
+    """Turn a dict or (title, description, assigned_to[, completed]) tuple into insert params."""
+    if isinstance(item, dict):
+        title = item.get('title')
+        description = item.get('description') or ''
+        assigned_to = item.get('assigned_to') or ''
+        completed = item.get('completed')
+    elif isinstance(item, (tuple, list)):
+        item = tuple(item)
+        title = item[0] if item else None
+        description = item[1] if len(item) > 1 else ''
+        assigned_to = item[2] if len(item) > 2 else ''
+        completed = item[3] if len(item) > 3 else None
+    else:
+        raise ValueError('task must be an object or a (title, ...) row, not %r' % (item,))
+    if not title:
+        raise ValueError('task is missing a title: %r' % (item,))
+    return (title, description, assigned_to, _completed_flag(completed))
+
+@_timed('add_tasks')
+def add_tasks(tasks, chunk_size=BULK_CHUNK_SIZE, progress=None):
+    """Insert many tasks, one transaction per chunk; returns the new ids.
+
+    `tasks` can be any iterable (including a generator) of dicts or tuples.
+    Only one chunk is held in memory at a time. `progress`, if given, is
+    called with the running total after each chunk is committed.
+
+    Called while this thread's connection is already inside a transaction,
+    each chunk becomes a savepoint instead, and everything commits (or rolls
+    back) with that enclosing transaction.
+    """
+    ids = []
+    rows = (_task_params(item) for item in tasks)
+    with get_pool().connection() as conn:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            # BEGIN IMMEDIATE holds the write lock, so AUTOINCREMENT hands out
+            # one contiguous block of ids that we can read back from sqlite_sequence.
+            nested = conn.in_transaction
+            conn.execute('SAVEPOINT bulk_insert' if nested else 'BEGIN IMMEDIATE')
+            try:
+                before = conn.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+                conn.executemany(BULK_INSERT_TASK_SQL, chunk)
+                after = conn.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+                if nested:
+                    conn.execute('RELEASE bulk_insert')
+                else:
+                    conn.commit()
+            except BaseException:
+                if nested:
+                    conn.execute('ROLLBACK TO bulk_insert')
+                    conn.execute('RELEASE bulk_insert')
+                else:
+                    conn.rollback()
+                raise
+            _touch(conn, *{row[2] for row in chunk})
+            if not nested:
+                _transaction_ended(conn, True)
+            first = (before[0] if before else 0) + 1
+            ids.extend(range(first, after[0] + 1))
+            if progress:
+                progress(len(ids))
+    return ids
+
+def iter_task_file(path, position=None):
+    """Stream tasks from a .csv (with a header row) or .jsonl file.
+
+    If `position` is a dict, position['line'] is kept at the line number of
+    the task being read, for error messages.
+    """
+    if position is None:
+        position = {}
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            position['line'] = 1
+            for row in reader:
+                position['line'] = reader.line_num
+                yield row
+    else:
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                position['line'] = number
+                if line.strip():
+                    task = json.loads(line)
+                    if not isinstance(task, dict):
+                        raise ValueError('expected a JSON object, got %r' % (task,))
+                    yield task
+
+@_timed('get_all_tasks')
 def get_all_tasks():
     """Get all tasks from the database."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tasks ORDER BY created_at DESC')
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    with get_pool().connection() as conn:
+        cursor = conn.execute('SELECT * FROM tasks ORDER BY created_at DESC')
+        return cursor.fetchall()
+
+def task_to_dict(row):
+    """Turn a tasks row (in TASK_COLUMNS order) into a JSON-friendly dict."""
+    task = dict(zip(TASK_COLUMNS, row))
+    task['completed'] = bool(task['completed'])
+    return task
+
+def encode_cursor(row):
+    """Opaque page cursor for the (created_at, id) position of `row`."""
+    raw = '%s|%d' % (row[4], row[0])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, task_id = base64.urlsafe_b64decode(padded.encode()).decode().rsplit('|', 1)
+        return created_at, int(task_id)
+    except Exception:
+        raise ValueError('invalid cursor: %r' % cursor)
+
+_PAGE_SQL = 'SELECT %s FROM tasks ORDER BY created_at DESC, id DESC LIMIT ?' % ', '.join(TASK_COLUMNS)
+# "Everything after (created_at, id)" as two index seeks: the rest of the
+# cursor's own timestamp, then strictly older timestamps. A single
+# `created_at < ? OR (created_at = ? AND id < ?)` makes SQLite walk the index
+# from the top on every page, which is quadratic over a full scan (and bulk
+# imports put thousands of rows on one timestamp).
+_PAGE_AFTER_SQL = (
+    'SELECT * FROM ('
+    'SELECT {cols} FROM tasks WHERE created_at = ? AND id < ? ORDER BY id DESC LIMIT ?'
+    ') UNION ALL SELECT * FROM ('
+    'SELECT {cols} FROM tasks WHERE created_at < ? ORDER BY created_at DESC, id DESC LIMIT ?'
+    ') ORDER BY created_at DESC, id DESC LIMIT ?'
+).format(cols=', '.join(TASK_COLUMNS))
+
+def get_tasks_page(limit=PAGE_SIZE, cursor=None):
+    """Return (rows, next_cursor) for one page of tasks, newest first.
+
+    Pages are keyed on (created_at, id) rather than OFFSET, so every page
+    costs the same no matter how deep into the table it is. next_cursor
+    is None on the last page.
+    """
+    return _fetch_page(max(1, min(int(limit), MAX_PAGE_SIZE)), cursor)
+
+@_timed('fetch_page')
+def _fetch_page(limit, cursor):
+    with get_pool().connection() as conn:
+        if cursor:
+            created_at, task_id = decode_cursor(cursor)
+            n = limit + 1
+            rows = conn.execute(_PAGE_AFTER_SQL, (created_at, task_id, n, created_at, n, n)).fetchall()
+        else:
+            rows = conn.execute(_PAGE_SQL, (limit + 1,)).fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+_USER_TASKS_SQL = ('SELECT %s FROM tasks WHERE assigned_to = ? '
+                   'ORDER BY created_at DESC' % ', '.join(TASK_COLUMNS))
+_USER_TASKS_BY_STATE_SQL = ('SELECT %s FROM tasks WHERE assigned_to = ? AND completed = ? '
+                            'ORDER BY created_at DESC' % ', '.join(TASK_COLUMNS))
+
+# Dashboards ask for the same people's task lists over and over, so those
+# results are cached by (database, assignee, completed). Writes drop exactly
+# the lists they touch (see _touch); the TTL bounds staleness from writes
+# this process can't see, like another process importing tasks.
+USER_TASKS_CACHE_SIZE = int(os.environ.get('TASKFLOW_USER_CACHE_SIZE', '256'))
+USER_TASKS_CACHE_TTL = float(os.environ.get('TASKFLOW_USER_CACHE_TTL', '30'))
+USER_TASKS_CACHE_MAX_ROWS = int(os.environ.get('TASKFLOW_USER_CACHE_MAX_ROWS', '100000'))
+
+user_tasks_cache = LRUCache(USER_TASKS_CACHE_SIZE, USER_TASKS_CACHE_TTL,
+                            max_weight=USER_TASKS_CACHE_MAX_ROWS)
+
+metrics.Counter('taskflow_user_tasks_cache_hits_total',
+                'get_tasks_for_user() calls answered from the cache.').set_function(
+    lambda: user_tasks_cache.hits)
+metrics.Counter('taskflow_user_tasks_cache_misses_total',
+                'get_tasks_for_user() calls that went to SQLite.').set_function(
+    lambda: user_tasks_cache.misses)
+metrics.Gauge('taskflow_user_tasks_cache_entries', 'Task lists currently cached.').set_function(
+    lambda: len(user_tasks_cache))
+
+def invalidate_user_tasks(assignees):
+    """Forget the cached task lists of these assignees."""
+    user_tasks_cache.invalidate(
+        (DB_FILE, name, state) for name in assignees for state in (None, False, True))
+
+def get_tasks_for_user(assigned_to, completed=None):
+    """Tasks assigned to someone, newest first; optionally only open or done ones."""
+    if completed is not None:
+        completed = bool(completed)
+    key = (DB_FILE, assigned_to, completed)
+    rows = user_tasks_cache.get(key)
+    if rows is None:
+        token = user_tasks_cache.token()
+        rows = _query_tasks_for_user(assigned_to, completed)
+        user_tasks_cache.put(key, rows, token)
+    return list(rows)
+
+@_timed('tasks_for_user')
+def _query_tasks_for_user(assigned_to, completed):
+    with get_pool().connection() as conn:
+        if completed is None:
+            return tuple(conn.execute(_USER_TASKS_SQL, (assigned_to,)))
+        return tuple(conn.execute(_USER_TASKS_BY_STATE_SQL, (assigned_to, int(completed))))
+
+# Full-text search. Uses the tasks_fts index from migration 3 when this
+# SQLite has FTS5, and a (much slower) LIKE scan when it doesn't.
+SEARCH_LIMIT = 20
+# bm25 has to score every match before it can sort them, which for a word
+# found in half the tasks means scoring half the table. Rank only the newest
+# SEARCH_CANDIDATES matches instead, so common words stay fast.
+SEARCH_CANDIDATES = int(os.environ.get('TASKFLOW_SEARCH_CANDIDATES', '2000'))
+SNIPPET_WORDS = 12
+
+_SEARCH_SQL = '''
+    SELECT %s FROM (
+        SELECT rowid AS id, bm25(tasks_fts, 2.0, 1.0) AS score
+        FROM tasks_fts WHERE tasks_fts MATCH ?
+        ORDER BY rowid DESC LIMIT ?
+    ) AS matches JOIN tasks t ON t.id = matches.id
+    ORDER BY matches.score
+    LIMIT ?
+''' % ', '.join('t.' + c for c in TASK_COLUMNS)
+
+def search_terms(query):
+    """Split a free-text query into the words to look for."""
+    return re.findall(r'\w+', query)
+
+def fts_query(terms):
+    """FTS5 MATCH expression requiring every term.
+
+    Terms are quoted so user input can't inject FTS operators like OR or NEAR.
+    """
+    return ' '.join('"%s"' % term for term in terms)
+
+def _fold(word):
+    """Lower-case and strip accents, the way the unicode61 tokenizer compares words."""
+    decomposed = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def highlight(row, terms, words=SNIPPET_WORDS):
+    """A few words of the task's title or description with the matches in <mark>.
+
+    The snippet is HTML: task text is escaped, so only the <mark> tags are markup.
+    """
+    wanted = {_fold(term) for term in terms}
+    for text in (row[1], row[2] or ''):
+        tokens = re.findall(r'\w+|\W+', text)
+        # Whole words only, as FTS5 matches them ("cat" is not in "category").
+        hits = {i for i, token in enumerate(tokens) if _fold(token) in wanted}
+        if not hits:
+            continue
+        # Tokens alternate word / separator, so `words` words span twice as many tokens.
+        first = max(0, min(hits) - words // 2 * 2)
+        last = first + words * 2
+        parts = ['<mark>%s</mark>' % html.escape(tok) if i in hits else html.escape(tok)
+                 for i, tok in enumerate(tokens[first:last], start=first)]
+        return ('…' if first else '') + ''.join(parts).strip() + ('…' if last < len(tokens) else '')
+    return html.escape(row[1])
+
+def _has_search_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'").fetchone() is not None
+
+@_timed('search_tasks')
+def search_tasks(query, limit=SEARCH_LIMIT):
+    """Best matches for `query` in task titles and descriptions.
+
+    Returns rows in TASK_COLUMNS order plus a highlighted snippet. Without
+    FTS5 the LIKE fallback orders newest first instead of by relevance.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    with get_pool().connection() as conn:
+        if _has_search_index(conn):
+            rows = conn.execute(_SEARCH_SQL, (fts_query(terms), max(SEARCH_CANDIDATES, limit),
+                                              limit)).fetchall()
+        else:
+            rows = _like_search(conn, terms, limit)
+    return [row + (highlight(row, terms),) for row in rows]
+
+def _like_search(conn, terms, limit):
+    where = []
+    params = []
+    for term in terms:
+        # Terms are \w+ runs, so '_' is the only LIKE wildcard they can hold.
+        pattern = '%%%s%%' % term.replace('_', '\\_')
+        where.append("(title LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')")
+        params += [pattern, pattern]
+    sql = 'SELECT %s FROM tasks WHERE %s ORDER BY created_at DESC, id DESC LIMIT ?' % (
+        ', '.join(TASK_COLUMNS), ' AND '.join(where))
+    return conn.execute(sql, params + [limit]).fetchall()
+
+_GET_TASK_SQL = 'SELECT %s FROM tasks WHERE id = ?' % ', '.join(TASK_COLUMNS)
+
+@_timed('get_task')
+def get_task(task_id):
+    """Return one task row, or None."""
+    with get_pool().connection() as conn:
+        return conn.execute(_GET_TASK_SQL, (task_id,)).fetchone()
+
+def _update_sql(table, fields):
+    # Field names come from a fixed whitelist and are sorted, so there are only
+    # a handful of distinct statements and sqlite3's statement cache reuses them.
+    return 'UPDATE %s SET %s WHERE id = ?' % (table, ', '.join('%s = ?' % f for f in fields))
+
+@_timed('update_task')
+def update_task(task_id, **fields):
+    """Change some of a task's fields; returns the updated row, or None if missing."""
+    names = sorted(fields)
+    for name in names:
+        if name not in TASK_FIELDS:
+            raise ValueError('unknown task field: %s' % name)
+    if not names:
+        return get_task(task_id)
+    values = [int(fields[n]) if n == 'completed' else fields[n] for n in names]
+    return _write(_update_task, task_id, names, values)
+
+def _update_task(conn, task_id, names, values):
+    # The task may move between assignees, so both lists go stale.
+    old = conn.execute('SELECT assigned_to FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    if old is None:
+        return None
+    conn.execute(_update_sql('tasks', names), values + [task_id])
+    row = conn.execute(_GET_TASK_SQL, (task_id,)).fetchone()
+    _touch(conn, old[0], row[5])
+    return row
+
+@_timed('delete_task')
+def delete_task(task_id):
+    """Delete a task; returns True if it existed."""
+    return _write(_delete_task, task_id)
+
+def _delete_task(conn, task_id):
+    old = conn.execute('SELECT assigned_to FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    if old is None:
+        return False
+    conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+    _touch(conn, old[0])
+    return True
+
+def user_to_dict(row):
+    return dict(zip(USER_COLUMNS, row))
+
+_GET_USER_SQL = 'SELECT %s FROM users WHERE id = ?' % ', '.join(USER_COLUMNS)
+
+@_timed('add_user')
+def add_user(username, email, role='developer'):
+    """Add a user; raises sqlite3.IntegrityError if the username is taken."""
+    with get_pool().connection() as conn:
+        cursor = conn.execute('INSERT INTO users (username, email, role) VALUES (?, ?, ?)',
+                              (username, email, role))
+        user_id = cursor.lastrowid
+        _touch(conn)
+    return user_id
+
+@_timed('get_user')
+def get_user(user_id):
+    """Return one user row, or None."""
+    with get_pool().connection() as conn:
+        return conn.execute(_GET_USER_SQL, (user_id,)).fetchone()
+
+@_timed('get_all_users')
+def get_all_users():
+    """Get all users, ordered by username."""
+    with get_pool().connection() as conn:
+        return conn.execute('SELECT %s FROM users ORDER BY username' % ', '.join(USER_COLUMNS)).fetchall()
+
+@_timed('update_user')
+def update_user(user_id, **fields):
+    """Change some of a user's fields; returns the updated row, or None if missing."""
+    names = sorted(fields)
+    for name in names:
+        if name not in USER_FIELDS:
+            raise ValueError('unknown user field: %s' % name)
+    with get_pool().connection() as conn:
+        if names:
+            conn.execute(_update_sql('users', names), [fields[n] for n in names] + [user_id])
+            _touch(conn)
+        row = conn.execute(_GET_USER_SQL, (user_id,)).fetchone()
+    return row
+
+@_timed('delete_user')
+def delete_user(user_id):
+    """Delete a user; returns True if it existed."""
+    with get_pool().connection() as conn:
+        deleted = conn.execute('DELETE FROM users WHERE id = ?', (user_id,)).rowcount
+        _touch(conn)
+    return deleted > 0
+
+def iter_tasks(batch_size=500):
+    """Yield every task, newest first, as lists of at most `batch_size` rows.
+
+    Each batch is its own short query, so no connection is held while the
+    caller works through a batch.
+    """
+    cursor = None
+    while True:
+        rows, cursor = _fetch_page(batch_size, cursor)
+        if rows:
+            yield rows
+        if cursor is None:
+            break
+
+# Queries on the request path, with the index each one must use.
+# `python database.py check-plans` fails if any of them falls back to a table
+# scan or has to sort the rows it reads.
+HOT_QUERIES = [
+    ('newest tasks page', _PAGE_SQL, (50,), 'idx_tasks_created'),
+    ('next tasks page', _PAGE_AFTER_SQL, ('2024-01-01 00:00:00', 1, 50, '2024-01-01 00:00:00', 50, 50),
+     'idx_tasks_created'),
+    ('tasks for user', _USER_TASKS_SQL, ('Ahmed',), 'idx_tasks_assignee_created'),
+    ('open tasks for user', _USER_TASKS_BY_STATE_SQL, ('Ahmed', 0), 'idx_tasks_assignee'),
+    ('open tasks', 'SELECT id FROM tasks WHERE completed = 0 ORDER BY created_at DESC', (),
+     'idx_tasks_completed'),
+]
+
+def explain(sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query."""
+    return [row[3] for row in _query_plan(sql, params)]
+
+def _query_plan(sql, params=()):
+    with get_pool().connection() as conn:
+        return conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+
+def check_query_plans():
+    """Return a list of (name, plan) for hot queries not served by their index.
+
+    A query fails if it doesn't use the expected index, scans the whole
+    table, or sorts rows read from tasks (USE TEMP B-TREE) instead of
+    reading them in index order. Sorting the few rows of a LIMITed
+    subquery, as the UNION ALL in _PAGE_AFTER_SQL does, is fine.
+    """
+    problems = []
+    for name, sql, params, index in HOT_QUERIES:
+        rows = _query_plan(sql, params)
+        plan = [row[3] for row in rows]
+        uses_index = any(('INDEX %s ' % index) in step + ' ' for step in plan)
+        full_scan = any(step.startswith('SCAN tasks') and 'INDEX' not in step for step in plan)
+        # A temp B-tree sorts the output of its sibling steps.
+        sorts = any(row[3].startswith('USE TEMP B-TREE') and
+                    any(other[1] == row[1] and other[3].startswith(('SCAN tasks', 'SEARCH tasks'))
+                        for other in rows)
+                    for row in rows)
+        if not uses_index or full_scan or sorts:
+            problems.append((name, plan))
+    return problems
+
+def check_plans_cli(argv):
+    """`python database.py check-plans` — verify the hot queries use indexes."""
+    global DB_FILE
+    if argv:
+        DB_FILE = argv[0]
+    init_db()
+    for name, sql, params, index in HOT_QUERIES:
+        print("%-22s %s" % (name, ' / '.join(explain(sql, params))))
+    problems = check_query_plans()
+    close_pool()
+    for name, plan in problems:
+        print("NOT SERVED BY INDEX: %s -> %s" % (name, ' / '.join(plan)))
+    return 1 if problems else 0
+
+def import_tasks_cli(argv):
+    """`python database.py import FILE` — bulk-load tasks from CSV or JSONL."""
+    global DB_FILE
+    parser = argparse.ArgumentParser(prog='database.py import',
+                                     description='Bulk-import tasks from a CSV or JSONL file.')
+    parser.add_argument('file', help='.csv with title/description/assigned_to[/completed] columns, or .jsonl')
+    parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE,
+                        help='rows per transaction (default: %(default)s)')
+    parser.add_argument('--db', default=DB_FILE, help='database file (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    DB_FILE = args.db
+    init_db()
+
+    committed = [0]
+    position = {}
+
+    def progress(count):
+        committed[0] = count
+        sys.stderr.write('\r  imported %d tasks' % count)
+        sys.stderr.flush()
+
+    try:
+        ids = add_tasks(iter_task_file(args.file, position), chunk_size=args.chunk_size,
+                        progress=progress)
+    except (ValueError, csv.Error) as e:
+        # Chunks before the bad row are already committed; say so.
+        sys.stderr.write('\n%s:%s: %s\n' % (args.file, position.get('line', '?'), e))
+        sys.stderr.write('%d tasks were committed before the error (in chunks of %d); '
+                         'the rest were not imported.\n' % (committed[0], args.chunk_size))
+        close_pool()
+        return 1
+    sys.stderr.write('\n')
+    if ids:
+        print("Imported %d tasks (ids %d-%d)" % (len(ids), ids[0], ids[-1]))
+    else:
+        print("No tasks found in %s" % args.file)
+    close_pool()
+    return 0
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'import':
+        sys.exit(import_tasks_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'check-plans':
+        sys.exit(check_plans_cli(sys.argv[2:]))
+
     init_db()
     add_task("Set up CI/CD pipeline", "Configure GitHub Actions", "Ahmed")
     add_task("Write API tests", "Unit tests for all endpoints", "Ahmed")
     print("Sample tasks added!")
     print("All tasks:", get_all_tasks())
+    close_pool()
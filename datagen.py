@@ -0,0 +1,170 @@
+# Synthetic TaskFlow datasets
+#
+# Builds a `users` + `tasks` database of any size for benchmarks. The same
+# seed always gives the same database, so runs on different commits measure
+# the same data. Assignees follow a Zipf distribution: a few people own most
+# of the tasks and a long tail owns a handful each, like a real team.
+#
+#     python datagen.py --rows 1000000 --out data/tasks-1m.db
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import time
+from itertools import islice
+
+import database
+import migrations
+
+DEFAULT_SEED = 42
+DEFAULT_SKEW = 1.1
+CHUNK_SIZE = 10000
+
+COMMON_WORDS = ('login bug report page button fix update deploy server database cache '
+                'review test release docs api user email password search index build '
+                'mobile layout crash slow timeout payment invoice export import backup').split()
+SYLLABLES = 'ka lo mi ne ru sa ti vo ze pa da fe gi ho ju'.split()
+ROLES = ('developer', 'developer', 'developer', 'reviewer', 'manager', 'admin')
+START = datetime.datetime(2024, 1, 1)
+
+
+def zipf_cum_weights(n, skew=DEFAULT_SKEW):
+    """Cumulative weights for ranks 1..n with P(rank) proportional to 1/rank**skew."""
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** skew
+        cum_weights.append(total)
+    return cum_weights
+
+
+def vocabulary(rng, size=50000):
+    """COMMON_WORDS plus made-up words, most frequent first."""
+    words = list(COMMON_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def default_user_count(rows):
+    return max(10, min(rows // 200, 50000))
+
+
+def usernames(count):
+    return ['user%05d' % n for n in range(count)]
+
+
+def generate_users(count):
+    """Yield (username, email, role) rows; usernames are in popularity order."""
+    for n, name in enumerate(usernames(count)):
+        yield (name, '%s@taskflow.example' % name, ROLES[n % len(ROLES)])
+
+
+def generate_tasks(rows, users, seed=DEFAULT_SEED, skew=DEFAULT_SKEW):
+    """Yield (title, description, completed, created_at, assigned_to) rows.
+
+    created_at increases with the row number (a few tasks a minute), so the
+    newest-first listings page through the data the way they would in a
+    long-lived project.
+    """
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    word_weights = zipf_cum_weights(len(words), 1.0)
+    names = usernames(users)
+    user_weights = zipf_cum_weights(users, skew)
+    when = START
+    for n in range(rows):
+        when += datetime.timedelta(seconds=rng.randint(1, 40))
+        title = ' '.join(rng.choices(words, cum_weights=word_weights, k=rng.randint(3, 7)))
+        description = ' '.join(rng.choices(words, cum_weights=word_weights, k=rng.randint(8, 30)))
+        # Older tasks are more likely to be done.
+        completed = int(rng.random() < 0.8 - 0.6 * n / rows)
+        assignee = rng.choices(names, cum_weights=user_weights)[0]
+        yield (title, description, completed, when.strftime('%Y-%m-%d %H:%M:%S'), assignee)
+
+
+def build(db_file, rows, users=None, seed=DEFAULT_SEED, skew=DEFAULT_SKEW, progress=None):
+    """Create `db_file` (which must not exist yet) holding a synthetic dataset."""
+    if os.path.exists(db_file):
+        raise FileExistsError(db_file)
+    users = default_user_count(rows) if users is None else users
+    conn = sqlite3.connect(db_file)
+    try:
+        database.apply_pragmas(conn)
+        migrations.migrate(conn)
+        with conn:
+            conn.executemany('INSERT INTO users (username, email, role) VALUES (?, ?, ?)',
+                             generate_users(users))
+        tasks = generate_tasks(rows, users, seed, skew)
+        done = 0
+        while True:
+            chunk = list(islice(tasks, CHUNK_SIZE))
+            if not chunk:
+                break
+            with conn:
+                conn.executemany(
+                    'INSERT INTO tasks (title, description, completed, created_at, assigned_to) '
+                    'VALUES (?, ?, ?, ?, ?)', chunk)
+            done += len(chunk)
+            if progress:
+                progress(done)
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        conn.close()
+    return users
+
+
+def dataset_path(directory, rows, seed=DEFAULT_SEED, skew=DEFAULT_SKEW):
+    return os.path.join(directory, 'tasks-%d-s%d-z%g.db' % (rows, seed, skew))
+
+
+def cached_build(directory, rows, seed=DEFAULT_SEED, skew=DEFAULT_SKEW, progress=None):
+    """Path of a dataset in `directory`, generating it on first use."""
+    path = dataset_path(directory, rows, seed, skew)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        partial = path + '.partial'
+        for leftover in (partial, partial + '-wal', partial + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        build(partial, rows, seed=seed, skew=skew, progress=progress)
+        os.replace(partial, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic TaskFlow database')
+    parser.add_argument('--rows', type=int, default=100000, help='tasks to generate')
+    parser.add_argument('--users', type=int, help='users to generate (default: rows/200)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--skew', type=float, default=DEFAULT_SKEW,
+                        help='Zipf exponent of the assignee distribution (default: %(default)s)')
+    parser.add_argument('--out', required=True, help='database file to create')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    def progress(done):
+        sys.stderr.write('\r%d/%d tasks' % (done, args.rows))
+
+    try:
+        users = build(args.out, args.rows, args.users, args.seed, args.skew, progress)
+    except FileExistsError:
+        print('%s already exists' % args.out, file=sys.stderr)
+        return 1
+    sys.stderr.write('\n')
+    print('Wrote %d tasks and %d users to %s in %.1fs' % (
+        args.rows, users, args.out, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
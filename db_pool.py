@@ -0,0 +1,153 @@
+# Connection pool for TaskFlow
+# Keeps SQLite connections open between calls instead of reconnecting every time.
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolClosedError(Exception):
+    """Raised when borrowing from a pool that has been shut down."""
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections.
+
+    A thread that borrows a connection keeps using that same connection for
+    nested borrows, so helpers can call each other without deadlocking the
+    pool or splitting one unit of work across two transactions.
+
+    `on_connect(conn)` runs on every new connection. `on_release(conn,
+    committed)` runs when the outermost borrow of a connection ends, after
+    its transaction has been committed or rolled back, and before the
+    connection goes back to the pool.
+    """
+
+    def __init__(self, db_file, size=5, timeout=30.0, health_check_interval=60.0,
+                 on_connect=None, on_release=None):
+        self.db_file = db_file
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.on_connect = on_connect
+        self.on_release = on_release
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = set()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=self.timeout,
+                               check_same_thread=False)
+        if self.on_connect:
+            self.on_connect(conn)
+        with self._lock:
+            self._all.add(conn)
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._all.discard(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _acquire(self):
+        if self._closed:
+            raise PoolClosedError('connection pool is closed')
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeoutError(
+                'no free connection after %.1fs (pool size %d)' % (self.timeout, self.size))
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._is_healthy(conn, last_used):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, conn):
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+        self._slots.release()
+
+    def current_connection(self):
+        """The connection this thread is currently borrowing, or None."""
+        return getattr(self._local, 'conn', None)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success, rolls back on error."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        committed = False
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+            committed = True
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            try:
+                if self.on_release:
+                    self.on_release(conn, committed)
+            finally:
+                self._release(conn)
+
+    def stats(self):
+        """Return a snapshot of how many connections are open and idle."""
+        with self._lock:
+            total = len(self._all)
+        idle = self._idle.qsize()
+        return {'size': self.size, 'open': total, 'idle': idle, 'in_use': total - idle}
+
+    def close(self):
+        """Close idle connections now and borrowed ones as they come back."""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
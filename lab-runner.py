@@ -9,6 +9,8 @@ Usage:
     python lab-runner.py day 1        Jump to Day 1
     python lab-runner.py progress     See your progress
     python lab-runner.py reset        Reset all progress
+    python lab-runner.py grade DIR    Grade every learner sandbox in DIR (--help)
+    python lab-runner.py bench-git    Time the git backends and snapshot cache (forks, ms per lab)
 
 No dependencies required — just Python 3.7+ and Git.
 """
@@ -19,6 +21,19 @@ import subprocess
 import json
 import time
 import shutil
+import argparse
+import atexit
+import contextlib
+import csv
+import io
+import re
+import heapq
+import mmap
+import struct
+import tempfile
+import zlib
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 
 # ─── COLORS ────────────────────────────────────────────
 class C:
@@ -112,7 +127,26 @@ def get_rank():
     return "🌱 Seedling"
 
 # ─── GIT HELPERS ───────────────────────────────────────
+# Every git process we start, for bench-git (and anyone curious).
+GIT_STATS = {"forks": 0}
+# Commands that only look. Anything else may change the repo, so it drops
+# the cached snapshot (see REPO SNAPSHOTS below).
+READ_ONLY_GIT = {"status", "diff", "log", "show", "rev-list", "ls-files", "cat-file"}
+
+def git_writes(args):
+    """Could `git *args` change the repo? Reads of config and the reflog are fine."""
+    if not args:
+        return True
+    if args[0] == "config":
+        return not (len(args) == 2 or args[1] in ("--get", "--get-all", "--list", "-l"))
+    if args[0] == "reflog":
+        return len(args) > 1 and args[1] in ("expire", "delete")
+    return args[0] not in READ_ONLY_GIT
+
 def run_git(*args, cwd=None):
+    if git_writes(args):
+        invalidate_snapshot(cwd)
+    GIT_STATS["forks"] += 1
     try:
         result = subprocess.run(
             ["git"] + list(args),
@@ -139,32 +173,689 @@ def read_local_file(filename, cwd=None):
             return f.read().strip()
     return ""
 
-def write_local_file(filename, content, cwd=None):
+def write_local_file(filename, content, cwd=None, mode="w"):
     path = os.path.join(cwd or SANDBOX_DIR, filename)
     os.makedirs(os.path.dirname(path) if os.path.dirname(path) else (cwd or SANDBOX_DIR), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+    with open(path, mode, encoding="utf-8") as f:
         f.write(content)
+    invalidate_snapshot(cwd)  # `git status` changes with the worktree
 
+def remove_local_file(filename, cwd=None):
+    path = os.path.join(cwd or SANDBOX_DIR, filename)
+    if os.path.exists(path):
+        os.remove(path)
+    invalidate_snapshot(cwd)
+
+# Read-only questions about the repo, answered from the snapshot cache.
 def get_current_branch(cwd=None):
-    ok, out = run_git("branch", "--show-current", cwd=cwd)
-    return out.strip() if ok else ""
+    return snapshot_get(cwd, "branch", lambda b: b.current_branch())
 
 def get_branches(cwd=None):
-    ok, out = run_git("branch", cwd=cwd)
-    if ok:
-        return [b.strip().lstrip("* ") for b in out.strip().split("\n") if b.strip()]
-    return []
+    return snapshot_get(cwd, "branches", lambda b: b.branches())
 
 def get_commit_messages(count=5, cwd=None):
-    ok, out = run_git("log", f"--oneline", f"-{count}", cwd=cwd)
-    return out.strip() if ok else ""
+    return snapshot_get(cwd, ("log", count), lambda b: b.commit_messages(count))
 
 def get_commit_count(cwd=None):
-    ok, out = run_git("rev-list", "--count", "HEAD", cwd=cwd)
+    return snapshot_get(cwd, "count", lambda b: b.commit_count())
+
+def get_tracked_files(cwd=None):
+    return snapshot_get(cwd, "tracked", lambda b: b.tracked_files())
+
+def get_head_author(cwd=None):
+    return snapshot_get(cwd, "author", lambda b: b.head_author())
+
+def get_file_at_head(path, cwd=None):
+    return snapshot_get(cwd, ("file", path), lambda b: b.file_at_head(path))
+
+def get_reflog_messages(cwd=None):
+    return snapshot_get(cwd, "reflog", lambda b: b.reflog_messages())
+
+def get_status(cwd=None):
+    """(ok, output) of `git status`. Never cached: it depends on the worktree."""
+    return run_git("status", cwd=cwd)
+
+# ─── REPO SNAPSHOTS ────────────────────────────────────
+# Checking a sandbox asks the same questions again and again: every lab's
+# checks want the commit subjects, the count, the tracked files, and `grade`
+# checks all labs of a sandbox in one go. Inside a check pass
+#
+#     with check_pass(cwd):
+#         ...
+#
+# the git helpers remember their answers. The answers are kept under a key
+# made from the stat of .git/HEAD, the index, packed-refs, the HEAD reflog
+# and every loose ref. Git rewrites those files (new inode, new mtime)
+# whenever a ref, HEAD or the index moves. The key is taken once, when a
+# pass starts: a later pass over an unchanged repo reuses the answers, and a
+# changed key starts over. Outside a pass, the helpers just ask the backend.
+# A mutating run_git or write_local_file drops the answers, even mid-pass.
+#
+#     LAB_SNAPSHOT_CACHE=0 python lab-runner.py    (always ask the backend)
+SNAPSHOT_CACHE = os.environ.get("LAB_SNAPSHOT_CACHE", "1") != "0"
+SNAPSHOT_STATS = {"hits": 0, "misses": 0}
+_snapshots = {}        # repo path -> (key, answers)
+_passes = set()        # repo paths inside a check pass
+
+def _stat_key(path):
     try:
-        return int(out.strip()) if ok else 0
-    except:
-        return 0
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def snapshot_key(cwd):
+    git_dir = os.path.join(cwd, ".git")
+    key = [_stat_key(os.path.join(git_dir, name))
+           for name in ("HEAD", "index", "packed-refs", os.path.join("logs", "HEAD"))]
+    for root, dirs, files in os.walk(os.path.join(git_dir, "refs")):
+        dirs.sort()
+        for f in sorted(files):
+            path = os.path.join(root, f)
+            key.append((path, _stat_key(path)))
+    return tuple(key)
+
+@contextlib.contextmanager
+def check_pass(cwd=None):
+    """Cache git helper answers for `cwd` until the block ends (nests freely)."""
+    path = os.path.abspath(cwd or SANDBOX_DIR)
+    if not SNAPSHOT_CACHE or path in _passes:
+        yield
+        return
+    key = snapshot_key(path)
+    snapshot = _snapshots.get(path)
+    if snapshot is None or snapshot[0] != key:
+        _snapshots[path] = (key, {})
+    _passes.add(path)
+    try:
+        yield
+    finally:
+        _passes.discard(path)
+
+def snapshot_get(cwd, question, ask):
+    """The remembered answer to `question` inside a check pass, else ask(backend)."""
+    path = os.path.abspath(cwd or SANDBOX_DIR)
+    snapshot = _snapshots.get(path) if path in _passes else None
+    if snapshot is None:
+        return ask(git_backend(path))
+    answers = snapshot[1]
+    if question in answers:
+        SNAPSHOT_STATS["hits"] += 1
+    else:
+        SNAPSHOT_STATS["misses"] += 1
+        answers[question] = ask(git_backend(path))
+    answer = answers[question]
+    return list(answer) if isinstance(answer, list) else answer
+
+def invalidate_snapshot(cwd=None):
+    _snapshots.pop(os.path.abspath(cwd or SANDBOX_DIR), None)
+
+# ─── GIT READER ────────────────────────────────────────
+# Just enough of the .git format to answer lab checks without running git:
+# refs, packed-refs, loose objects, pack files (v2 .idx, deltas) and the
+# index. Read-only; anything it doesn't understand raises ValueError so the
+# caller can ask git instead. Truncated or corrupt files can also surface as
+# struct.error, IndexError or zlib.error from the parsers: GIT_READ_ERRORS.
+GIT_READ_ERRORS = (OSError, ValueError, zlib.error, struct.error, IndexError)
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA, REF_DELTA = 6, 7
+
+class GitPack:
+    """One objects/pack/pack-*.pack with its .idx, both memory-mapped."""
+
+    def __init__(self, idx_path):
+        self.idx_path = idx_path
+        self._files = []
+        self.idx = self._map(idx_path)
+        if self.idx[:8] != b"\377tOc\x00\x00\x00\x02":
+            raise ValueError(f"unsupported pack index {idx_path}")
+        self.fanout = struct.unpack_from(">256I", self.idx, 8)
+        self.count = self.fanout[255]
+        self.names_at = 8 + 256 * 4
+        self.offsets_at = self.names_at + self.count * 24      # past names and CRCs
+        self.large_at = self.offsets_at + self.count * 4
+        self.pack = self._map(idx_path[:-4] + ".pack")
+
+    def _map(self, path):
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append(data)
+        return data
+
+    def find(self, sha):
+        """Offset of the object with binary id `sha` in the pack, or None."""
+        first = self.fanout[sha[0] - 1] if sha[0] else 0
+        last = self.fanout[sha[0]]
+        names = _IdxNames(self.idx, self.names_at)
+        i = bisect_left(names, sha, first, last)
+        if i == last or names[i] != sha:
+            return None
+        offset = struct.unpack_from(">I", self.idx, self.offsets_at + i * 4)[0]
+        if offset & 0x80000000:
+            offset = struct.unpack_from(">Q", self.idx, self.large_at + (offset & 0x7fffffff) * 8)[0]
+        return offset
+
+    def close(self):
+        for data in self._files:
+            data.close()
+        self._files = []
+
+class _IdxNames:
+    """The sorted object-id table of a pack index, indexable for bisect."""
+
+    def __init__(self, idx, start):
+        self.idx = idx
+        self.start = start
+
+    def __getitem__(self, i):
+        at = self.start + i * 20
+        return self.idx[at:at + 20]
+
+class GitRepo:
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+        self.objects_dir = os.path.join(git_dir, "objects")
+        self._packs = {}
+        self._cache = {}     # recently read objects, mostly delta bases
+
+    # Refs
+    def read_file(self, name):
+        with open(os.path.join(self.git_dir, name), "r", encoding="utf-8") as f:
+            return f.read().strip()
+
+    def packed_refs(self):
+        refs = {}
+        path = os.path.join(self.git_dir, "packed-refs")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and line[0] not in "#^":
+                        oid, _, name = line.partition(" ")
+                        refs[name] = oid
+        return refs
+
+    def resolve(self, name):
+        """Follow `name` (e.g. HEAD) to an object id; None if it doesn't exist yet."""
+        for _ in range(10):
+            if os.path.isfile(os.path.join(self.git_dir, name)):
+                value = self.read_file(name)
+            else:
+                value = self.packed_refs().get(name)
+            if not value:
+                return None
+            if not value.startswith("ref: "):
+                return value
+            name = value[5:].strip()
+        raise ValueError("symbolic ref loop at " + name)
+
+    def branch_names(self):
+        names = set(name[len("refs/heads/"):] for name in self.packed_refs()
+                    if name.startswith("refs/heads/"))
+        heads = os.path.join(self.git_dir, "refs", "heads")
+        for root, _, files in os.walk(heads):
+            for f in files:
+                names.add(os.path.relpath(os.path.join(root, f), heads).replace(os.sep, "/"))
+        return sorted(names, key=lambda n: n.encode("utf-8"))
+
+    def reflog_messages(self, ref="HEAD"):
+        """Messages of `ref`'s reflog, newest first."""
+        path = os.path.join(self.git_dir, "logs", ref)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return [line.rstrip("\n").partition("\t")[2] for line in reversed(f.readlines())]
+
+    # Objects
+    def read_object(self, oid):
+        """(type, contents) of object `oid` (40 hex digits)."""
+        obj = self._cache.get(oid)
+        if obj is not None:
+            return obj
+        path = os.path.join(self.objects_dir, oid[:2], oid[2:])
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                raw = zlib.decompress(f.read())
+            header, _, data = raw.partition(b"\0")
+            obj = (header.split(b" ")[0].decode("ascii"), data)
+        else:
+            sha = bytes.fromhex(oid)
+            found = self._find_packed(sha)
+            if found is None:
+                self._scan_packs()  # maybe a gc or commit packed it since
+                found = self._find_packed(sha)
+            if found is None:
+                raise ValueError(f"object {oid} not found")
+            obj = self._read_packed(*found)
+        if len(self._cache) >= 256:
+            self._cache.clear()
+        self._cache[oid] = obj
+        return obj
+
+    def _scan_packs(self):
+        pack_dir = os.path.join(self.objects_dir, "pack")
+        current = set()
+        if os.path.isdir(pack_dir):
+            current = set(os.path.join(pack_dir, f) for f in os.listdir(pack_dir)
+                          if f.endswith(".idx") and os.path.exists(os.path.join(pack_dir, f[:-4] + ".pack")))
+        for path in list(self._packs):
+            if path not in current:
+                self._packs.pop(path).close()
+        for path in current - set(self._packs):
+            self._packs[path] = GitPack(path)
+
+    def _find_packed(self, sha):
+        if not self._packs:
+            self._scan_packs()
+        for pack in self._packs.values():
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack, offset
+        return None
+
+    def _read_packed(self, pack, offset):
+        data = pack.pack
+        c = data[offset]
+        kind = (c >> 4) & 7
+        pos = offset + 1
+        shift = 4
+        while c & 0x80:
+            c = data[pos]
+            pos += 1
+            shift += 7
+        if kind == OFS_DELTA:
+            c = data[pos]
+            pos += 1
+            back = c & 0x7f
+            while c & 0x80:
+                c = data[pos]
+                pos += 1
+                back = ((back + 1) << 7) | (c & 0x7f)
+            base_type, base = self._read_packed(pack, offset - back)
+        elif kind == REF_DELTA:
+            base_type, base = self.read_object(data[pos:pos + 20].hex())
+            pos += 20
+        elif kind in OBJECT_TYPES:
+            return OBJECT_TYPES[kind], self._inflate(data, pos)
+        else:
+            raise ValueError(f"bad object type {kind} in {pack.idx_path}")
+        return base_type, apply_delta(base, self._inflate(data, pos))
+
+    @staticmethod
+    def _inflate(data, pos):
+        d = zlib.decompressobj()
+        out = []
+        while not d.eof:
+            chunk = data[pos:pos + 16384]
+            if not chunk:
+                raise ValueError("truncated pack")
+            out.append(d.decompress(chunk))
+            pos += len(chunk)
+        return b"".join(out)
+
+    # Index
+    def index_paths(self):
+        """Paths in .git/index, in index order (like ls-files: a conflict has one per stage)."""
+        path = os.path.join(self.git_dir, "index")
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            data = f.read()
+        signature, version, count = struct.unpack_from(">4sII", data, 0)
+        if signature != b"DIRC" or version not in (2, 3, 4):
+            raise ValueError(f"unsupported index version {version}")
+        paths = []
+        pos = 12
+        previous = b""
+        for _ in range(count):
+            flags = struct.unpack_from(">H", data, pos + 60)[0]  # after stat data and id
+            start = pos
+            pos += 62
+            if version >= 3 and flags & 0x4000:
+                pos += 2
+            if version == 4:
+                c = data[pos]
+                pos += 1
+                strip = c & 0x7f
+                while c & 0x80:
+                    c = data[pos]
+                    pos += 1
+                    strip = ((strip + 1) << 7) | (c & 0x7f)
+                end = data.index(b"\0", pos)
+                name = previous[:len(previous) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b"\0", pos)
+                name = data[pos:end]
+                pos = start + ((end - start) // 8 + 1) * 8
+            previous = name
+            paths.append(name)
+        return [name.decode("utf-8", errors="surrogateescape") for name in paths]
+
+    def close(self):
+        for pack in self._packs.values():
+            pack.close()
+        self._packs = {}
+        self._cache = {}
+
+def tree_entries(data):
+    """{name: object id} of a raw tree object."""
+    entries = {}
+    pos = 0
+    while pos < len(data):
+        space = data.index(b" ", pos)
+        nul = data.index(b"\0", space)
+        entries[data[space + 1:nul]] = data[nul + 1:nul + 21].hex()
+        pos = nul + 21
+    return entries
+
+def apply_delta(base, delta):
+    """Rebuild an object from its base and a pack delta."""
+    pos = 0
+    for _ in range(2):  # base size, then result size; we only need to skip them
+        while delta[pos] & 0x80:
+            pos += 1
+        pos += 1
+    out = []
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for bit in range(4):
+                if op & (1 << bit):
+                    offset |= delta[pos] << (8 * bit)
+                    pos += 1
+            for bit in range(3):
+                if op & (0x10 << bit):
+                    size |= delta[pos] << (8 * bit)
+                    pos += 1
+            out.append(base[offset:offset + (size or 0x10000)])
+        elif op:
+            out.append(delta[pos:pos + op])
+            pos += op
+        else:
+            raise ValueError("bad delta opcode")
+    return b"".join(out)
+
+# ─── GIT BACKENDS ──────────────────────────────────────
+# The read-only queries above go through a backend:
+#   native      reads everything from .git in Python (GitRepo); no processes
+#   batch       refs and index from .git, commits from one long-lived
+#               `git cat-file --batch` per sandbox
+#   subprocess  one git per query, as before
+# Checking a whole cohort then doesn't pay a fork per question. Anything
+# that changes the repo still goes through run_git.
+#
+#     LAB_GIT_BACKEND=subprocess python lab-runner.py
+
+class SubprocessGitBackend:
+    name = "subprocess"
+
+    def __init__(self, cwd):
+        self.cwd = cwd
+
+    def current_branch(self):
+        ok, out = run_git("branch", "--show-current", cwd=self.cwd)
+        return out.strip() if ok else ""
+
+    def branches(self):
+        ok, out = run_git("branch", cwd=self.cwd)
+        if ok:
+            return [b.strip().lstrip("* ") for b in out.strip().split("\n") if b.strip()]
+        return []
+
+    def commit_messages(self, count=5):
+        ok, out = run_git("log", f"--oneline", f"-{count}", cwd=self.cwd)
+        return out.strip() if ok else ""
+
+    def commit_count(self):
+        ok, out = run_git("rev-list", "--count", "HEAD", cwd=self.cwd)
+        try:
+            return int(out.strip()) if ok else 0
+        except:
+            return 0
+
+    def tracked_files(self):
+        ok, out = run_git("ls-files", "-z", cwd=self.cwd)
+        return [f for f in out.split("\0") if f] if ok else []
+
+    def head_author(self):
+        ok, out = run_git("log", "-1", "--format=%an <%ae>", cwd=self.cwd)
+        return out.strip() if ok else ""
+
+    def file_at_head(self, path):
+        """Contents of `path` as committed at HEAD, or None."""
+        ok, out = run_git("cat-file", "-p", f"HEAD:{path}", cwd=self.cwd)
+        return out if ok else None
+
+    def reflog_messages(self):
+        """HEAD's reflog messages, newest first."""
+        ok, out = run_git("reflog", "--format=%gs", cwd=self.cwd)
+        return out.splitlines() if ok else []
+
+    def close(self):
+        pass
+
+class BatchGitBackend(SubprocessGitBackend):
+    name = "batch"
+    # Requests written before reading any answers. Commits are a few hundred
+    # bytes, so a batch stays well inside the pipe buffers.
+    PIPELINE_DEPTH = 64
+
+    def __init__(self, cwd):
+        super().__init__(cwd)
+        self.git_dir = os.path.join(cwd, ".git")
+        self.repo = GitRepo(self.git_dir)
+        self._proc = None
+        self._git_dir_id = None
+
+    # Anything unexpected (no repo yet, a worktree .git file, a format we
+    # don't read) and we answer the way the subprocess backend would.
+    def current_branch(self):
+        return self._or_fallback(self._current_branch, super().current_branch)
+
+    def branches(self):
+        return self._or_fallback(self._branches, super().branches)
+
+    def commit_messages(self, count=5):
+        return self._or_fallback(lambda: self._commit_messages(count),
+                                 lambda: super(BatchGitBackend, self).commit_messages(count))
+
+    def commit_count(self):
+        return self._or_fallback(self._commit_count, super().commit_count)
+
+    def tracked_files(self):
+        return self._or_fallback(self.repo.index_paths, super().tracked_files)
+
+    def head_author(self):
+        return self._or_fallback(self._head_author, super().head_author)
+
+    def file_at_head(self, path):
+        return self._or_fallback(lambda: self._file_at_head(path),
+                                 lambda: super(BatchGitBackend, self).file_at_head(path))
+
+    def reflog_messages(self):
+        return self._or_fallback(self.repo.reflog_messages, super().reflog_messages)
+
+    def _or_fallback(self, fast, slow):
+        try:
+            return fast()
+        except GIT_READ_ERRORS:
+            self.close()
+            return slow()
+
+    def _current_branch(self):
+        head = self.repo.read_file("HEAD")
+        if head.startswith("ref: refs/heads/"):
+            return head[len("ref: refs/heads/"):]
+        return ""  # detached
+
+    def _branches(self):
+        if not self.repo.read_file("HEAD").startswith("ref: "):
+            raise ValueError("detached HEAD")  # `git branch` lists it; let git say how
+        return self.repo.branch_names()
+
+    def _head_author(self):
+        head = self.repo.resolve("HEAD")
+        if head is None:
+            return ""
+        for line in self._read_commits([head])[0].split(b"\n"):
+            if line.startswith(b"author "):
+                return line[7:].rsplit(b" ", 2)[0].decode("utf-8", errors="replace")
+            if not line:
+                break
+        return ""
+
+    def _file_at_head(self, path):
+        oid = self.repo.resolve("HEAD")
+        if oid is None:
+            return None
+        kind = "commit"
+        for name in path.strip("/").split("/"):
+            kind, data = self.read_objects([oid])[0]
+            if kind == "commit":
+                oid = data.split(b"\n", 1)[0].split(b" ")[1].decode("ascii")  # "tree <id>"
+                kind, data = self.read_objects([oid])[0]
+            if kind != "tree":
+                return None
+            oid = tree_entries(data).get(name.encode("utf-8"))
+            if oid is None:
+                return None
+        kind, data = self.read_objects([oid])[0]
+        return data.decode("utf-8", errors="replace") if kind == "blob" else None
+
+    # Objects: from the cat-file process.
+    def _process(self):
+        st = os.stat(self.git_dir)
+        if self._proc is not None and (self._proc.poll() is not None
+                                       or self._git_dir_id != (st.st_dev, st.st_ino)):
+            self.close()  # died, or the sandbox was recreated under us
+        if self._proc is None:
+            GIT_STATS["forks"] += 1
+            self._proc = subprocess.Popen(
+                ["git", "cat-file", "--batch"], cwd=self.cwd,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            self._git_dir_id = (st.st_dev, st.st_ino)
+        return self._proc
+
+    def read_objects(self, oids):
+        """(type, contents) of each object in `oids`, written as one pipelined batch."""
+        proc = self._process()
+        contents = []
+        for i in range(0, len(oids), self.PIPELINE_DEPTH):
+            chunk = oids[i:i + self.PIPELINE_DEPTH]
+            proc.stdin.write("".join(oid + "\n" for oid in chunk).encode("ascii"))
+            proc.stdin.flush()
+            for oid in chunk:
+                header = proc.stdout.readline().split()
+                if len(header) != 3:
+                    raise ValueError(f"cat-file could not read {oid}")
+                data = proc.stdout.read(int(header[2]) + 1)[:-1]
+                contents.append((header[1].decode("ascii"), data))
+        return contents
+
+    def _read_commits(self, oids):
+        commits = []
+        for oid, (kind, data) in zip(oids, self.read_objects(oids)):
+            if kind != "commit":
+                raise ValueError(f"{oid} is a {kind}, not a commit")
+            commits.append(data)
+        return commits
+
+    @staticmethod
+    def _parse_commit(data):
+        """(parents, commit time, message) of a raw commit object."""
+        headers, _, message = data.partition(b"\n\n")
+        parents = []
+        when = 0
+        for line in headers.split(b"\n"):
+            if line.startswith(b"parent "):
+                parents.append(line[7:].decode("ascii"))
+            elif line.startswith(b"committer "):
+                when = int(line.rsplit(b" ", 2)[1])
+        return parents, when, message.decode("utf-8", errors="replace")
+
+    def _commit_messages(self, count):
+        # git log's default order: newest commit date first across all
+        # branches of the history walked so far.
+        head = self.repo.resolve("HEAD")
+        if head is None:
+            return ""
+        lines = []
+        seen = {head}
+        queue = []
+        pending = [head]
+        while len(lines) < count and (pending or queue):
+            for oid, data in zip(pending, self._read_commits(pending)):
+                parents, when, message = self._parse_commit(data)
+                heapq.heappush(queue, (-when, len(seen), oid, parents, message))
+                seen.add(oid)
+            pending = []
+            _, _, oid, parents, message = heapq.heappop(queue)
+            subject = " ".join(l.strip() for l in message.strip().split("\n\n")[0].split("\n"))
+            lines.append(f"{oid[:7]} {subject}")
+            for parent in parents:
+                if parent not in seen:
+                    seen.add(parent)
+                    pending.append(parent)
+        return "\n".join(lines)
+
+    def _commit_count(self):
+        # Walk a generation at a time, so merges fetch all their parents in
+        # one round trip.
+        head = self.repo.resolve("HEAD")
+        if head is None:
+            return 0
+        seen = {head}
+        frontier = [head]
+        while frontier:
+            found = []
+            for data in self._read_commits(frontier):
+                for parent in self._parse_commit(data)[0]:
+                    if parent not in seen:
+                        seen.add(parent)
+                        found.append(parent)
+            frontier = found
+        return len(seen)
+
+    def close(self):
+        self.repo.close()
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=5)
+            except Exception:
+                self._proc.kill()
+            self._proc = None
+
+class NativeGitBackend(BatchGitBackend):
+    name = "native"
+
+    def read_objects(self, oids):
+        return [self.repo.read_object(oid) for oid in oids]
+
+GIT_BACKENDS = {"subprocess": SubprocessGitBackend, "batch": BatchGitBackend, "native": NativeGitBackend}
+GIT_BACKEND = os.environ.get("LAB_GIT_BACKEND", "native")
+_git_backends = {}
+
+def git_backend(cwd=None):
+    """The backend for the repo in `cwd` (default: the sandbox), kept per repo."""
+    path = os.path.abspath(cwd or SANDBOX_DIR)
+    backend = _git_backends.get(path)
+    if backend is None or backend.name != GIT_BACKEND:
+        if backend is not None:
+            backend.close()
+        backend = _git_backends[path] = GIT_BACKENDS[GIT_BACKEND](path)
+    return backend
+
+def close_git_backends():
+    for backend in _git_backends.values():
+        backend.close()
+    _git_backends.clear()
+    _snapshots.clear()
+
+atexit.register(close_git_backends)
 
 # ─── SAVE / LOAD ──────────────────────────────────────
 def save():
@@ -184,6 +875,7 @@ def reset():
     state = {"xp": 0, "day": 1, "lab": 1, "achievements": [], "completed_labs": [], "rank": "Seedling"}
     if os.path.exists(SAVE_FILE):
         os.remove(SAVE_FILE)
+    close_git_backends()
     if os.path.exists(SANDBOX_DIR):
         shutil.rmtree(SANDBOX_DIR)
 
@@ -250,312 +942,278 @@ def setup_sandbox():
             '        completed BOOLEAN DEFAULT 0\n    )""")\n    conn.commit()\n    conn.close()\n\n'
             'if __name__ == "__main__":\n    init_db()\n    print("Database ready!")\n')
 
-# ═══════════════════════════════════════════════════════
-# DAY 1: FIRST DAY AT WORK
-# ═══════════════════════════════════════════════════════
-def day_1():
-    clear()
-    banner("DAY 1: FIRST DAY AT WORK  🌱  300 XP")
-
-    print(f"""
-  {C.DIM}  Monday morning. You walk into TechCorp's office.
-  The coffee machine is broken. Omar has already accidentally
-  deleted a folder. Sara walks over and says:{C.RESET}
-
-  {C.BOLD}  "Welcome to the team. First things first — 
-   let's get you set up with Git."{C.RESET}
-""")
-    pause()
-
-    # ─── LAB 1: Identity Setup ───
-    clear()
-    banner("DAY 1 — LAB 1: IDENTITY SETUP  (10 XP)")
-    mission("Tell Git who you are.")
-
-    story('"Git needs to know who you are. Every commit')
-    story(' you make will have your name on it — forever."')
-    story(' — Sara')
-
-    instruction("Set your name (use YOUR actual name):")
-    show_command('git config --global user.name "Your Name"')
-
-    while True:
-        cmd = wait_for_command()
-        if cmd.startswith("git config") and "user.name" in cmd:
-            os.system(cmd)
-            success("Name configured!")
-            award_xp(5, "Identity: name")
-            break
-        else:
-            hint('Type: git config --global user.name "Your Name"')
-
-    instruction("Now set your email:")
-    show_command('git config --global user.email "you@example.com"')
-
+# ─── LAB ENGINE ────────────────────────────────────────
+# Labs are data: what to type (a regex over the learner's command), what it
+# does, the XP it's worth, and post-conditions on the repo once the lab is
+# done. The same definitions drive the interactive days and `grade`.
+#
+# Post-conditions are (kind, args...) tuples, compiled once:
+#   ("repo",)                     the sandbox is a git repository
+#   ("identity",)                 HEAD's author has a real name/email (while a learner
+#                                 works through a lab, git config counts until the
+#                                 first commit; the grader only trusts commits)
+#   ("min_commits", n)            HEAD has at least n commits
+#   ("first_subject", regex)      the root commit's subject matches
+#   ("subject", regex)            some commit subject on HEAD matches
+#   ("no_subject", regex)         no commit subject on HEAD matches
+#   ("committed", path[, text])   path is committed at HEAD [and contains text]
+#   ("ignores", pattern)          the committed .gitignore has this pattern
+#   ("untracked", path)           path is not in the index
+#   ("clean", path)               path in the worktree matches HEAD
+#   ("reflog", regex)             some HEAD reflog message matches
+COMMIT_FORMAT = r"^(feat|fix|docs|style|test|chore)(\(.+\))?: .+"
+STARTER_FILES = ["index.html", "style.css", "app.js", "server.py", "database.py"]
+
+def commit_subjects(cwd):
+    return [line.split(" ", 1)[-1] for line in get_commit_messages(10000, cwd).splitlines()]
+
+def git_identity(cwd, use_config=False):
+    """Author of HEAD; with use_config, the configured user if there are no commits yet.
+
+    Config is only for the interactive runner: under `grade` it would be the
+    grader's own ~/.gitconfig, not the learner's.
+    """
+    author = get_head_author(cwd) if is_git_repo(cwd) else ""
+    if author or not use_config:
+        return author
+    where = cwd if os.path.isdir(cwd) else SCRIPT_DIR
+    name = run_git("config", "user.name", cwd=where)[1].strip()
+    email = run_git("config", "user.email", cwd=where)[1].strip()
+    return f"{name} <{email}>" if name and email else ""
+
+class RepoSnapshot:
+    """The repo state one lab's checks need, read in one go."""
+
+    def __init__(self, cwd, needs, use_config=False):
+        self.cwd = cwd
+        self.repo = is_git_repo(cwd)
+        self.identity = git_identity(cwd, use_config) if "identity" in needs else ""
+        self.subjects = []
+        self.count = 0
+        self.tracked = set()
+        self.reflog = []
+        self.head_files = {}
+        self.worktree_files = {}
+        if not self.repo:
+            return
+        if "subjects" in needs:
+            self.subjects = commit_subjects(cwd)
+        if "count" in needs:
+            self.count = get_commit_count(cwd)
+        if "tracked" in needs:
+            self.tracked = set(get_tracked_files(cwd))
+        if "reflog" in needs:
+            self.reflog = get_reflog_messages(cwd)
+        for need in needs:
+            if not isinstance(need, tuple):
+                continue
+            if need[0] == "head_file":
+                self.head_files[need[1]] = get_file_at_head(need[1], cwd)
+            elif need[0] == "worktree_file":
+                path = os.path.join(cwd, need[1])
+                self.worktree_files[need[1]] = read_local_file(need[1], cwd) if os.path.exists(path) else None
+
+def _committed(s, path, text=""):
+    content = s.head_files[path]
+    return content is not None and text in content
+
+def _clean(s, path):
+    committed = s.head_files[path]
+    return committed is not None and s.worktree_files[path] == committed.strip()
+
+# kind: (snapshot fields needed, test, message when it fails)
+CHECK_KINDS = {
+    "repo":          (lambda: [], lambda s: s.repo, "not a git repository"),
+    "identity":      (lambda: ["identity"],
+                      lambda s: bool(s.identity) and not s.identity.endswith(".(none)>") and "<>" not in s.identity,
+                      "no git identity (user.name / user.email)"),
+    "min_commits":   (lambda n: ["count"], lambda s, n: s.count >= n, "needs at least {0} commit(s)"),
+    "first_subject": (lambda r: ["subjects"], lambda s, r: bool(s.subjects) and bool(r.search(s.subjects[-1])),
+                      "first commit message should look like 'type: description'"),
+    "subject":       (lambda r: ["subjects"], lambda s, r: any(r.search(x) for x in s.subjects),
+                      "no commit matching {0!r}"),
+    "no_subject":    (lambda r: ["subjects"], lambda s, r: not any(r.search(x) for x in s.subjects),
+                      "a commit still matches {0!r}"),
+    "committed":     (lambda path, text="": [("head_file", path)], _committed,
+                      lambda path, text="": f"{path} with {text!r} isn't committed" if text else f"{path} isn't committed"),
+    "ignores":       (lambda pattern: [("head_file", ".gitignore")],
+                      lambda s, pattern: pattern in (s.head_files[".gitignore"] or "").split(),
+                      ".gitignore doesn't ignore {0}"),
+    "untracked":     (lambda path: ["tracked"], lambda s, path: path not in s.tracked, "{0} is still tracked"),
+    "clean":         (lambda path: [("head_file", path), ("worktree_file", path)], _clean,
+                      "{0} differs from the last commit"),
+    "reflog":        (lambda r: ["reflog"], lambda s, r: any(r.search(m) for m in s.reflog),
+                      "no {0!r} in the reflog"),
+}
+REGEX_ARGS = {"first_subject", "subject", "no_subject", "reflog"}
+
+class Check:
+    def __init__(self, spec):
+        kind, args = spec[0], spec[1:]
+        needs, self.test, message = CHECK_KINDS[kind]
+        self.needs = needs(*args)
+        self.args = tuple(re.compile(a) for a in args) if kind in REGEX_ARGS else args
+        self.message = message(*args) if callable(message) else message.format(*args)
+
+    def failure(self, snapshot):
+        """None if the check holds, else what's wrong."""
+        return None if self.test(snapshot, *self.args) else self.message
+
+class Step:
+    """One command the learner types."""
+
+    def __init__(self, command, pattern, action=None, instruction=None, before=None, prompt=None,
+                 ok=None, xp=0, reason=None, unlocks=None, hint=None, flags=0):
+        self.command = command
+        self.pattern = re.compile(pattern, flags)
+        self.action = action
+        self.instruction = instruction
+        self.before = before
+        self.prompt = prompt
+        self.ok = ok
+        self.xp = xp
+        self.reason = reason
+        self.unlocks = unlocks
+        self.hint = hint or f"Type: {command}"
+
+class Lab:
+    def __init__(self, id, day, number, title, xp, mission=None, story=(), setup=None, intro=None,
+                 steps=(), after=None, outro=None, checks=()):
+        self.id = id
+        self.day = day
+        self.number = number
+        self.title = title
+        self.xp = xp
+        self.mission = mission
+        self.story = story
+        self.setup = setup
+        self.intro = intro
+        self.steps = steps
+        self.after = after
+        self.outro = outro
+        self.checks = [Check(spec) for spec in checks]
+        self.needs = set()
+        for check in self.checks:
+            self.needs.update(check.needs)
+
+def check_lab(lab, cwd=None, use_config=False):
+    """What's still wrong in the repo for `lab`, from a single snapshot.
+
+    use_config lets git config stand in for the identity check before the
+    first commit (see git_identity); only the interactive runner sets it.
+    """
+    with check_pass(cwd):
+        snapshot = RepoSnapshot(cwd or SANDBOX_DIR, lab.needs, use_config)
+    return [f for f in (check.failure(snapshot) for check in lab.checks) if f]
+
+def run_step(step):
+    if step.before:
+        print(step.before)
+    if step.instruction:
+        instruction(step.instruction)
+    if step.command and not step.prompt:
+        show_command(step.command)
     while True:
-        cmd = wait_for_command()
-        if cmd.startswith("git config") and "user.email" in cmd:
-            os.system(cmd)
-            success("Email configured!")
-            award_xp(5, "Identity: email")
+        cmd = wait_for_command(step.prompt) if step.prompt else wait_for_command()
+        if step.pattern.search(cmd):
             break
-        else:
-            hint('Type: git config --global user.email "your@email.com"')
-
-    mark_lab_done(1, 1)
-
-    print(f"""
-  {C.DIM}  Omar tries: git config --global user.name Omar the Great
-  Sara: "...use quotes, Omar."
-  Omar: 😅{C.RESET}
-""")
-    pause()
-
-    # ─── LAB 2: Create the Repository ───
+        hint(step.hint)
+    if step.action:
+        step.action(cmd)
+    if step.ok:
+        success(step.ok)
+    if step.xp:
+        award_xp(step.xp, step.reason)
+    if step.unlocks:
+        achievement(step.unlocks)
+
+def run_lab(lab):
     clear()
-    banner("DAY 1 — LAB 2: CREATE THE REPOSITORY  (20 XP)")
-    mission("Put the TaskFlow project under version control.")
-
-    story('"The TaskFlow project has files but NO Git.')
-    story(' Your job: initialize a Git repository."  — Sara')
-
-    # Set up sandbox
-    setup_sandbox()
-
-    print(f"\n  {C.BOLD}  The project files are ready in the sandbox folder.{C.RESET}")
-    print(f"  {C.DIM}  Files: index.html, style.css, app.js, server.py, database.py{C.RESET}\n")
-
-    instruction("Initialize a Git repository:")
-    show_command("git init")
-
-    while True:
-        cmd = wait_for_command()
-        if cmd.strip() == "git init":
-            if not is_git_repo():
-                ok, out = run_git("init")
-                if ok:
-                    print(f"  {C.DIM}  {out.strip()}{C.RESET}")
-                    success("Git repository created!")
-                    award_xp(20, "First repo initialized")
-                else:
-                    fail(out)
-            else:
-                success("Repository already initialized!")
-                award_xp(20, "Repository ready")
-            break
-        else:
-            hint("Type exactly: git init")
-
-    mark_lab_done(1, 2)
+    banner(f"DAY {lab.day} — LAB {lab.number}: {lab.title.upper()}  ({lab.xp} XP)")
+    if lab.mission:
+        mission(lab.mission)
+    if lab.story:
+        for line in lab.story:
+            story(line)
+    if lab.setup:
+        lab.setup()
+    if lab.intro:
+        print(lab.intro)
+    for step in lab.steps:
+        run_step(step)
+    if lab.after:
+        lab.after()
+    for problem in check_lab(lab, use_config=True):
+        hint(f"Heads up, the grader will flag this: {problem}")
+    mark_lab_done(lab.day, lab.number)
+    if lab.outro:
+        print(lab.outro)
     pause()
 
-    # ─── LAB 3: The Three Zones ───
-    clear()
-    banner("DAY 1 — LAB 3: STAGING & COMMITTING  (40 XP)")
-    mission("Stage files and make your first commit.")
-
-    print(f"""
-  {C.BOLD}  Git has 3 zones:{C.RESET}
-
-  {C.RED}  📂 WORKING DIR{C.RESET}    →    {C.GOLD}📋 STAGING{C.RESET}    →    {C.GREEN}📦 COMMITTED{C.RESET}
-     (your files)        (ready to save)      (saved!)
-                    {C.CYAN}git add{C.RESET}          {C.GOLD}git commit{C.RESET}
-
-  {C.DIM}  Ahmed's way of explaining it:{C.RESET}
-  {C.BOLD}  "It's like mailing a package.
-   1. Pick items from your room    (edit files)
-   2. Put them in the box          (git add)
-   3. Seal and label the box       (git commit)"{C.RESET}
-""")
-
-    instruction("First, check what Git sees:")
-    show_command("git status")
-
-    while True:
-        cmd = wait_for_command()
-        if "status" in cmd:
-            ok, out = run_git("status")
-            print(f"\n  {C.RED}  {out.replace(chr(10), chr(10) + '  ')}{C.RESET}")
-            print(f"\n  {C.BOLD}  All files are RED = Git sees them but they're not staged.{C.RESET}")
-            award_xp(5, "First status check")
-            break
-        else:
-            hint("Type: git status")
-
-    instruction("Stage ALL files at once:")
-    show_command("git add .")
-
-    while True:
-        cmd = wait_for_command()
-        if "git add" in cmd:
-            run_git("add", ".")
-            success("All files staged!")
-            award_xp(5, "Files staged")
-            break
-        else:
-            hint("Type: git add .")
-
-    instruction("Check status again — see the difference:")
-    show_command("git status")
-
-    while True:
-        cmd = wait_for_command()
-        if "status" in cmd:
-            ok, out = run_git("status")
-            print(f"\n  {C.GREEN}  {out.replace(chr(10), chr(10) + '  ')}{C.RESET}")
-            print(f"\n  {C.BOLD}  Now they're GREEN = staged and ready to be committed!{C.RESET}")
-            break
-        else:
-            hint("Type: git status")
+# ─── LAB ACTIONS ───────────────────────────────────────
+def commit_message(cmd, default):
+    try:
+        return cmd.split("-m")[-1].strip().strip('"').strip("'") or default
+    except:
+        return default
 
-    print(f"""
-  {C.BOLD}  Pro Commit Message Format (required at TechCorp):{C.RESET}
+def print_output(out, color):
+    print(f"\n  {color}  {out.replace(chr(10), chr(10) + '  ')}{C.RESET}")
 
-  {C.CYAN}  type: description{C.RESET}
+def print_diff(out, added=C.GREEN, removed=C.RED, context=True):
+    for line in out.split("\n"):
+        if line.startswith("+") and not line.startswith("+++"):
+            print(f"  {added}  {line}{C.RESET}")
+        elif line.startswith("-") and not line.startswith("---"):
+            print(f"  {removed}  {line}{C.RESET}")
+        elif context and line.strip():
+            print(f"  {C.DIM}  {line}{C.RESET}")
 
-  {C.GREEN}feat:{C.RESET}  New feature       {C.GREEN}fix:{C.RESET}   Bug fix
-  {C.GREEN}docs:{C.RESET}  Documentation     {C.GREEN}style:{C.RESET} CSS/formatting
-  {C.GREEN}test:{C.RESET}  Adding tests      {C.GREEN}chore:{C.RESET} Maintenance
-""")
-
-    instruction("Make your first commit:")
-    show_command('git commit -m "feat: initialize TaskFlow project"')
-
-    while True:
-        cmd = wait_for_command()
-        if "commit" in cmd and "-m" in cmd:
-            msg = "feat: initialize TaskFlow project"
-            try:
-                msg = cmd.split("-m")[-1].strip().strip('"').strip("'") or msg
-            except:
-                pass
-            run_git("commit", "-m", msg)
-            success("FIRST COMMIT! Your code is now saved in history!")
-            award_xp(30, "First commit at TechCorp")
-            achievement("First Commit")
-            break
+def init_repo(cmd):
+    if not is_git_repo():
+        ok, out = run_git("init")
+        if ok:
+            print(f"  {C.DIM}  {out.strip()}{C.RESET}")
+            success("Git repository created!")
+            award_xp(20, "First repo initialized")
         else:
-            hint('Type: git commit -m "feat: initialize TaskFlow project"')
-
-    mark_lab_done(1, 3)
-    pause()
-
-    # ─── LAB 4: Making Changes ───
-    clear()
-    banner("DAY 1 — LAB 4: TRACK CHANGES  (30 XP)")
-    mission("Edit a file, see the diff, commit the change.")
-
-    story('"Lina just messaged: the client wants the app header')
-    story(' to say \'TaskFlow Pro\' instead of \'TaskFlow\'."  — Sara')
-
+            fail(out)
+    else:
+        success("Repository already initialized!")
+        award_xp(20, "Repository ready")
+
+def show_status(color, note):
+    def action(cmd):
+        ok, out = get_status()
+        print_output(out, color)
+        print(f"\n  {C.BOLD}  {note}{C.RESET}")
+    return action
+
+def show_log(*notes, args=("log", "--oneline")):
+    def action(cmd):
+        ok, out = run_git(*args)
+        print_output(out, C.GREEN)
+        for i, note in enumerate(notes):
+            print(f"{chr(10) if i == 0 else ''}  {C.BOLD}  {note}{C.RESET}")
+    return action
+
+def commit_with(default, amend=False):
+    def action(cmd):
+        run_git("commit", *(["--amend"] if amend else []), "-m", commit_message(cmd, default))
+    return action
+
+def edit_heading():
     instruction("Edit index.html — change the heading:")
     show_command('Replace <h1>TaskFlow</h1> with <h1>TaskFlow Pro</h1>')
-
     print(f"  {C.DIM}  (I'll simulate the edit for you...){C.RESET}")
     time.sleep(0.5)
-
     content = read_local_file("index.html")
     content = content.replace("<h1>TaskFlow</h1>", "<h1>TaskFlow Pro</h1>")
     content = content.replace("<title>TaskFlow - Task Manager</title>", "<title>TaskFlow Pro - Task Manager</title>")
     write_local_file("index.html", content)
     success("File edited!")
 
-    instruction("See what changed:")
-    show_command("git diff")
-
-    while True:
-        cmd = wait_for_command()
-        if "diff" in cmd:
-            ok, out = run_git("diff")
-            for line in out.split("\n"):
-                if line.startswith("+") and not line.startswith("+++"):
-                    print(f"  {C.GREEN}  {line}{C.RESET}")
-                elif line.startswith("-") and not line.startswith("---"):
-                    print(f"  {C.RED}  {line}{C.RESET}")
-                elif line.strip():
-                    print(f"  {C.DIM}  {line}{C.RESET}")
-            print(f"\n  {C.BOLD}  RED = removed  |  GREEN = added{C.RESET}")
-            award_xp(10, "Read your first diff")
-            break
-        else:
-            hint("Type: git diff")
-
-    instruction("Stage and commit the change:")
-    show_command("git add index.html")
-
-    while True:
-        cmd = wait_for_command()
-        if "add" in cmd:
-            run_git("add", "index.html")
-            break
-        else:
-            hint("Type: git add index.html")
-
-    show_command('git commit -m "feat: rename app to TaskFlow Pro"')
-
-    while True:
-        cmd = wait_for_command()
-        if "commit" in cmd:
-            msg = "feat: rename app to TaskFlow Pro"
-            try:
-                msg = cmd.split("-m")[-1].strip().strip('"').strip("'") or msg
-            except:
-                pass
-            run_git("commit", "-m", msg)
-            success("Change committed!")
-            award_xp(20, "Edit → diff → commit workflow")
-            break
-        else:
-            hint('Type: git commit -m "feat: rename app to TaskFlow Pro"')
-
-    mark_lab_done(1, 4)
-    pause()
-
-    # ─── LAB 5: View History ───
-    clear()
-    banner("DAY 1 — LAB 5: EXPLORE HISTORY  (20 XP)")
-    mission("Navigate your commit timeline.")
-
-    instruction("See your commit history:")
-    show_command("git log --oneline")
-
-    while True:
-        cmd = wait_for_command()
-        if "log" in cmd:
-            ok, out = run_git("log", "--oneline")
-            print(f"\n  {C.GREEN}  {out.replace(chr(10), chr(10) + '  ')}{C.RESET}")
-            print(f"\n  {C.BOLD}  Each line = one commit. The code is 'abc123' = the commit ID.{C.RESET}")
-            award_xp(10, "Explored history")
-            break
-        else:
-            hint("Type: git log --oneline")
-
-    instruction("See details of the last commit:")
-    show_command("git show --stat HEAD")
-
-    while True:
-        cmd = wait_for_command()
-        if "show" in cmd:
-            ok, out = run_git("show", "--stat", "HEAD")
-            print(f"\n  {C.GREEN}  {out.replace(chr(10), chr(10) + '  ')}{C.RESET}")
-            success("You can inspect any commit in detail!")
-            award_xp(10, "Inspected a commit")
-            achievement("Time Traveler")
-            break
-        else:
-            hint("Type: git show --stat HEAD")
-
-    mark_lab_done(1, 5)
-    pause()
-
-    # ─── LAB 6: Team Simulation ───
-    clear()
-    banner("DAY 1 — LAB 6: TEAM SIMULATION  (50 XP)")
-    mission("Watch what happens when teammates commit.")
-
-    story('"While you were working, Ahmed pushed a database')
-    story(' update. Sara added a dark mode stylesheet."')
-
+def simulate_teammates():
     print(f"\n  {C.DIM}  (Simulating teammate activity...){C.RESET}")
     time.sleep(1)
 
@@ -577,46 +1235,348 @@ def day_1():
     run_git("commit", "-m", "feat: add task fields - description, assigned_to, timestamps")
 
     # Simulate Sara's work
-    with open(os.path.join(SANDBOX_DIR, "style.css"), "a", encoding="utf-8") as f:
-        f.write("\n/* Dark Mode - Added by Sara */\nbody.dark-mode {\n    background-color: #1a1a2e;\n    color: #e0e0e0;\n}\n")
+    write_local_file("style.css", "\n/* Dark Mode - Added by Sara */\nbody.dark-mode {\n    background-color: #1a1a2e;\n    color: #e0e0e0;\n}\n",
+                     mode="a")
     run_git("add", "style.css")
     run_git("commit", "-m", "style: add dark mode CSS variables")
 
     print(f"  {C.GREEN}  Ahmed committed: database improvements{C.RESET}")
     print(f"  {C.GREEN}  Sara committed: dark mode styles{C.RESET}")
 
-    instruction("See the full team history:")
-    show_command("git log --oneline")
+def append_review_line(cmd):
+    write_local_file("notes.txt", "- Review PR #42\n", mode="a")
 
-    while True:
-        cmd = wait_for_command()
-        if "log" in cmd:
-            ok, out = run_git("log", "--oneline")
-            print(f"\n  {C.GREEN}  {out.replace(chr(10), chr(10) + '  ')}{C.RESET}")
-            print(f"\n  {C.BOLD}  See? Multiple people's commits in one timeline!{C.RESET}")
-            print(f"  {C.BOLD}  This is how Git works in a real team.{C.RESET}")
-            award_xp(30, "Team timeline understood")
-            break
-        else:
-            hint("Type: git log --oneline")
+def restore_server(cmd):
+    run_git("restore", "server.py")
+    content = read_local_file("server.py")
+    if "OOPS" not in content:
+        success("RESTORED! Server is back to normal! 🎉")
+    else:
+        success("Restored!")
 
-    instruction("See who changed what in a specific file:")
-    show_command("git log --oneline -- database.py")
+def stage_junk():
+    instruction("Create and stage a test file:")
+    write_local_file("test-junk.txt", "This shouldn't be committed\n")
+    run_git("add", "test-junk.txt")
 
-    while True:
-        cmd = wait_for_command()
-        if "log" in cmd and "database" in cmd:
-            ok, out = run_git("log", "--oneline", "--", "database.py")
-            print(f"\n  {C.GREEN}  {out.replace(chr(10), chr(10) + '  ')}{C.RESET}")
-            success("File-specific history! Know who touched what file.")
-            award_xp(20, "File-specific history")
-            break
-        else:
-            hint("Type: git log --oneline -- database.py")
+    print(f"  {C.BOLD}  You accidentally staged 'test-junk.txt'.{C.RESET}")
+    print(f"  {C.BOLD}  It shouldn't be committed. UNSTAGE it:{C.RESET}")
+
+def remove_junk():
+    remove_local_file("test-junk.txt")
 
-    mark_lab_done(1, 6)
+def commit_typo():
+    write_local_file("config.txt", "App Config: debug=false\n")
+    run_git("add", "config.txt")
+    run_git("commit", "-m", "add confg file")
+
+    print(f"  {C.RED}  Oops! The message says 'confg' instead of 'config'.{C.RESET}")
+
+    out = get_commit_messages(1)
+    print(f"  {C.DIM}  Current: {out.strip()}{C.RESET}")
+
+def amend_typo(cmd):
+    commit_with("chore: add config file", amend=True)(cmd)
+    out = get_commit_messages(1)
+    success(f"Fixed! Now says: {out.strip()}")
+
+def soft_reset(cmd):
+    run_git("reset", "--soft", "HEAD~1")
+    success("Commit undone! File is still here, just not committed.")
+
+    ok, out = get_status()
+    if "config" in out:
+        print(f"  {C.GREEN}  config.txt is staged but uncommitted{C.RESET}")
+
+def create_ignored_files():
+    instruction("Create some files that should be ignored:")
+    write_local_file(".env", "SECRET_KEY=abc123\nDB_PASSWORD=hunter2\n")
+    write_local_file("debug.log", "ERROR: something broke at 3am\n")
+    write_local_file("personal-notes.txt", "Ahmed smells like coffee\n")
+
+    print(f"  {C.DIM}  Created: .env, debug.log, personal-notes.txt{C.RESET}")
+
+    instruction("Create a .gitignore file:")
+    show_command("Create .gitignore with patterns")
+
+def create_gitignore(cmd):
+    write_local_file(".gitignore", ".env\n*.log\n__pycache__/\nnode_modules/\n*.db\npersonal-*\n")
+    success(".gitignore created!")
+    run_git("add", ".gitignore")
+    run_git("commit", "-m", "chore: add .gitignore for secrets and junk files")
+
+def verify_ignored(cmd):
+    ok, out = get_status()
+    if ".env" not in out and "debug.log" not in out:
+        success("Ignored files are INVISIBLE to Git! 🛡️")
+        print(f"  {C.BOLD}  .env, *.log, and personal-* are all hidden.{C.RESET}")
+    else:
+        print(f"  {C.DIM}  {out}{C.RESET}")
+
+def sandbox_ready():
+    setup_sandbox()
+
+# ─── LABS ──────────────────────────────────────────────
+LABS = [
+    Lab("d1l1", 1, 1, "Identity Setup", 10,
+        mission="Tell Git who you are.",
+        story=['"Git needs to know who you are. Every commit',
+               ' you make will have your name on it — forever."',
+               ' — Sara'],
+        steps=[
+            Step('git config --global user.name "Your Name"', r"^git config.*user\.name",
+                 action=os.system, instruction="Set your name (use YOUR actual name):",
+                 ok="Name configured!", xp=5, reason="Identity: name"),
+            Step('git config --global user.email "you@example.com"', r"^git config.*user\.email",
+                 action=os.system, instruction="Now set your email:",
+                 ok="Email configured!", xp=5, reason="Identity: email",
+                 hint='Type: git config --global user.email "your@email.com"'),
+        ],
+        outro=f"""
+  {C.DIM}  Omar tries: git config --global user.name Omar the Great
+  Sara: "...use quotes, Omar."
+  Omar: 😅{C.RESET}
+""",
+        checks=[("identity",)]),
+
+    Lab("d1l2", 1, 2, "Create the Repository", 20,
+        mission="Put the TaskFlow project under version control.",
+        story=['"The TaskFlow project has files but NO Git.',
+               ' Your job: initialize a Git repository."  — Sara'],
+        setup=sandbox_ready,
+        intro=f"\n  {C.BOLD}  The project files are ready in the sandbox folder.{C.RESET}\n"
+              f"  {C.DIM}  Files: index.html, style.css, app.js, server.py, database.py{C.RESET}\n",
+        steps=[
+            Step("git init", r"^git init$", action=init_repo, instruction="Initialize a Git repository:",
+                 hint="Type exactly: git init"),
+        ],
+        checks=[("repo",)]),
+
+    Lab("d1l3", 1, 3, "Staging & Committing", 40,
+        mission="Stage files and make your first commit.",
+        intro=f"""
+  {C.BOLD}  Git has 3 zones:{C.RESET}
+
+  {C.RED}  📂 WORKING DIR{C.RESET}    →    {C.GOLD}📋 STAGING{C.RESET}    →    {C.GREEN}📦 COMMITTED{C.RESET}
+     (your files)        (ready to save)      (saved!)
+                    {C.CYAN}git add{C.RESET}          {C.GOLD}git commit{C.RESET}
+
+  {C.DIM}  Ahmed's way of explaining it:{C.RESET}
+  {C.BOLD}  "It's like mailing a package.
+   1. Pick items from your room    (edit files)
+   2. Put them in the box          (git add)
+   3. Seal and label the box       (git commit)"{C.RESET}
+""",
+        steps=[
+            Step("git status", r"status", instruction="First, check what Git sees:",
+                 action=show_status(C.RED, "All files are RED = Git sees them but they're not staged."),
+                 xp=5, reason="First status check"),
+            Step("git add .", r"git add", action=lambda cmd: run_git("add", "."),
+                 instruction="Stage ALL files at once:", ok="All files staged!", xp=5, reason="Files staged"),
+            Step("git status", r"status", instruction="Check status again — see the difference:",
+                 action=show_status(C.GREEN, "Now they're GREEN = staged and ready to be committed!")),
+            Step('git commit -m "feat: initialize TaskFlow project"', r"commit.*-m|-m.*commit",
+                 before=f"""
+  {C.BOLD}  Pro Commit Message Format (required at TechCorp):{C.RESET}
+
+  {C.CYAN}  type: description{C.RESET}
+
+  {C.GREEN}feat:{C.RESET}  New feature       {C.GREEN}fix:{C.RESET}   Bug fix
+  {C.GREEN}docs:{C.RESET}  Documentation     {C.GREEN}style:{C.RESET} CSS/formatting
+  {C.GREEN}test:{C.RESET}  Adding tests      {C.GREEN}chore:{C.RESET} Maintenance
+""",
+                 instruction="Make your first commit:",
+                 action=commit_with("feat: initialize TaskFlow project"),
+                 ok="FIRST COMMIT! Your code is now saved in history!",
+                 xp=30, reason="First commit at TechCorp", unlocks="First Commit"),
+        ],
+        checks=[("repo",), ("min_commits", 1), ("first_subject", COMMIT_FORMAT)]
+               + [("committed", f) for f in STARTER_FILES]),
+
+    Lab("d1l4", 1, 4, "Track Changes", 30,
+        mission="Edit a file, see the diff, commit the change.",
+        story=['"Lina just messaged: the client wants the app header',
+               ' to say \'TaskFlow Pro\' instead of \'TaskFlow\'."  — Sara'],
+        setup=edit_heading,
+        steps=[
+            Step("git diff", r"diff", instruction="See what changed:",
+                 action=lambda cmd: (print_diff(run_git("diff")[1]),
+                                     print(f"\n  {C.BOLD}  RED = removed  |  GREEN = added{C.RESET}")),
+                 xp=10, reason="Read your first diff"),
+            Step("git add index.html", r"add", action=lambda cmd: run_git("add", "index.html"),
+                 instruction="Stage and commit the change:"),
+            Step('git commit -m "feat: rename app to TaskFlow Pro"', r"commit",
+                 action=commit_with("feat: rename app to TaskFlow Pro"),
+                 ok="Change committed!", xp=20, reason="Edit → diff → commit workflow"),
+        ],
+        checks=[("committed", "index.html", "TaskFlow Pro"), ("min_commits", 2)]),
+
+    Lab("d1l5", 1, 5, "Explore History", 20,
+        mission="Navigate your commit timeline.",
+        steps=[
+            Step("git log --oneline", r"log", instruction="See your commit history:",
+                 action=show_log("Each line = one commit. The code is 'abc123' = the commit ID."),
+                 xp=10, reason="Explored history"),
+            Step("git show --stat HEAD", r"show", instruction="See details of the last commit:",
+                 action=show_log(args=("show", "--stat", "HEAD")),
+                 ok="You can inspect any commit in detail!",
+                 xp=10, reason="Inspected a commit", unlocks="Time Traveler"),
+        ]),  # only reads history: nothing to check afterwards
+
+    Lab("d1l6", 1, 6, "Team Simulation", 50,
+        mission="Watch what happens when teammates commit.",
+        story=['"While you were working, Ahmed pushed a database',
+               ' update. Sara added a dark mode stylesheet."'],
+        setup=simulate_teammates,
+        steps=[
+            Step("git log --oneline", r"log", instruction="See the full team history:",
+                 action=show_log("See? Multiple people's commits in one timeline!",
+                                 "This is how Git works in a real team."),
+                 xp=30, reason="Team timeline understood"),
+            Step("git log --oneline -- database.py", r"log.*database|database.*log",
+                 instruction="See who changed what in a specific file:",
+                 action=show_log(args=("log", "--oneline", "--", "database.py")),
+                 ok="File-specific history! Know who touched what file.",
+                 xp=20, reason="File-specific history"),
+        ],
+        checks=[("subject", r"^feat: add task fields"), ("subject", r"^style: add dark mode")]),
+
+    # Timed by day_1 rather than run with run_lab.
+    Lab("d1boss", 1, "BOSS", "The Rapid Commit Challenge", 80,
+        steps=[
+            Step('echo "Sprint planning notes" > notes.txt', r"notes", flags=re.IGNORECASE,
+                 before=f"\n  {C.GOLD}  TASK 1/4: Create a file called 'notes.txt'{C.RESET}",
+                 action=lambda cmd: write_local_file("notes.txt", "Sprint planning notes\n"),
+                 ok="File created!", hint="Type anything with 'notes' to create the file"),
+            Step("git add notes.txt", r"add", action=lambda cmd: run_git("add", "notes.txt"),
+                 before=f"\n  {C.GOLD}  TASK 2/4: Stage and commit it{C.RESET}"),
+            Step('git commit -m "docs: add sprint planning notes"', r"commit",
+                 action=lambda cmd: run_git("commit", "-m", "docs: add sprint planning notes"),
+                 ok="Committed!"),
+            Step('echo "- Review PR #42" >> notes.txt', r"notes|echo", flags=re.IGNORECASE,
+                 before=f"\n  {C.GOLD}  TASK 3/4: Add a line to notes.txt{C.RESET}",
+                 action=append_review_line, ok="File updated!", hint="Type anything to add to the file"),
+            Step("git add notes.txt", r"add", action=lambda cmd: run_git("add", "notes.txt"),
+                 before=f"\n  {C.GOLD}  TASK 4/4: Stage + commit the update{C.RESET}"),
+            Step('git commit -m "docs: update sprint notes with PR review"', r"commit",
+                 action=lambda cmd: run_git("commit", "-m", "docs: update sprint notes with PR review"),
+                 hint='git commit -m "docs: update sprint notes"'),
+        ],
+        checks=[("committed", "notes.txt", "Sprint planning notes"), ("committed", "notes.txt", "Review PR #42")]),
+
+    Lab("d2l1", 2, 1, "Undo Unstaged Changes", 30,
+        mission="Revert a file to its last committed version.",
+        story=['"Omar just overwrote server.py with \'hello world\'."',
+               '"Let\'s save him." — Sara'],
+        steps=[
+            Step('echo "OOPS I BROKE IT" > server.py', r"server|oops|broke", flags=re.IGNORECASE,
+                 instruction="Corrupt the server file (on purpose):",
+                 action=lambda cmd: write_local_file("server.py", "OOPS I BROKE IT\n"),
+                 ok="Server corrupted! 😱", hint="Type anything to corrupt the file"),
+            # A deletion is the good news here, so the colours are swapped.
+            Step("git diff server.py", r"diff", instruction="See the damage:",
+                 action=lambda cmd: print_diff(run_git("diff", "server.py")[1], added=C.RED, removed=C.GREEN,
+                                               context=False)),
+            Step("git restore server.py", r"restore", action=restore_server,
+                 instruction="RESTORE it to the last committed version:",
+                 xp=30, reason="git restore mastered"),
+        ],
+        outro=f"""
+  {C.DIM}  Omar: "Wait, that's it? Just two words?"
+  Sara:  "Yes. Git always has a backup of the last commit.
+          git restore brings it back."
+  Omar:  "I love Git."{C.RESET}
+""",
+        checks=[("clean", "server.py")]),
+
+    Lab("d2l2", 2, 2, "Unstage Files", 20,
+        mission="Remove a file from staging without losing changes.",
+        setup=stage_junk,
+        steps=[
+            Step("git restore --staged test-junk.txt", r"restore.*staged|staged.*restore",
+                 action=lambda cmd: run_git("restore", "--staged", "test-junk.txt"),
+                 ok="Unstaged! The file still exists but won't be committed.",
+                 xp=20, reason="Unstage mastered"),
+        ],
+        after=remove_junk,
+        checks=[("untracked", "test-junk.txt")]),
+
+    Lab("d2l3", 2, 3, "Fix Last Commit", 30,
+        mission="Fix a commit message typo without creating a new commit.",
+        setup=commit_typo,
+        steps=[
+            Step('git commit --amend -m "chore: add config file"', r"amend", action=amend_typo,
+                 instruction="Fix it with amend:", xp=30, reason="Amend mastered", unlocks="Clean History"),
+        ],
+        checks=[("no_subject", r"confg"), ("subject", r"config file")]),
+
+    Lab("d2l4", 2, 4, "Undo a Commit", 40,
+        mission="Undo the last commit entirely.",
+        intro=f"""
+  {C.BOLD}  git reset --soft HEAD~1{C.RESET}
+
+  {C.CYAN}reset{C.RESET}   = go back in time
+  {C.CYAN}--soft{C.RESET}  = keep your files (just undo the commit)
+  {C.CYAN}HEAD~1{C.RESET}  = go back 1 commit
+
+  {C.DIM}  The file stays. The commit disappears. Like it never happened.{C.RESET}
+""",
+        steps=[
+            Step("git reset --soft HEAD~1", r"reset.*soft|soft.*reset", action=soft_reset,
+                 instruction="Undo the config file commit:", xp=40, reason="Soft reset mastered"),
+        ],
+        # Re-commit to keep state clean
+        after=lambda: run_git("commit", "-m", "chore: add config file"),
+        checks=[("reflog", r"^reset: moving to HEAD~"), ("committed", "config.txt")]),
+
+    Lab("d2l5", 2, 5, "The Ignore Shield", 30,
+        mission="Tell Git to ignore files that shouldn't be tracked.",
+        story=['"Some files should NEVER go to Git:"',
+               '"passwords, databases, personal notes, node_modules."',
+               '"Sara will fire you if you commit the .env file." — Ahmed'],
+        setup=create_ignored_files,
+        intro=f"""
+  {C.BOLD}  Common .gitignore patterns:{C.RESET}
+
+  {C.CYAN}.env{C.RESET}              ← passwords, API keys
+  {C.CYAN}*.log{C.RESET}             ← log files
+  {C.CYAN}__pycache__/{C.RESET}      ← Python cache
+  {C.CYAN}node_modules/{C.RESET}     ← Node packages
+  {C.CYAN}*.db{C.RESET}              ← database files
+  {C.CYAN}personal-*{C.RESET}        ← personal files matching pattern
+""",
+        steps=[
+            Step("create", r"^(create|yes|ok|y|\.?gitignore)$", flags=re.IGNORECASE, action=create_gitignore,
+                 prompt="  Type 'create' to make the .gitignore: "),
+            Step("git status", r"status", action=verify_ignored,
+                 instruction="Verify — check status (the ignored files should not appear):",
+                 xp=30, reason="Ignore shield activated"),
+        ],
+        checks=[("committed", ".gitignore"), ("ignores", ".env"), ("ignores", "*.log"),
+                ("untracked", ".env"), ("untracked", "debug.log"), ("untracked", "personal-notes.txt")]),
+]
+LAB_BY_ID = {lab.id: lab for lab in LABS}
+
+# ═══════════════════════════════════════════════════════
+# DAY 1: FIRST DAY AT WORK
+# ═══════════════════════════════════════════════════════
+def day_1():
+    clear()
+    banner("DAY 1: FIRST DAY AT WORK  🌱  300 XP")
+
+    print(f"""
+  {C.DIM}  Monday morning. You walk into TechCorp's office.
+  The coffee machine is broken. Omar has already accidentally
+  deleted a folder. Sara walks over and says:{C.RESET}
+
+  {C.BOLD}  "Welcome to the team. First things first — 
+   let's get you set up with Git."{C.RESET}
+""")
     pause()
 
+    for lab_id in ("d1l1", "d1l2", "d1l3", "d1l4", "d1l5", "d1l6"):
+        run_lab(LAB_BY_ID[lab_id])
+
     # ─── POP QUIZ ───
     clear()
     banner("📝 DAY 1 POP QUIZ  (30 XP)")
@@ -676,71 +1636,8 @@ def day_1():
 
     start_time = time.time()
 
-    # Step 1
-    print(f"\n  {C.GOLD}  TASK 1/4: Create a file called 'notes.txt'{C.RESET}")
-    show_command('echo "Sprint planning notes" > notes.txt')
-    while True:
-        cmd = wait_for_command()
-        if "notes" in cmd.lower():
-            write_local_file("notes.txt", "Sprint planning notes\n")
-            success("File created!")
-            break
-        else:
-            hint("Type anything with 'notes' to create the file")
-
-    # Step 2
-    print(f"\n  {C.GOLD}  TASK 2/4: Stage and commit it{C.RESET}")
-    show_command("git add notes.txt")
-    while True:
-        cmd = wait_for_command()
-        if "add" in cmd:
-            run_git("add", "notes.txt")
-            break
-        else:
-            hint("Type: git add notes.txt")
-
-    show_command('git commit -m "docs: add sprint planning notes"')
-    while True:
-        cmd = wait_for_command()
-        if "commit" in cmd:
-            run_git("commit", "-m", "docs: add sprint planning notes")
-            success("Committed!")
-            break
-        else:
-            hint('Type: git commit -m "docs: add sprint planning notes"')
-
-    # Step 3
-    print(f"\n  {C.GOLD}  TASK 3/4: Add a line to notes.txt{C.RESET}")
-    show_command('echo "- Review PR #42" >> notes.txt')
-    while True:
-        cmd = wait_for_command()
-        if "notes" in cmd.lower() or "echo" in cmd.lower():
-            with open(os.path.join(SANDBOX_DIR, "notes.txt"), "a") as f:
-                f.write("- Review PR #42\n")
-            success("File updated!")
-            break
-        else:
-            hint("Type anything to add to the file")
-
-    # Step 4
-    print(f"\n  {C.GOLD}  TASK 4/4: Stage + commit the update{C.RESET}")
-    show_command("git add notes.txt")
-    while True:
-        cmd = wait_for_command()
-        if "add" in cmd:
-            run_git("add", "notes.txt")
-            break
-        else:
-            hint("Type: git add notes.txt")
-
-    show_command('git commit -m "docs: update sprint notes with PR review"')
-    while True:
-        cmd = wait_for_command()
-        if "commit" in cmd:
-            run_git("commit", "-m", "docs: update sprint notes with PR review")
-            break
-        else:
-            hint('git commit -m "docs: update sprint notes"')
+    for step in LAB_BY_ID["d1boss"].steps:
+        run_step(step)
 
     elapsed = time.time() - start_time
 
@@ -830,238 +1727,8 @@ def day_2():
         run_git("add", ".")
         run_git("commit", "-m", "feat: initialize TaskFlow project")
 
-    # ─── LAB 1: Undo Working Changes ───
-    clear()
-    banner("DAY 2 — LAB 1: UNDO UNSTAGED CHANGES  (30 XP)")
-    mission("Revert a file to its last committed version.")
-
-    story('"Omar just overwrote server.py with \'hello world\'."')
-    story('"Let\'s save him." — Sara')
-
-    instruction("Corrupt the server file (on purpose):")
-    show_command('echo "OOPS I BROKE IT" > server.py')
-
-    while True:
-        cmd = wait_for_command()
-        if "server" in cmd.lower() or "oops" in cmd.lower() or "broke" in cmd.lower():
-            write_local_file("server.py", "OOPS I BROKE IT\n")
-            success("Server corrupted! 😱")
-            break
-        else:
-            hint("Type anything to corrupt the file")
-
-    instruction("See the damage:")
-    show_command("git diff server.py")
-
-    while True:
-        cmd = wait_for_command()
-        if "diff" in cmd:
-            ok, out = run_git("diff", "server.py")
-            for line in out.split("\n"):
-                if line.startswith("+") and not line.startswith("+++"):
-                    print(f"  {C.RED}  {line}{C.RESET}")
-                elif line.startswith("-") and not line.startswith("---"):
-                    print(f"  {C.GREEN}  {line}{C.RESET}")
-            break
-        else:
-            hint("Type: git diff server.py")
-
-    instruction("RESTORE it to the last committed version:")
-    show_command("git restore server.py")
-
-    while True:
-        cmd = wait_for_command()
-        if "restore" in cmd:
-            run_git("restore", "server.py")
-            content = read_local_file("server.py")
-            if "OOPS" not in content:
-                success("RESTORED! Server is back to normal! 🎉")
-            else:
-                success("Restored!")
-            award_xp(30, "git restore mastered")
-            break
-        else:
-            hint("Type: git restore server.py")
-
-    print(f"""
-  {C.DIM}  Omar: "Wait, that's it? Just two words?"
-  Sara:  "Yes. Git always has a backup of the last commit.
-          git restore brings it back."
-  Omar:  "I love Git."{C.RESET}
-""")
-
-    mark_lab_done(2, 1)
-    pause()
-
-    # ─── LAB 2: Unstage ───
-    clear()
-    banner("DAY 2 — LAB 2: UNSTAGE FILES  (20 XP)")
-    mission("Remove a file from staging without losing changes.")
-
-    instruction("Create and stage a test file:")
-    write_local_file("test-junk.txt", "This shouldn't be committed\n")
-    run_git("add", "test-junk.txt")
-
-    print(f"  {C.BOLD}  You accidentally staged 'test-junk.txt'.{C.RESET}")
-    print(f"  {C.BOLD}  It shouldn't be committed. UNSTAGE it:{C.RESET}")
-
-    show_command("git restore --staged test-junk.txt")
-
-    while True:
-        cmd = wait_for_command()
-        if "restore" in cmd and "staged" in cmd:
-            run_git("restore", "--staged", "test-junk.txt")
-            success("Unstaged! The file still exists but won't be committed.")
-            award_xp(20, "Unstage mastered")
-            break
-        else:
-            hint("Type: git restore --staged test-junk.txt")
-
-    # Clean up
-    junk = os.path.join(SANDBOX_DIR, "test-junk.txt")
-    if os.path.exists(junk):
-        os.remove(junk)
-
-    mark_lab_done(2, 2)
-    pause()
-
-    # ─── LAB 3: Amend ───
-    clear()
-    banner("DAY 2 — LAB 3: FIX LAST COMMIT  (30 XP)")
-    mission("Fix a commit message typo without creating a new commit.")
-
-    write_local_file("config.txt", "App Config: debug=false\n")
-    run_git("add", "config.txt")
-    run_git("commit", "-m", "add confg file")
-
-    print(f"  {C.RED}  Oops! The message says 'confg' instead of 'config'.{C.RESET}")
-
-    ok, out = run_git("log", "--oneline", "-1")
-    print(f"  {C.DIM}  Current: {out.strip()}{C.RESET}")
-
-    instruction("Fix it with amend:")
-    show_command('git commit --amend -m "chore: add config file"')
-
-    while True:
-        cmd = wait_for_command()
-        if "amend" in cmd:
-            msg = "chore: add config file"
-            try:
-                msg = cmd.split("-m")[-1].strip().strip('"').strip("'") or msg
-            except:
-                pass
-            run_git("commit", "--amend", "-m", msg)
-            ok, out = run_git("log", "--oneline", "-1")
-            success(f"Fixed! Now says: {out.strip()}")
-            award_xp(30, "Amend mastered")
-            achievement("Clean History")
-            break
-        else:
-            hint('Type: git commit --amend -m "chore: add config file"')
-
-    mark_lab_done(2, 3)
-    pause()
-
-    # ─── LAB 4: Reset ───
-    clear()
-    banner("DAY 2 — LAB 4: UNDO A COMMIT  (40 XP)")
-    mission("Undo the last commit entirely.")
-
-    print(f"""
-  {C.BOLD}  git reset --soft HEAD~1{C.RESET}
-
-  {C.CYAN}reset{C.RESET}   = go back in time
-  {C.CYAN}--soft{C.RESET}  = keep your files (just undo the commit)
-  {C.CYAN}HEAD~1{C.RESET}  = go back 1 commit
-
-  {C.DIM}  The file stays. The commit disappears. Like it never happened.{C.RESET}
-""")
-
-    instruction("Undo the config file commit:")
-    show_command("git reset --soft HEAD~1")
-
-    while True:
-        cmd = wait_for_command()
-        if "reset" in cmd and "soft" in cmd:
-            run_git("reset", "--soft", "HEAD~1")
-            success("Commit undone! File is still here, just not committed.")
-
-            ok, out = run_git("status")
-            if "config" in out:
-                print(f"  {C.GREEN}  config.txt is staged but uncommitted{C.RESET}")
-
-            award_xp(40, "Soft reset mastered")
-            break
-        else:
-            hint("Type: git reset --soft HEAD~1")
-
-    # Re-commit to keep state clean
-    run_git("commit", "-m", "chore: add config file")
-
-    mark_lab_done(2, 4)
-    pause()
-
-    # ─── LAB 5: .gitignore ───
-    clear()
-    banner("DAY 2 — LAB 5: THE IGNORE SHIELD  (30 XP)")
-    mission("Tell Git to ignore files that shouldn't be tracked.")
-
-    story('"Some files should NEVER go to Git:"')
-    story('"passwords, databases, personal notes, node_modules."')
-    story('"Sara will fire you if you commit the .env file." — Ahmed')
-
-    instruction("Create some files that should be ignored:")
-    write_local_file(".env", "SECRET_KEY=abc123\nDB_PASSWORD=hunter2\n")
-    write_local_file("debug.log", "ERROR: something broke at 3am\n")
-    write_local_file("personal-notes.txt", "Ahmed smells like coffee\n")
-
-    print(f"  {C.DIM}  Created: .env, debug.log, personal-notes.txt{C.RESET}")
-
-    instruction("Create a .gitignore file:")
-    show_command("Create .gitignore with patterns")
-
-    print(f"""
-  {C.BOLD}  Common .gitignore patterns:{C.RESET}
-
-  {C.CYAN}.env{C.RESET}              ← passwords, API keys
-  {C.CYAN}*.log{C.RESET}             ← log files
-  {C.CYAN}__pycache__/{C.RESET}      ← Python cache
-  {C.CYAN}node_modules/{C.RESET}     ← Node packages
-  {C.CYAN}*.db{C.RESET}              ← database files
-  {C.CYAN}personal-*{C.RESET}        ← personal files matching pattern
-""")
-
-    while True:
-        cmd = wait_for_command("  Type 'create' to make the .gitignore: ")
-        if cmd.lower() in ["create", "yes", "ok", "y", "gitignore", ".gitignore"]:
-            write_local_file(".gitignore", ".env\n*.log\n__pycache__/\nnode_modules/\n*.db\npersonal-*\n")
-            success(".gitignore created!")
-            break
-        else:
-            hint("Type: create")
-
-    run_git("add", ".gitignore")
-    run_git("commit", "-m", "chore: add .gitignore for secrets and junk files")
-
-    instruction("Verify — check status (the ignored files should not appear):")
-    show_command("git status")
-
-    while True:
-        cmd = wait_for_command()
-        if "status" in cmd:
-            ok, out = run_git("status")
-            if ".env" not in out and "debug.log" not in out:
-                success("Ignored files are INVISIBLE to Git! 🛡️")
-                print(f"  {C.BOLD}  .env, *.log, and personal-* are all hidden.{C.RESET}")
-            else:
-                print(f"  {C.DIM}  {out}{C.RESET}")
-            award_xp(30, "Ignore shield activated")
-            break
-        else:
-            hint("Type: git status")
-
-    mark_lab_done(2, 5)
-    pause()
+    for lab_id in ("d2l1", "d2l2", "d2l3", "d2l4", "d2l5"):
+        run_lab(LAB_BY_ID[lab_id])
 
     # ─── DAY 2 QUIZ ───
     clear()
@@ -1418,6 +2085,247 @@ def graduation():
     pause("Press ENTER to return to menu...")
 
 
+# ─── GRADING ───────────────────────────────────────────
+# Headless runs of each lab's post-conditions (see LABS) against a learner's
+# sandbox. Labs without any (Day 1 Lab 5 only reads history) are "skip".
+def grade_sandbox(path):
+    """Run every lab's checks against one sandbox; a dict for the report."""
+    start = time.perf_counter()
+    labs = []
+    # One pass: every lab reuses what the earlier labs read from the repo.
+    with check_pass(path):
+        for lab in LABS:
+            lab_start = time.perf_counter()
+            if not lab.checks:
+                status, detail = "skip", "nothing to check in the repo"
+            elif lab.needs and not is_git_repo(path):
+                status, detail = "fail", "not a git repository"
+            else:
+                try:
+                    problems = check_lab(lab, path)
+                    status, detail = ("fail", "; ".join(problems)) if problems else ("pass", "")
+                except Exception as e:
+                    status, detail = "error", f"{type(e).__name__}: {e}"
+            labs.append({"lab": lab.id, "title": lab.title, "status": status, "detail": detail,
+                         "ms": round((time.perf_counter() - lab_start) * 1000, 3)})
+    close_git_backends()
+    return {
+        "sandbox": os.path.basename(path),
+        "passed": sum(1 for l in labs if l["status"] == "pass"),
+        "graded": sum(1 for l in labs if l["status"] != "skip"),
+        "ms": round((time.perf_counter() - start) * 1000, 3),
+        "labs": labs,
+    }
+
+def format_report(results, fmt):
+    if fmt == "json":
+        return json.dumps(results, indent=2) + "\n"
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["sandbox", "lab", "title", "status", "detail", "ms"])
+    for result in results["sandboxes"]:
+        for lab in result["labs"]:
+            writer.writerow([result["sandbox"], lab["lab"], lab["title"], lab["status"], lab["detail"], lab["ms"]])
+    return out.getvalue()
+
+def grade(argv):
+    parser = argparse.ArgumentParser(prog="lab-runner.py grade",
+                                     description="Grade every learner sandbox in a directory, without prompts.")
+    parser.add_argument("directory", help="directory holding one sandbox per learner")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: %(default)s)")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--out", help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    sandboxes = sorted(os.path.join(args.directory, d) for d in os.listdir(args.directory)
+                       if os.path.isdir(os.path.join(args.directory, d)))
+
+    start = time.perf_counter()
+    if args.jobs > 1 and len(sandboxes) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(grade_sandbox, sandboxes, chunksize=max(1, len(sandboxes) // (args.jobs * 4))))
+    else:
+        results = [grade_sandbox(path) for path in sandboxes]
+    elapsed = time.perf_counter() - start
+
+    report = format_report({
+        "directory": os.path.abspath(args.directory),
+        "git_backend": GIT_BACKEND,
+        "seconds": round(elapsed, 3),
+        "sandboxes": results,
+    }, args.format)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8", newline="") as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report)
+
+    complete = sum(1 for r in results if r["passed"] == r["graded"])
+    print(f"Graded {len(results)} sandboxes in {elapsed:.2f}s: {complete} with every lab passed",
+          file=sys.stderr)
+    return 0
+
+# ─── BENCH-GIT ─────────────────────────────────────────
+# The read-only questions a check asks after each lab, run against a cohort
+# of sandboxes with each backend (and the snapshot cache on top of the
+# native one): how many git processes, how long.
+BENCH_QUERIES = {
+    "branch":   lambda cwd: get_current_branch(cwd),
+    "branches": lambda cwd: get_branches(cwd),
+    "log1":     lambda cwd: get_commit_messages(1, cwd),
+    "log5":     lambda cwd: get_commit_messages(5, cwd),
+    "count":    lambda cwd: get_commit_count(cwd),
+    "files":    lambda cwd: get_tracked_files(cwd),
+    "status":   lambda cwd: get_status(cwd),
+}
+
+BENCH_LABS = [
+    ("Day 1 Lab 2: git init",      ["branch"]),
+    ("Day 1 Lab 3: first commit",  ["status", "files", "count", "log1"]),
+    ("Day 1 Lab 4: see changes",   ["count", "log1"]),
+    ("Day 1 Lab 6: history",       ["count", "log5"]),
+    ("Day 2 Lab 3: amend",         ["log1", "count"]),
+    ("Day 2 Lab 4: reset",         ["status", "count", "log1"]),
+    ("Day 2 Lab 5: .gitignore",    ["status", "files", "log1", "branch", "branches"]),
+]
+
+# Every lab's checks against each sandbox, as `grade` runs them.
+BENCH_GRADE = "grade (every lab)"
+
+# (column, backend, snapshot cache)
+BENCH_CONFIGS = [(name, name, False) for name in GIT_BACKENDS] + [
+    ("subprocess+cache", "subprocess", True), ("native+cache", "native", True)]
+
+def make_bench_repo(path, commits=12):
+    """A sandbox as it looks at the end of Day 2, plus a couple of branches.
+
+    Older commits are packed (with deltas) and the newest are loose objects,
+    so every object reader path gets exercised.
+    """
+    os.makedirs(path)
+    run_git("init", "-q", cwd=path)
+    run_git("config", "user.name", "Lab Bench", cwd=path)
+    run_git("config", "user.email", "bench@techcorp.example", cwd=path)
+    for n in range(commits):
+        write_local_file("notes.txt", "".join(f"Note {i}\n" for i in range(n + 1)), cwd=path)
+        run_git("add", "notes.txt", cwd=path)
+        run_git("commit", "-q", "-m", f"docs: add note {n}", cwd=path)
+        if n == commits - 4:
+            run_git("branch", "feature/login", cwd=path)
+            run_git("gc", "-q", "--aggressive", cwd=path)
+    run_git("branch", "fix/typo", cwd=path)
+
+def _truncate(path, size):
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+def _pack_file(repo, suffix):
+    pack_dir = os.path.join(repo, ".git", "objects", "pack")
+    return os.path.join(pack_dir, next(f for f in sorted(os.listdir(pack_dir)) if f.endswith(suffix)))
+
+# Ways a learner's .git can be damaged. Every backend must still answer (by
+# falling back to git, which may well answer with an error message) rather
+# than raise, or one bad sandbox would crash a whole `grade` run.
+BENCH_DAMAGE = [
+    ("index truncated",       lambda repo: _truncate(os.path.join(repo, ".git", "index"), 30)),
+    ("pack truncated",        lambda repo: _truncate(_pack_file(repo, ".pack"), 200)),
+    ("pack index truncated",  lambda repo: _truncate(_pack_file(repo, ".idx"), 100)),
+    ("blank packed-refs line", lambda repo: (run_git("pack-refs", "--all", cwd=repo),
+                                             write_local_file(os.path.join(".git", "packed-refs"), "\n",
+                                                              cwd=repo, mode="a"))),
+]
+
+def check_damaged_repos(source, tmp):
+    """Run BENCH_QUERIES against damaged copies of `source`; returns what raised."""
+    global GIT_BACKEND, SNAPSHOT_CACHE
+    SNAPSHOT_CACHE = False
+    problems = []
+    for damage, apply in BENCH_DAMAGE:
+        repo = os.path.join(tmp, "damaged-" + damage.replace(" ", "-"))
+        shutil.copytree(source, repo)
+        apply(repo)
+        for name in GIT_BACKENDS:
+            GIT_BACKEND = name
+            close_git_backends()
+            for query, ask in BENCH_QUERIES.items():
+                try:
+                    ask(repo)
+                except Exception as e:
+                    problems.append(f"{damage}: {name} {query} raised {type(e).__name__}: {e}")
+        close_git_backends()
+    return problems
+
+def bench_git(argv):
+    global GIT_BACKEND, SNAPSHOT_CACHE
+    parser = argparse.ArgumentParser(prog="lab-runner.py bench-git",
+                                     description="Compare git backends on lab checks.")
+    parser.add_argument("--sandboxes", type=int, default=20, help="repos in the cohort (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=3, help="checks per repo per lab (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="lab-bench-")
+    try:
+        make_bench_repo(os.path.join(tmp, "repo0"))
+        sandboxes = [os.path.join(tmp, "repo0")]
+        for n in range(1, args.sandboxes):
+            sandboxes.append(os.path.join(tmp, f"repo{n}"))
+            shutil.copytree(sandboxes[0], sandboxes[-1])
+
+        results = {}
+        answers = {}
+        for name, backend, cache in BENCH_CONFIGS:
+            GIT_BACKEND, SNAPSHOT_CACHE = backend, cache
+            close_git_backends()
+            for lab, queries in BENCH_LABS:
+                forks = GIT_STATS["forks"]
+                start = time.perf_counter()
+                for _ in range(args.rounds):
+                    for cwd in sandboxes:
+                        with check_pass(cwd):  # as check_lab does; a no-op without the cache
+                            for query in queries:
+                                answers.setdefault((cwd, query), {})[name] = BENCH_QUERIES[query](cwd)
+                results[name, lab] = (GIT_STATS["forks"] - forks, time.perf_counter() - start)
+            close_git_backends()
+            forks = GIT_STATS["forks"]
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                for cwd in sandboxes:
+                    grade_sandbox(cwd)
+            results[name, BENCH_GRADE] = (GIT_STATS["forks"] - forks, time.perf_counter() - start)
+        damage_problems = check_damaged_repos(sandboxes[0], tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    banner("GIT BACKENDS")
+    print(f"  {args.sandboxes} sandboxes x {args.rounds} rounds per lab\n")
+    names = [name for name, _, _ in BENCH_CONFIGS]
+    print(f"  {'Lab':28s}" + "".join(f"{name + ' forks':>20s}{'ms':>8s}" for name in names))
+    totals = {name: [0, 0.0] for name in names}
+    for lab, _ in BENCH_LABS:
+        row = f"  {lab:28s}"
+        for name in names:
+            forks, seconds = results[name, lab]
+            totals[name][0] += forks
+            totals[name][1] += seconds
+            row += f"{forks:20d}{seconds * 1000:8.1f}"
+        print(row)
+    print(f"  {'Total':28s}" + "".join(f"{forks:20d}{seconds * 1000:8.1f}" for forks, seconds in totals.values()))
+    print(f"  {BENCH_GRADE:28s}" + "".join(f"{results[name, BENCH_GRADE][0]:20d}"
+                                           f"{results[name, BENCH_GRADE][1] * 1000:8.1f}" for name in names))
+
+    mismatches = [(key, got) for key, got in answers.items() if len(set(map(repr, got.values()))) > 1]
+    for (cwd, query), got in mismatches[:5]:
+        fail(f"{query} in {os.path.basename(cwd)}: {got}")
+    for problem in damage_problems:
+        fail(problem)
+    if mismatches or damage_problems:
+        return 1
+    success("All backends gave the same answers, and none raised on a damaged repo.")
+    return 0
+
 # ═══════════════════════════════════════════════════════
 # ENTRY POINT
 # ═══════════════════════════════════════════════════════
@@ -1436,6 +2344,10 @@ def main():
             reset()
             print("Progress reset!")
             return
+        elif arg == "grade":
+            sys.exit(grade(sys.argv[2:]))
+        elif arg == "bench-git":
+            sys.exit(bench_git(sys.argv[2:]))
         elif arg == "day" and len(sys.argv) > 2:
             load()
             try:
@@ -0,0 +1,438 @@
+# HTTP load tester for the TaskFlow API
+#
+# Starts server.py on a free local port (against a generated dataset), then
+# drives it from asyncio clients holding up to thousands of keep-alive
+# connections. Everything runs on this machine, so the numbers can gate a
+# release without any network access.
+#
+# Traffic models:
+#   closed  each connection sends its next request as soon as the previous
+#           response arrives (throughput at a given concurrency)
+#   open    requests arrive at --rate per second whether or not earlier ones
+#           have finished; latency is measured from the scheduled arrival, so
+#           a stalled server shows up as latency instead of being hidden
+#           (no coordinated omission)
+#
+#     python loadtest.py --model closed --connections 1000 --duration 20
+#     python loadtest.py --model open --rate 2000 --engine async --max-p99 50
+#     python loadtest.py --url http://127.0.0.1:8000 --path /api/tasks?limit=50
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import datagen
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = '/api/tasks?limit=50'
+
+
+class Histogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Values (integers, here microseconds) are grouped in buckets whose width
+    doubles every `2**sub_bucket_bits / 2` buckets, so every recorded value
+    is kept to within 1 / 2**(sub_bucket_bits - 1) relative precision (under
+    1% with the default 8 bits) using a few KB however many values go in.
+    """
+
+    def __init__(self, sub_bucket_bits=8):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        return shift * self.sub_buckets + (value >> shift)
+
+    def _highest_equivalent(self, index):
+        shift, mantissa = divmod(index, self.sub_buckets)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    def percentile(self, pct):
+        """Smallest value that at least `pct` percent of recorded values are <= to."""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def distribution(self, buckets=12):
+        """(upper bound, count) pairs on a log scale from min to max, for a text chart."""
+        if not self.count:
+            return []
+        low = max(1, self.min)
+        ratio = (max(self.max, low + 1) / low) ** (1.0 / buckets)
+        bounds = [low * ratio ** (n + 1) for n in range(buckets)]
+        bounds[-1] = self.max
+        counts = [0] * buckets
+        for index, count in self.counts.items():
+            value = min(self._highest_equivalent(index), self.max)
+            for n, bound in enumerate(bounds):
+                if value <= bound:
+                    counts[n] += count
+                    break
+        return list(zip(bounds, counts))
+
+
+class Stats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = {}
+        self.errors = {}
+
+    def ok(self, status, seconds):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency.record(seconds * 1e6)
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    @property
+    def requests(self):
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+    @property
+    def failures(self):
+        return sum(self.errors.values()) + sum(
+            count for status, count in self.statuses.items() if status >= 500)
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 client connection."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=b''):
+        """Send one request and read the whole response; returns the status."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        head = '%s %s HTTP/1.1\r\nHost: %s:%d\r\n' % (method, path, self.host, self.port)
+        if body:
+            head += 'Content-Type: application/json\r\nContent-Length: %d\r\n' % len(body)
+        self.writer.write(head.encode('latin-1') + b'\r\n' + body)
+        try:
+            return await asyncio.wait_for(self._read_response(method), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _read_response(self, method):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionResetError('server closed the connection')
+        status = int(line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if method == 'HEAD' or status in (204, 304):
+            pass
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.reader = None
+
+
+class LoadTest:
+    def __init__(self, host, port, paths, write_ratio=0.0, timeout=10.0, seed=1):
+        self.host = host
+        self.port = port
+        self.paths = paths
+        self.write_ratio = write_ratio
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stats = Stats()
+
+    def next_request(self):
+        if self.write_ratio and self.rng.random() < self.write_ratio:
+            body = json.dumps({'title': 'load test', 'assigned_to': 'user%05d' % self.rng.randrange(50)})
+            return 'POST', '/api/tasks', body.encode()
+        return 'GET', self.rng.choice(self.paths), b''
+
+    async def send(self, conn, started):
+        method, path, body = self.next_request()
+        try:
+            status = await conn.request(method, path, body)
+        except asyncio.TimeoutError:
+            self.stats.error('timeout')
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            self.stats.error(type(e).__name__)
+        else:
+            self.stats.ok(status, time.perf_counter() - started)
+
+    async def closed_loop(self, connections, duration, ramp_up=1.0):
+        deadline = time.perf_counter() + duration
+
+        async def client(n):
+            # Spread connection setup over the ramp-up instead of a SYN flood.
+            await asyncio.sleep(ramp_up * n / connections)
+            conn = Connection(self.host, self.port, self.timeout)
+            while time.perf_counter() < deadline:
+                await self.send(conn, time.perf_counter())
+            conn.close()
+
+        await asyncio.gather(*(client(n) for n in range(connections)))
+
+    async def open_loop(self, rate, connections, duration, poisson=True):
+        # LIFO, so warm connections are reused and new ones are only opened
+        # when every open one is busy.
+        idle = asyncio.LifoQueue()
+        for _ in range(connections):
+            idle.put_nowait(Connection(self.host, self.port, self.timeout))
+        pending = set()
+
+        async def arrival(scheduled):
+            conn = await idle.get()
+            try:
+                await self.send(conn, scheduled)
+            finally:
+                idle.put_nowait(conn)
+
+        start = time.perf_counter()
+        scheduled = start
+        while scheduled < start + duration:
+            scheduled += self.rng.expovariate(rate) if poisson else 1.0 / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(arrival(scheduled))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+        while not idle.empty():
+            idle.get_nowait().close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def raise_fd_limit(wanted):
+    """Allow enough open sockets for `wanted` connections (best effort)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted += 256
+    if hard != resource.RLIM_INFINITY:
+        wanted = min(wanted, hard)
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+def start_server(args, workdir):
+    """Launch server.py on a free port inside `workdir`; returns (process, port)."""
+    port = free_port()
+    datagen.build(os.path.join(workdir, 'taskflow.db'), args.rows)
+    command = [sys.executable, os.path.join(HERE, 'server.py'), '--host', '127.0.0.1',
+               '--port', str(port), '--engine', args.engine, '--workers', str(args.workers)]
+    command += args.server_arg
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server.py exited with status %d' % process.returncode)
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('server.py did not start listening within 30s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def report(args, test, elapsed):
+    stats = test.stats
+    latency = stats.latency
+    ms = lambda us: us / 1000.0
+    lines = [
+        '%s loop, %d connections%s, %.1fs' % (
+            args.model, args.connections,
+            ', target %g req/s' % args.rate if args.model == 'open' else '', elapsed),
+        '  requests   %d (%.0f req/s)' % (stats.requests, stats.requests / elapsed),
+        '  failures   %d (%.3f%%)' % (stats.failures, 100.0 * stats.failures / max(1, stats.requests)),
+        '  statuses   %s' % ', '.join('%d: %d' % item for item in sorted(stats.statuses.items())),
+    ]
+    if stats.errors:
+        lines.append('  errors     %s' % ', '.join('%s: %d' % item for item in sorted(stats.errors.items())))
+    lines.append('  latency ms min %.2f  mean %.2f  max %.2f' % (
+        ms(latency.min or 0), ms(latency.mean()), ms(latency.max)))
+    lines.append('  %12s %10s' % ('percentile', 'ms'))
+    for pct in (50, 75, 90, 95, 99, 99.9, 99.99, 100):
+        lines.append('  %12s %10.2f' % ('p%g' % pct, ms(latency.percentile(pct))))
+    distribution = latency.distribution()
+    if distribution:
+        widest = max(count for _, count in distribution) or 1
+        lines.append('  %12s %8s' % ('<= ms', 'count'))
+        for bound, count in distribution:
+            lines.append('  %12.2f %8d %s' % (ms(bound), count, '#' * int(40 * count / widest)))
+    return '\n'.join(lines)
+
+
+def summary(args, test, elapsed):
+    stats = test.stats
+    return {
+        'model': args.model,
+        'engine': None if args.url else args.engine,
+        'connections': args.connections,
+        'rate': args.rate if args.model == 'open' else None,
+        'duration': round(elapsed, 3),
+        'requests': stats.requests,
+        'throughput': round(stats.requests / elapsed, 1),
+        'failures': stats.failures,
+        'error_rate': round(stats.failures / max(1, stats.requests), 6),
+        'statuses': {str(k): v for k, v in sorted(stats.statuses.items())},
+        'errors': stats.errors,
+        'latency_ms': {('p%g' % pct): round(stats.latency.percentile(pct) / 1000.0, 3)
+                       for pct in (50, 90, 99, 99.9, 100)},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the TaskFlow API')
+    parser.add_argument('--model', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--connections', type=int, default=100, help='client connections')
+    parser.add_argument('--rate', type=float, default=1000.0, help='arrivals per second (open)')
+    parser.add_argument('--uniform', action='store_true',
+                        help='evenly spaced arrivals instead of Poisson (open)')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load')
+    parser.add_argument('--path', action='append', help='GET path, repeatable (default: %s)' % DEFAULT_PATH)
+    parser.add_argument('--write-ratio', type=float, default=0.0, help='share of POST /api/tasks')
+    parser.add_argument('--timeout', type=float, default=10.0, help='per-request timeout')
+    parser.add_argument('--url', help='test an already running server instead of starting one')
+    parser.add_argument('--engine', choices=['threaded', 'async'], default='threaded')
+    parser.add_argument('--workers', type=int, default=8, help='server worker threads')
+    parser.add_argument('--rows', type=int, default=10000, help='tasks in the generated dataset')
+    parser.add_argument('--server-arg', action='append', default=[],
+                        help='extra argument passed to server.py, repeatable')
+    parser.add_argument('--json', help='also write the summary here')
+    parser.add_argument('--max-p99', type=float, help='fail if p99 latency exceeds this many ms')
+    parser.add_argument('--max-error-rate', type=float, help='fail if the failure share exceeds this')
+    parser.add_argument('--min-throughput', type=float, help='fail below this many req/s')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    raise_fd_limit(args.connections)
+    paths = args.path or [DEFAULT_PATH]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process = None
+        if args.url:
+            target = urlsplit(args.url)
+            host, port = target.hostname, target.port or 80
+        else:
+            process, port = start_server(args, workdir)
+            host = '127.0.0.1'
+        test = LoadTest(host, port, paths, args.write_ratio, args.timeout)
+        try:
+            start = time.perf_counter()
+            if args.model == 'closed':
+                asyncio.run(test.closed_loop(args.connections, args.duration))
+            else:
+                asyncio.run(test.open_loop(args.rate, args.connections, args.duration,
+                                           poisson=not args.uniform))
+            elapsed = time.perf_counter() - start
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    print(report(args, test, elapsed))
+    result = summary(args, test, elapsed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    failed = []
+    if args.max_p99 is not None and result['latency_ms']['p99'] > args.max_p99:
+        failed.append('p99 %.2fms > %gms' % (result['latency_ms']['p99'], args.max_p99))
+    if args.max_error_rate is not None and result['error_rate'] > args.max_error_rate:
+        failed.append('error rate %.4f > %g' % (result['error_rate'], args.max_error_rate))
+    if args.min_throughput is not None and result['throughput'] < args.min_throughput:
+        failed.append('throughput %.0f < %g req/s' % (result['throughput'], args.min_throughput))
+    for reason in failed:
+        print('FAIL: %s' % reason)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
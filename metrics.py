@@ -0,0 +1,264 @@
+# Metrics for TaskFlow
+# A small Prometheus-compatible registry: counters, gauges and fixed-bucket
+# histograms with labels, rendered in the text exposition format at /metrics.
+# Recording is a dict lookup plus an add under a lock, so it is cheap enough
+# for every request and every query.
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        """All metrics in Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.help))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    pairs.extend('%s="%s"' % pair for pair in extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+# Per-request phase timings (db, serialize, ...) for the access log. The
+# request's thread installs a dict with request_timing(); code on the hot path
+# charges time to a phase with phase() or add_phase_time(). Both are no-ops
+# when no request is being timed.
+_request = threading.local()
+
+
+@contextmanager
+def request_timing(timing=None):
+    """Collect this thread's phase timings into `timing` (a dict) while active."""
+    timing = {} if timing is None else timing
+    previous = getattr(_request, 'timing', None)
+    _request.timing = timing
+    try:
+        yield timing
+    finally:
+        _request.timing = previous
+
+
+def add_phase_time(name, seconds):
+    timing = getattr(_request, 'timing', None)
+    if timing is not None:
+        timing[name] = timing.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    """Charge the time spent in the block to phase `name` of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(name, time.perf_counter() - start)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Export an unlabelled metric as 0 before its first update.
+            self.labels()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """The child metric for one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError('%s takes labels %s' % (self.name, self.labelnames))
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError('%s needs labels %s' % (self.name, self.labelnames))
+        return self.labels()
+
+    def samples(self):
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            for suffix, extra, value in child.samples():
+                yield '%s%s%s %s' % (self.name, suffix, _format_labels(self.labelnames, values, extra),
+                                     _format_value(value))
+
+
+class _Value:
+    def __init__(self):
+        self._value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def set_function(self, function):
+        """Read the value from `function()` at scrape time instead."""
+        self._function = function
+
+    def get(self):
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+    def samples(self):
+        return [('', (), self.get())]
+
+
+class _GaugeValue(_Value):
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+
+class Counter(_Metric):
+    """A value that only goes up (requests served, errors, ...)."""
+    type = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def set_function(self, function):
+        self._unlabelled().set_function(function)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down (open connections, queue depth, ...)."""
+    type = 'gauge'
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabelled().dec(amount)
+
+    def set_function(self, function):
+        self._unlabelled().set_function(function)
+
+
+class _HistogramValue:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += count
+            samples.append(('_bucket', (('le', _format_value(float(bound))),), cumulative))
+        samples.append(('_sum', (), total))
+        samples.append(('_count', (), cumulative))
+        return samples
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed buckets, plus their sum and count."""
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    def time(self, *labels, phase=None):
+        """Decorator recording how long each call takes, in seconds.
+
+        With `phase`, the time is also charged to that phase of the current
+        request, counting only the outermost of nested timed calls.
+        """
+        child = self.labels(*labels)
+
+        def decorate(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                outermost = phase is not None and not getattr(_request, phase, False)
+                if outermost:
+                    setattr(_request, phase, True)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    child.observe(elapsed)
+                    if outermost:
+                        setattr(_request, phase, False)
+                        add_phase_time(phase, elapsed)
+            return wrapper
+        return decorate
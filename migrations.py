@@ -0,0 +1,151 @@
+# Schema migrations for TaskFlow
+#
+# The schema version lives in SQLite's `PRAGMA user_version`. Each entry in
+# MIGRATIONS moves the database up by one version; migrate() applies the ones
+# that are missing, so it is safe to run on every startup.
+#
+# Never edit a migration that has shipped — append a new one instead.
+# A step is either an SQL string or a function taking the connection, for
+# steps that need to look at the database before deciding what to run.
+
+import sqlite3
+
+
+def fts5_available(conn):
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+    except sqlite3.OperationalError:
+        return False
+    conn.execute('DROP TABLE temp.fts5_probe')
+    return True
+
+
+def create_task_search(conn):
+    """Full-text index over task titles and descriptions, kept in sync by triggers.
+
+    Skipped when this SQLite build lacks FTS5; database.search_tasks() then
+    falls back to a LIKE scan. migrate() creates the index later if the
+    database is opened by a SQLite that has FTS5.
+    """
+    if not fts5_available(conn):
+        return
+    # External content: the index stores only tokens and reads the text back
+    # from `tasks`, so task text isn't kept twice.
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description,
+            content='tasks', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    # Index the tasks that existed before this migration.
+    conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+
+MIGRATIONS = [
+    # 1: base schema (matches what init_db created before versioning existed)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            completed BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            assigned_to TEXT DEFAULT ''
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT NOT NULL,
+            role TEXT DEFAULT 'developer'
+        )
+        ''',
+    ],
+    # 2: indexes for the hot task queries
+    [
+        # newest-first listing and keyset pagination
+        'CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at, id)',
+        # "tasks assigned to X", optionally open/done only, newest first
+        'CREATE INDEX IF NOT EXISTS idx_tasks_assignee ON tasks (assigned_to, completed, created_at)',
+        # open/done task lists across all assignees
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed, created_at)',
+    ],
+    # 3: full-text search over tasks (FTS5)
+    [
+        create_task_search,
+    ],
+    # 4: "all tasks assigned to X, newest first" without a sort. In
+    # idx_tasks_assignee, completed sits between assigned_to and created_at,
+    # so that query had to sort every matching row in a temp B-tree.
+    [
+        'CREATE INDEX IF NOT EXISTS idx_tasks_assignee_created ON tasks (assigned_to, created_at)',
+    ],
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+TASK_SEARCH_VERSION = 3
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def task_search_missing(conn):
+    """True if migration 3 ran without FTS5 and this SQLite could now build the index."""
+    return (current_version(conn) >= TASK_SEARCH_VERSION and
+            conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+                .fetchone() is None and
+            fts5_available(conn))
+
+
+def migrate(conn):
+    """Apply any pending migrations; returns the list of versions applied.
+
+    Also builds the search index that migration 3 had to skip, once the
+    database is opened with a SQLite that has FTS5.
+    """
+    applied = []
+    if current_version(conn) < LATEST_VERSION or task_search_missing(conn):
+        # Take the write lock first so two processes starting together can't
+        # both run the same migration.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = current_version(conn)
+            if task_search_missing(conn):
+                create_task_search(conn)
+            for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                for step in statements:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute('PRAGMA user_version = %d' % number)
+                applied.append(number)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return applied
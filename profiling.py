@@ -0,0 +1,231 @@
+# On-demand profiling for the TaskFlow API
+#
+# Everything here is off unless TASKFLOW_PROFILE_TOKEN is set. With a token:
+#
+# * One request can be profiled by asking for a mode and sending the token:
+#       curl -H 'X-Profile: cprofile' -H "X-Profile-Token: $TOKEN" localhost:8000/api/tasks
+#       curl -H "X-Profile-Token: $TOKEN" "localhost:8000/api/tasks?profile=sample"
+#   Mode "cprofile" runs the handler under cProfile; "sample" takes
+#   stack samples of the handling thread every millisecond, which perturbs
+#   timings far less. The report replaces the response body, or, when
+#   TASKFLOW_PROFILE_DIR is set, is saved there and named in an
+#   X-Profile-File header while the normal response goes out. The token is
+#   only accepted in the header: query strings end up in access logs.
+#
+# * With --profile-sample-hz N (or TASKFLOW_PROFILE_SAMPLE_HZ), a background
+#   sampler records the stacks of threads busy handling a request N times a
+#   second. GET /debug/profile (with the token) returns them as folded
+#   stacks, the input format of flamegraph.pl and speedscope; add reset=1 to
+#   start over.
+#
+# Only the request handler itself is profiled; a streamed body is produced
+# while it is being written, after the profile has ended.
+
+import cProfile
+import hmac
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_TOKEN = os.environ.get('TASKFLOW_PROFILE_TOKEN', '')
+PROFILE_DIR = os.environ.get('TASKFLOW_PROFILE_DIR', '')
+SAMPLE_HZ = float(os.environ.get('TASKFLOW_PROFILE_SAMPLE_HZ', '0'))
+REQUEST_SAMPLE_INTERVAL = 0.001
+REPORT_LINES = 40
+MODES = ('cprofile', 'sample')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Frames that mean a thread is working on a request rather than idling
+# between them (waiting for a connection or the next keep-alive request).
+BUSY_FRAMES = {'server:handle_request', 'server:dispatch', 'async_server:write_stream'}
+
+_counter = itertools.count(1)
+
+
+class ProfileDenied(Exception):
+    """A profile was asked for with the wrong token."""
+
+
+def _header(headers, name):
+    return headers.get(name) if headers is not None else None
+
+
+def authorized(headers):
+    """True if the request carries the profiling token in X-Profile-Token."""
+    offered = _header(headers, 'X-Profile-Token') or ''
+    return bool(PROFILE_TOKEN and offered) and \
+        hmac.compare_digest(offered.encode(), PROFILE_TOKEN.encode())
+
+
+def requested(headers, query):
+    """The profiling mode a request asks for, or None.
+
+    Raises ProfileDenied if it asks without the right token, and ValueError
+    for an unknown mode.
+    """
+    mode = _header(headers, 'X-Profile') or query.get('profile', [''])[0]
+    if not PROFILE_TOKEN or not mode:
+        return None
+    if not authorized(headers):
+        raise ProfileDenied('bad profiling token')
+    if mode not in MODES:
+        raise ValueError('profile must be one of %s' % ', '.join(MODES))
+    return mode
+
+
+def _is_ours(code):
+    return os.path.dirname(os.path.abspath(code.co_filename)) == HERE
+
+
+def frame_label(frame):
+    """module:function, e.g. database:get_tasks_page or http.server:handle."""
+    code = frame.f_code
+    if _is_ours(code):
+        # Not __name__: server.py runs as __main__.
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    else:
+        module = frame.f_globals.get('__name__', '?')
+    return '%s:%s' % (module, code.co_name)
+
+
+def folded_stack(frame):
+    """`frame`'s stack as root;...;leaf, starting at the first TaskFlow frame."""
+    labels = []
+    outermost = None
+    while frame is not None:
+        labels.append(frame_label(frame))
+        if _is_ours(frame.f_code):
+            outermost = len(labels)
+        frame = frame.f_back
+    if outermost is not None:
+        labels = labels[:outermost]
+    return ';'.join(reversed(labels))
+
+
+def is_busy(frame):
+    while frame is not None:
+        if _is_ours(frame.f_code) and frame_label(frame) in BUSY_FRAMES:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def format_folded(stacks):
+    return ''.join('%s %d\n' % (stack, count) for stack, count in stacks.most_common())
+
+
+class Sampler(threading.Thread):
+    """Background thread that periodically records other threads' stacks.
+
+    With `thread_id`, only that thread is sampled; otherwise every thread
+    that is busy with a request (see BUSY_FRAMES).
+    """
+
+    def __init__(self, interval, thread_id=None):
+        super().__init__(name='taskflow-sampler', daemon=True)
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                picked = [frame] if frame is not None else []
+            else:
+                picked = [f for ident, f in frames.items() if ident != me and is_busy(f)]
+            with self._lock:
+                self.samples += 1
+                for frame in picked:
+                    self.stacks[folded_stack(frame)] += 1
+            del frames, picked
+
+    def folded(self, reset=False):
+        """Aggregated stacks in folded format ("a;b;c 12" per line)."""
+        with self._lock:
+            stacks = self.stacks
+            if reset:
+                self.stacks = Counter()
+                self.samples = 0
+            else:
+                stacks = Counter(stacks)
+        return format_folded(stacks)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run(mode, function, *args):
+    """Call `function(*args)` under the given profiler.
+
+    Returns (result, report text, path the report was saved to or None).
+    """
+    start = time.perf_counter()
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function, *args)
+        elapsed = time.perf_counter() - start
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats('cumulative').print_stats(REPORT_LINES)
+        report = 'cProfile of one request, %.2f ms\n%s' % (elapsed * 1000, out.getvalue())
+        suffix = '.prof'
+    else:
+        sampler = Sampler(REQUEST_SAMPLE_INTERVAL, threading.get_ident())
+        sampler.start()
+        try:
+            result = function(*args)
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - start
+        report = sampler.folded()
+        suffix = '.folded'
+
+    path = None
+    if PROFILE_DIR:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, 'profile-%s-%d-%d%s' % (
+            time.strftime('%Y%m%d-%H%M%S'), os.getpid(), next(_counter), suffix))
+        if mode == 'cprofile':
+            stats.dump_stats(path)  # binary pstats, for snakeviz / python -m pstats
+        else:
+            with open(path, 'w') as f:
+                f.write(report)
+    return result, report, path
+
+
+_sampler = None
+
+
+def start_sampling(hz=SAMPLE_HZ):
+    """Start the continuous low-rate sampler (no-op for hz <= 0)."""
+    global _sampler
+    stop_sampling()
+    if hz > 0:
+        _sampler = Sampler(1.0 / hz)
+        _sampler.start()
+
+
+def stop_sampling():
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
+
+
+def sampled_stacks(reset=False):
+    """Folded stacks from the continuous sampler, or None if it isn't running."""
+    if _sampler is None:
+        return None
+    return _sampler.folded(reset)
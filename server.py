@@ -1,23 +1,934 @@
 # TaskFlow Backend API
 
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from collections import OrderedDict
+import argparse
+import hashlib
 import json
+import os
+import re
+import selectors
+import socket
+import sqlite3
+import struct
+import threading
+import time
+import zlib
 
-tasks = [
-    {"id": 1, "title": "Set up project", "completed": True},
-    {"id": 2, "title": "Build login page", "completed": False},
-    {"id": 3, "title": "Add database", "completed": False},
+import access_log
+import database
+import metrics
+import profiling
+
+# Persistent connections: how long an idle keep-alive connection may sit
+# before we drop it, how many requests one connection may make before we
+# ask the client to reconnect (this stops one client pinning a worker forever),
+# and how many idle connections the worker pool keeps parked between requests.
+IDLE_TIMEOUT = float(os.environ.get('TASKFLOW_IDLE_TIMEOUT', '5'))
+MAX_KEEPALIVE_REQUESTS = int(os.environ.get('TASKFLOW_MAX_KEEPALIVE_REQUESTS', '100'))
+MAX_IDLE_CONNECTIONS = int(os.environ.get('TASKFLOW_MAX_IDLE_CONNECTIONS', '1024'))
+RESPONSE_CACHE_SIZE = int(os.environ.get('TASKFLOW_RESPONSE_CACHE_SIZE', '256'))
+# Bodies smaller than this aren't worth compressing (gzip adds ~20 bytes of framing).
+COMPRESSION_MIN_SIZE = int(os.environ.get('TASKFLOW_COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_LEVEL = int(os.environ.get('TASKFLOW_COMPRESSION_LEVEL', '6'))
+STREAM_BATCH_SIZE = 500
+
+MAX_BODY_SIZE = int(os.environ.get('TASKFLOW_MAX_BODY_SIZE', str(1024 * 1024)))
+MAX_ROW_ID = 2 ** 63 - 1
+
+# Request handling is kept independent of the transport so the threaded
+# TaskHandler and the asyncio engine (async_server.py) serve the exact same
+# API. A handler returns (status, headers, body), where body is either bytes
+# or an iterator of byte chunks to be sent with chunked transfer encoding.
+
+class HTTPError(Exception):
+    """Raised by route handlers to answer with a JSON error."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Request:
+    """What a route handler sees: method, parsed URL, headers, body and path params."""
+
+    def __init__(self, method, target, headers=None, body=b''):
+        url = urlsplit(target)
+        self.method = method
+        self.target = target
+        self.path = url.path
+        self.query = parse_qs(url.query)
+        self.headers = headers
+        self.body = body
+        self.params = ()
+
+    def json(self):
+        """The body as a JSON object (parsed straight from bytes, no decode copy)."""
+        if not self.body:
+            raise HTTPError(400, 'request body is empty')
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, 'request body is not valid JSON')
+        if not isinstance(data, dict):
+            raise HTTPError(400, 'request body must be a JSON object')
+        return data
+
+def json_response(data, status=200, headers=()):
+    with metrics.phase('serialize'):
+        body = json.dumps(data).encode()
+    return status, [('Content-Type', 'application/json')] + list(headers), body
+
+def empty_response(status=204):
+    return status, [], b''
+
+def parse_bool(value, name):
+    if isinstance(value, bool):
+        return value
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise HTTPError(400, '%s must be a boolean' % name)
+
+def path_id(request, noun):
+    """The numeric id captured from the path, e.g. 42 in /api/tasks/42.
+
+    An id past SQLite's INTEGER range can't belong to any row (and would
+    overflow when bound as a parameter), so it is simply not found.
+    """
+    value = int(request.params[0])
+    if value > MAX_ROW_ID:
+        raise HTTPError(404, '%s not found' % noun)
+    return value
+
+def validate_fields(data, allowed, required=()):
+    """Check a JSON body against a field spec {name: type}; returns the clean dict."""
+    unknown = sorted(set(data) - set(allowed))
+    if unknown:
+        raise HTTPError(400, 'unknown field(s): %s' % ', '.join(unknown))
+    for name in required:
+        if not data.get(name):
+            raise HTTPError(400, '%s is required' % name)
+    clean = {}
+    for name, value in data.items():
+        kind = allowed[name]
+        if kind is bool:
+            clean[name] = parse_bool(value, name)
+        elif not isinstance(value, kind):
+            raise HTTPError(400, '%s must be a %s' % (name, kind.__name__))
+        elif kind is str and name in required and not value.strip():
+            raise HTTPError(400, '%s must not be blank' % name)
+        else:
+            clean[name] = value
+    return clean
+
+TASK_SCHEMA = {'title': str, 'description': str, 'assigned_to': str, 'completed': bool}
+USER_SCHEMA = {'username': str, 'email': str, 'role': str}
+
+# ─── Tasks ───
+
+def list_tasks(request):
+    if wants_stream(request.query, request.headers):
+        return stream_tasks(request.query, request.headers)
+    return cached_get(request.target, request.headers, lambda: get_tasks(request.query))
+
+def get_tasks(query):
+    if 'assigned_to' in query:
+        completed = None
+        if 'completed' in query:
+            completed = parse_bool(query['completed'][0], 'completed')
+        rows = database.get_tasks_for_user(query['assigned_to'][0], completed)
+        return json_response([database.task_to_dict(row) for row in rows])
+    if 'limit' in query or 'cursor' in query:
+        return get_task_page(query)
+    return json_response([database.task_to_dict(row) for row in database.get_all_tasks()])
+
+def get_task_page(query):
+    """One keyset page of tasks from the database."""
+    try:
+        limit = int(query.get('limit', [database.PAGE_SIZE])[0])
+        rows, next_cursor = database.get_tasks_page(limit, query.get('cursor', [None])[0])
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    return json_response({
+        "tasks": [database.task_to_dict(row) for row in rows],
+        "next_cursor": next_cursor,
+    })
+
+def search_tasks(request):
+    terms = request.query.get('q', [''])[0]
+    if not database.search_terms(terms):
+        raise HTTPError(400, 'q must contain at least one word')
+    try:
+        limit = int(request.query.get('limit', [database.SEARCH_LIMIT])[0])
+    except ValueError:
+        raise HTTPError(400, 'limit must be an integer')
+
+    def build():
+        results = []
+        for row in database.search_tasks(terms, limit):
+            task = database.task_to_dict(row)
+            task['snippet'] = row[len(database.TASK_COLUMNS)]
+            results.append(task)
+        return json_response(results)
+    return cached_get(request.target, request.headers, build)
+
+def create_task(request):
+    data = validate_fields(request.json(), TASK_SCHEMA, required=('title',))
+    task_id = database.add_task(data['title'], data.get('description', ''),
+                                data.get('assigned_to', ''), data.get('completed', False))
+    row = database.get_task(task_id)
+    return json_response(database.task_to_dict(row), status=201,
+                         headers=[('Location', '/api/tasks/%d' % task_id)])
+
+def get_task(request):
+    def build():
+        row = database.get_task(path_id(request, 'task'))
+        if row is None:
+            raise HTTPError(404, 'task not found')
+        return json_response(database.task_to_dict(row))
+    return cached_get(request.target, request.headers, build)
+
+def update_task(request):
+    data = validate_fields(request.json(), TASK_SCHEMA)
+    if 'title' in data and not data['title'].strip():
+        raise HTTPError(400, 'title must not be blank')
+    row = database.update_task(path_id(request, 'task'), **data)
+    if row is None:
+        raise HTTPError(404, 'task not found')
+    return json_response(database.task_to_dict(row))
+
+def delete_task(request):
+    if not database.delete_task(path_id(request, 'task')):
+        raise HTTPError(404, 'task not found')
+    return empty_response()
+
+# ─── Users ───
+
+def list_users(request):
+    return cached_get(request.target, request.headers, lambda: json_response(
+        [database.user_to_dict(row) for row in database.get_all_users()]))
+
+def create_user(request):
+    data = validate_fields(request.json(), USER_SCHEMA, required=('username', 'email'))
+    try:
+        user_id = database.add_user(data['username'], data['email'], data.get('role', 'developer'))
+    except sqlite3.IntegrityError:
+        raise HTTPError(409, 'username already exists')
+    return json_response(database.user_to_dict(database.get_user(user_id)), status=201,
+                         headers=[('Location', '/api/users/%d' % user_id)])
+
+def get_user(request):
+    def build():
+        row = database.get_user(path_id(request, 'user'))
+        if row is None:
+            raise HTTPError(404, 'user not found')
+        return json_response(database.user_to_dict(row))
+    return cached_get(request.target, request.headers, build)
+
+def update_user(request):
+    data = validate_fields(request.json(), USER_SCHEMA)
+    for name in ('username', 'email'):
+        if name in data and not data[name].strip():
+            raise HTTPError(400, '%s must not be blank' % name)
+    try:
+        row = database.update_user(path_id(request, 'user'), **data)
+    except sqlite3.IntegrityError:
+        raise HTTPError(409, 'username already exists')
+    if row is None:
+        raise HTTPError(404, 'user not found')
+    return json_response(database.user_to_dict(row))
+
+def delete_user(request):
+    if not database.delete_user(path_id(request, 'user')):
+        raise HTTPError(404, 'user not found')
+    return empty_response()
+
+# ─── Stats ───
+
+def get_metrics(request):
+    """Every registered metric, in Prometheus text format."""
+    body = metrics.REGISTRY.exposition().encode('utf-8')
+    return 200, [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+                 ('Cache-Control', 'no-store')], body
+
+def get_stats(request):
+    """Cache and pool counters, never cached themselves."""
+    return json_response({
+        "user_tasks_cache": database.user_tasks_cache.stats(),
+        "response_cache": {"entries": len(response_cache)},
+        "pool": database.get_pool().stats(),
+    }, headers=[('Cache-Control', 'no-store')])
+
+def get_profile_stacks(request):
+    """Folded stacks from the background sampler; needs the profiling token."""
+    if not profiling.authorized(request.headers):
+        raise HTTPError(404, 'not found')
+    stacks = profiling.sampled_stacks(reset=parse_bool(request.query.get('reset', ['0'])[0], 'reset'))
+    if stacks is None:
+        raise HTTPError(409, 'sampler is not running (start the server with --profile-sample-hz)')
+    return 200, [('Content-Type', 'text/plain; charset=utf-8'),
+                 ('Cache-Control', 'no-store')], stacks.encode('utf-8')
+
+def wants_ndjson(query, headers):
+    if query.get('format', [''])[0] == 'ndjson':
+        return True
+    return headers is not None and 'application/x-ndjson' in (headers.get('Accept') or '')
+
+def wants_stream(query, headers):
+    """Stream when asked via ?stream=1, ?format=ndjson or Accept: application/x-ndjson."""
+    if query.get('stream', ['0'])[0] not in ('0', '', 'false'):
+        return True
+    return wants_ndjson(query, headers)
+
+def stream_tasks(query, headers):
+    """Every task from the database, streamed batch by batch as JSON or NDJSON."""
+    ndjson = wants_ndjson(query, headers)
+    content_type = 'application/x-ndjson' if ndjson else 'application/json'
+    return 200, [('Content-Type', content_type)], iter_task_chunks(ndjson)
+
+def iter_task_chunks(ndjson=False, batch_size=STREAM_BATCH_SIZE):
+    """Yield encoded tasks one database batch at a time, so memory stays flat."""
+    if ndjson:
+        for rows in database.iter_tasks(batch_size):
+            with metrics.phase('serialize'):
+                chunk = ''.join(json.dumps(database.task_to_dict(row)) + '\n' for row in rows).encode()
+            yield chunk
+        return
+    yield b'['
+    separator = ''
+    for rows in database.iter_tasks(batch_size):
+        with metrics.phase('serialize'):
+            chunk = (separator + ', '.join(json.dumps(database.task_to_dict(row)) for row in rows)).encode()
+        yield chunk
+        separator = ', '
+    yield b']'
+
+def next_chunk(chunks, timing=None):
+    """The next chunk of a streamed body, or None once it's exhausted.
+
+    A streamed body does its queries and serializing as it is written, so
+    that time is added to `timing` just as handle_request() does for a
+    handler that builds its body up front.
+    """
+    with metrics.request_timing(timing):
+        return next(chunks, None)
+
+# SO_LINGER with a zero timeout: close() resets the connection instead of
+# ending it cleanly, so a client can't mistake a cut-off body for a whole one.
+RESET_LINGER = struct.pack('ii', 1, 0)
+
+class ResponseCache:
+    """Serialized GET responses, each tagged with the data version it was built from.
+
+    An entry is only served while database.data_version() still matches, so
+    any write invalidates it. Least recently used entries are evicted once
+    there are more than `max_entries`.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['version'] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, entry):
+        entry['version'] = version
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+response_cache = ResponseCache()
+
+def make_etag(body):
+    return '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+def negotiate_encoding(accept_encoding):
+    """Pick gzip or deflate from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[coding.strip().lower()] = q
+    best = None
+    for coding in ('gzip', 'deflate'):
+        q = offered.get(coding, offered.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (coding, q)
+    return best[0] if best else None
+
+def compress(body, encoding, level=None):
+    level = COMPRESSION_LEVEL if level is None else level
+    if encoding == 'gzip':
+        # wbits=31 writes a gzip wrapper with mtime 0, so output is deterministic.
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    return zlib.compress(body, level)  # HTTP "deflate" is the zlib format
+
+def cached_get(key, request_headers, build):
+    """Serve `build()` from the response cache, answering If-None-Match with 304.
+
+    Compressed variants are cached next to the identity body, so one version
+    of a response is compressed at most once per encoding.
+    """
+    version = database.data_version()
+    entry = response_cache.get(key, version)
+    if entry is None:
+        status, headers, body = build()
+        if status != 200:
+            return status, headers, body
+        entry = response_cache.put(key, version, {
+            'headers': headers,
+            'etag': make_etag(body),
+            'variants': {None: body},
+        })
+
+    encoding = None
+    if request_headers is not None and len(entry['variants'][None]) >= COMPRESSION_MIN_SIZE:
+        encoding = negotiate_encoding(request_headers.get('Accept-Encoding'))
+    body = entry['variants'].get(encoding)
+    if body is None:
+        with metrics.phase('serialize'):
+            body = compress(entry['variants'][None], encoding)
+        entry['variants'][encoding] = body
+
+    # Each representation needs its own strong ETag.
+    etag = entry['etag'] if encoding is None else entry['etag'][:-1] + '-' + encoding + '"'
+    validators = [('ETag', etag), ('Cache-Control', 'no-cache'), ('Vary', 'Accept-Encoding')]
+    if request_headers is not None and etag_matches(request_headers.get('If-None-Match'), etag):
+        return 304, validators, b''
+    headers = entry['headers'] + validators
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    return 200, headers, body
+
+ROUTES = [
+    ('GET', r'/api/tasks', list_tasks),
+    ('POST', r'/api/tasks', create_task),
+    ('GET', r'/api/tasks/search', search_tasks),
+    ('GET', r'/api/tasks/(\d+)', get_task),
+    ('PATCH', r'/api/tasks/(\d+)', update_task),
+    ('DELETE', r'/api/tasks/(\d+)', delete_task),
+    ('GET', r'/api/users', list_users),
+    ('POST', r'/api/users', create_user),
+    ('GET', r'/api/users/(\d+)', get_user),
+    ('PATCH', r'/api/users/(\d+)', update_user),
+    ('DELETE', r'/api/users/(\d+)', delete_user),
+    ('GET', r'/api/stats', get_stats),
+    ('GET', r'/metrics', get_metrics),
+    ('GET', r'/debug/profile', get_profile_stacks),
 ]
+ROUTES = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in ROUTES]
+
+# Labelled by route pattern rather than path, so /api/tasks/1 and
+# /api/tasks/2 share one series.
+REQUEST_SECONDS = metrics.Histogram(
+    'taskflow_http_request_seconds', 'Time to build each API response.', ['method', 'route', 'status'])
+RESPONSE_BYTES = metrics.Histogram(
+    'taskflow_http_response_bytes', 'Size of each (non-streamed) API response body.',
+    ['method', 'route'], buckets=metrics.SIZE_BUCKETS)
+REQUESTS_IN_PROGRESS = metrics.Gauge(
+    'taskflow_http_requests_in_progress', 'API requests being handled right now.')
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+def handle_request(method, target, headers=None, body=b'', timing=None):
+    """Route one request; returns (status, headers, body).
+
+    If `timing` is a dict, time spent in the database and serializing is
+    added to it under 'db' and 'serialize' (for the access log).
+    """
+    start = time.perf_counter()
+    REQUESTS_IN_PROGRESS.inc()
+    try:
+        with metrics.request_timing(timing):
+            route, response = profile_request(Request(method, target, headers, body))
+    finally:
+        REQUESTS_IN_PROGRESS.dec()
+    status, _, response_body = response
+    label = method if method in KNOWN_METHODS else 'other'
+    REQUEST_SECONDS.labels(label, route, str(status)).observe(time.perf_counter() - start)
+    if isinstance(response_body, bytes):
+        RESPONSE_BYTES.labels(label, route).observe(len(response_body))
+    return response
+
+def profile_request(request):
+    """route_request(), under a profiler if the request asks for one (see profiling.py)."""
+    try:
+        mode = profiling.requested(request.headers, request.query)
+    except profiling.ProfileDenied as e:
+        return 'unmatched', json_response({"error": str(e)}, status=403)
+    except ValueError as e:
+        return 'unmatched', json_response({"error": str(e)}, status=400)
+    if mode is None:
+        return route_request(request)
+    (route, response), report, path = profiling.run(mode, route_request, request)
+    status, headers, body = response
+    if path is not None:
+        return route, (status, list(headers) + [('X-Profile-File', path)], body)
+    return route, (200, [('Content-Type', 'text/plain; charset=utf-8'), ('Cache-Control', 'no-store'),
+                         ('X-Profiled-Status', str(status))], report.encode('utf-8'))
+
+def route_request(request):
+    """Find and run the handler; returns (route pattern, response).
+
+    HEAD runs the GET handler; the engines send its headers without the body.
+    """
+    method = 'GET' if request.method == 'HEAD' else request.method
+    allowed = []
+    route = 'unmatched'
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.match(request.path)
+        if match is None:
+            continue
+        route = pattern.pattern[:-1]
+        if route_method != method:
+            allowed.append(route_method)
+            if route_method == 'GET':
+                allowed.append('HEAD')
+            continue
+        request.params = match.groups()
+        try:
+            return route, handler(request)
+        except HTTPError as e:
+            return route, json_response({"error": e.message}, status=e.status)
+        except Exception:
+            # A bug or a database failure ("database is locked", ...): answer
+            # like any other error instead of dropping the connection.
+            access_log.server_logger.exception('error handling %s %s', request.method, request.path)
+            return route, json_response({"error": "internal server error"}, status=500)
+    if allowed:
+        return route, json_response({"error": "method not allowed"}, status=405,
+                                    headers=[('Allow', ', '.join(allowed))])
+    return route, json_response({"error": "not found"}, status=404)
 
 class TaskHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = IDLE_TIMEOUT
+    # Headers and body go out in separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK (~40ms) on every keep-alive request.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.requests_served = 0
+        self.request_started = time.perf_counter()
+        self.parked = False
+        self.aborted = False
+
+    def handle(self):
+        """Serve requests until the connection closes or goes idle.
+
+        Under WorkerPoolHTTPServer an idle keep-alive connection is parked
+        (see WorkerPoolHTTPServer.park) instead of holding its worker while
+        it waits for the client's next request. A server that can't park
+        (the single-threaded workers=0 HTTPServer) closes every connection
+        after one response, or one idle client would block all the others.
+        """
+        can_park = hasattr(self.server, 'park')
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if can_park and not self.input_pending():
+                self.parked = True
+                return
+            self.handle_one_request()
+
+    def input_pending(self):
+        """True if the next request has already (partly) arrived."""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def resume(self):
+        """Carry on serving a parked connection whose client has sent more."""
+        self.parked = False
+        try:
+            self.handle()
+        finally:
+            self.finish()
+
+    def finish(self):
+        if not self.parked:
+            super().finish()
+            if self.aborted:
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, RESET_LINGER)
+                self.connection.close()
+
+    def parse_request(self):
+        # The request line has just arrived; time from here, not from when
+        # the connection started idling.
+        self.request_started = time.perf_counter()
+        return super().parse_request()
+
+    def log_request(self, code='-', size='-'):
+        pass  # dispatch() writes the structured access log instead
+
+    def log_message(self, format, *args):
+        access_log.server_logger.warning('%s - %s', self.address_string(), format % args)
+
     def do_GET(self):
-        if self.path == '/api/tasks':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(tasks).encode())
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def do_HEAD(self):
+        self.dispatch('HEAD')
+
+    # Not routed; these let the router answer 405 with Allow, exactly as the
+    # async engine does, instead of BaseHTTPRequestHandler's HTML 501.
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_OPTIONS(self):
+        self.dispatch('OPTIONS')
+
+    def dispatch(self, method):
+        timing = {}
+        response = self.read_body()
+        timing['parse'] = time.perf_counter() - self.request_started
+        if isinstance(response, bytes):
+            response = handle_request(method, self.path, self.headers, response, timing)
+        written = time.perf_counter()
+        produced = timing.get('db', 0.0) + timing.get('serialize', 0.0)
+        size = self.send(*response, timing=timing)
+        finished = time.perf_counter()
+        # A streamed body's queries ran while it was being written; count
+        # them once, under db/serialize.
+        produced = timing.get('db', 0.0) + timing.get('serialize', 0.0) - produced
+        timing['write'] = finished - written - produced
+        access_log.record(method, self.path, response[0], size, self.client_address[0], timing,
+                          finished - self.request_started, self.headers.get('User-Agent'))
+
+    def read_body(self):
+        """The request body, or an error response if it can't be read."""
+        if self.headers.get('Transfer-Encoding'):
+            return json_response({"error": "chunked request bodies are not supported"},
+                                 status=411, headers=[('Connection', 'close')])
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return json_response({"error": "bad Content-Length"}, status=400,
+                                 headers=[('Connection', 'close')])
+        if length > MAX_BODY_SIZE:
+            return json_response({"error": "request body too large"}, status=413,
+                                 headers=[('Connection', 'close')])
+        return self.rfile.read(length) if length else b''
+
+    def send(self, status, headers, body, timing=None):
+        """Write one response; returns the number of body bytes sent.
+
+        If producing a streamed body fails part way, the error is logged and
+        the connection is reset instead of finishing the body.
+        """
+        self.requests_served += 1
+        streaming = not isinstance(body, bytes)
+        # HTTP/1.0 clients don't understand chunked; they get the raw stream
+        # and the end of the body is marked by closing the connection.
+        chunked = streaming and self.request_version == 'HTTP/1.1'
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        elif status not in (204, 304) and not streaming:
+            self.send_header('Content-Length', str(len(body)))
+        if (self.requests_served >= MAX_KEEPALIVE_REQUESTS or (streaming and not chunked)
+                or not hasattr(self.server, 'park')):
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        if self.command == 'HEAD':
+            # Headers only, or the client reads the body as the next response.
+            if streaming:
+                body.close()
+            return 0
+        if not streaming:
+            self.wfile.write(body)
+            return len(body)
+        size = 0
+        while True:
+            try:
+                chunk = next_chunk(body, timing)
+            except Exception:
+                access_log.server_logger.exception('error streaming %s %s', self.command, self.path)
+                self.close_connection = True
+                self.aborted = True
+                return size
+            if chunk is None:
+                break
+            if chunk:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                size += len(chunk)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+        return size
+
+BUSY_RESPONSE = (
+    b'HTTP/1.0 503 Service Unavailable\r\n'
+    b'Content-Type: application/json\r\n'
+    b'Content-Length: 25\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+    b'{"error": "server busy"}\n'
+)
+REJECTED_CONNECTIONS = metrics.Counter(
+    'taskflow_http_rejected_connections_total', 'Connections turned away with 503 because every worker was busy.')
+
+IDLE_CONNECTIONS = metrics.Gauge(
+    'taskflow_http_idle_connections', 'Keep-alive connections parked between requests.')
+
+class WorkerPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed pool of worker threads.
+
+    At most `workers` connections are served at once and `queue_depth` more
+    may wait for a worker. Anything beyond that gets an immediate 503 instead
+    of piling up, so a burst can't exhaust threads or memory.
+
+    A keep-alive connection only holds a worker while it has a request to
+    serve. In between, it is parked: a watcher thread waits on all parked
+    sockets with one selector and queues a connection for a worker again as
+    soon as its next request arrives, or closes it after IDLE_TIMEOUT. So a
+    few idle clients can't keep everyone else waiting for a worker.
+    """
+
+    # The listen() backlog; HTTPServer's default of 5 makes the kernel drop
+    # SYNs during bursts, which shows up as 1s+ retransmit stalls.
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=8, queue_depth=64,
+                 idle_timeout=IDLE_TIMEOUT, max_idle=MAX_IDLE_CONNECTIONS):
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='taskflow-worker')
+        self.slots = threading.BoundedSemaphore(workers + queue_depth)
+        self.rejected = 0
+        # Parked handlers, oldest first, with the time each one expires. Only
+        # the watcher thread touches these; workers hand over via self.arrivals.
+        self.idle = OrderedDict()
+        self.selector = selectors.DefaultSelector()
+        self.arrivals = []
+        self.arrivals_lock = threading.Lock()
+        self.wakeup, self.waker = socket.socketpair()
+        self.selector.register(self.wakeup, selectors.EVENT_READ)
+        self.closing = False
+        self.watcher = threading.Thread(target=self.watch_idle, name='taskflow-keepalive', daemon=True)
+        self.watcher.start()
+
+    def process_request(self, request, client_address):
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            REJECTED_CONNECTIONS.inc()
+            self.reject_request(request)
+            return
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        handler = None
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.slots.release()
+            self.park_or_close(handler, request)
+
+    def process_parked(self, handler):
+        try:
+            handler.resume()
+        except Exception:
+            handler.parked = False
+            self.handle_error(handler.request, handler.client_address)
+        finally:
+            self.slots.release()
+            self.park_or_close(handler, handler.request)
+
+    def park_or_close(self, handler, request):
+        if getattr(handler, 'parked', False):
+            self.park(handler)
+        else:
+            self.shutdown_request(request)
+
+    def park(self, handler):
+        """Hand an idle keep-alive connection to the watcher thread."""
+        with self.arrivals_lock:
+            self.arrivals.append(handler)
+        try:
+            self.waker.send(b'\0')
+        except OSError:
+            pass  # already woken (buffer full) or shutting down
+
+    def close_parked(self, handler):
+        handler.parked = False
+        handler.finish()
+        self.shutdown_request(handler.request)
+
+    def watch_idle(self):
+        while not self.closing:
+            timeout = None
+            if self.idle:
+                timeout = max(0.0, next(iter(self.idle.values())) - time.monotonic())
+            for key, _ in self.selector.select(timeout):
+                if key.fileobj is self.wakeup:
+                    self.wakeup.recv(4096)
+                    continue
+                handler = key.data
+                self.selector.unregister(handler.connection)
+                del self.idle[handler]
+                if self.closing:
+                    self.close_parked(handler)
+                elif self.slots.acquire(blocking=False):
+                    self.executor.submit(self.process_parked, handler)
+                else:
+                    self.rejected += 1
+                    REJECTED_CONNECTIONS.inc()
+                    handler.parked = False
+                    handler.finish()
+                    self.reject_request(handler.request)
+            with self.arrivals_lock:
+                arrivals, self.arrivals = self.arrivals, []
+            for handler in arrivals:
+                if len(self.idle) >= self.max_idle:
+                    self.close_parked(handler)
+                    continue
+                self.idle[handler] = time.monotonic() + self.idle_timeout
+                self.selector.register(handler.connection, selectors.EVENT_READ, handler)
+            now = time.monotonic()
+            while self.idle and next(iter(self.idle.values())) <= now:
+                handler, _ = self.idle.popitem(last=False)
+                self.selector.unregister(handler.connection)
+                self.close_parked(handler)
+            IDLE_CONNECTIONS.set(len(self.idle))
+        with self.arrivals_lock:
+            arrivals, self.arrivals = self.arrivals, []
+        for handler in list(self.idle) + arrivals:
+            self.close_parked(handler)
+        self.idle.clear()
+        IDLE_CONNECTIONS.set(0)
+
+    def reject_request(self, request):
+        try:
+            request.sendall(BUSY_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.closing = True
+        self.waker.send(b'\0')
+        self.watcher.join()
+        self.executor.shutdown(wait=True)
+        for handler in self.arrivals:  # parked by requests that finished meanwhile
+            self.close_parked(handler)
+        self.selector.close()
+        self.wakeup.close()
+        self.waker.close()
+
+def make_server(host='localhost', port=8000, workers=8, queue_depth=64, handler_class=TaskHandler):
+    """Build the API server; workers=0 gives the old single-threaded HTTPServer."""
+    if workers <= 0:
+        return HTTPServer((host, port), handler_class)
+    return WorkerPoolHTTPServer((host, port), handler_class, workers=workers, queue_depth=queue_depth)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TaskFlow API server')
+    parser.add_argument('--engine', choices=['threaded', 'async'],
+                        default=os.environ.get('TASKFLOW_ENGINE', 'threaded'),
+                        help='threaded worker pool or asyncio event loop (default: %(default)s)')
+    parser.add_argument('--host', default=os.environ.get('TASKFLOW_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('TASKFLOW_PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('TASKFLOW_WORKERS', '8')),
+                        help='worker threads (for async: database threads); '
+                             '0 = single-threaded (default: %(default)s)')
+    parser.add_argument('--queue-depth', type=int, default=int(os.environ.get('TASKFLOW_QUEUE_DEPTH', '64')),
+                        help='connections that may wait for a worker before 503s (default: %(default)s)')
+    parser.add_argument('--access-log', default=access_log.ACCESS_LOG, metavar='PATH',
+                        help='JSON access log file, "-" for stderr, "off" to disable (default: %(default)s)')
+    parser.add_argument('--access-log-sample', type=float, default=access_log.SAMPLE_RATE, metavar='RATE',
+                        help='share of requests to log; errors and slow requests are always logged')
+    parser.add_argument('--group-commit', action='store_true', default=database.GROUP_COMMIT,
+                        help='batch concurrent task writes into shared transactions')
+    parser.add_argument('--group-commit-delay', type=float, default=database.GROUP_COMMIT_MAX_DELAY_MS,
+                        metavar='MS', help='longest a write waits for its batch (default: %(default)s)')
+    parser.add_argument('--profile-sample-hz', type=float, default=profiling.SAMPLE_HZ, metavar='HZ',
+                        help='sample busy request threads this often for /debug/profile (default: off)')
+    parser.add_argument('--profile-dir', default=profiling.PROFILE_DIR, metavar='DIR',
+                        help='save per-request profiles here instead of returning them')
+    return parser.parse_args(argv)
 
 if __name__ == '__main__':
-    server = HTTPServer(('localhost', 8000), TaskHandler)
-    print('Server running on http://localhost:8000')
-    server.serve_forever()
+    args = parse_args()
+    database.init_db()
+    access_log.configure(args.access_log, args.access_log_sample)
+    if args.group_commit:
+        database.enable_group_commit(max_delay_ms=args.group_commit_delay)
+    profiling.PROFILE_DIR = args.profile_dir
+    profiling.start_sampling(args.profile_sample_hz)
+    if args.engine == 'async':
+        import async_server
+        server = async_server.make_server(args.host, args.port, max(args.workers, 1))
+    else:
+        server = make_server(args.host, args.port, args.workers, args.queue_depth)
+    print('Server running on http://%s:%d' % (args.host, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        profiling.stop_sampling()
+        database.close_pool()
+        access_log.stop()